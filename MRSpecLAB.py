@@ -1,5 +1,7 @@
+import multiprocessing
 from interface.main_frame import MainApp
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # LCModel worker pool in frozen builds
     app = MainApp(0)
     app.MainLoop()
\ No newline at end of file
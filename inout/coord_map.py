@@ -0,0 +1,111 @@
+import os
+import re
+import hashlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from interface import utils
+from .read_coord import read_coord_conc
+
+# LCModel results of a CSI acquisition as dense arrays: concentration, CRLB (%SD) and reference ratio
+# of every metabolite in every voxel, (metabolite, x, y, z), NaN where a voxel or metabolite is missing.
+# Only the concentration tables of the m_n_k.coord files are read, concurrently, and the arrays are saved
+# in coord_map.npz in the LCModel folder, reused as long as the .coord files are unchanged.
+
+COORD_PATTERN = re.compile(r"(\d+)_(\d+)_(\d+)\.coord$")
+MAP_NAME = "coord_map.npz"
+_loaded = {} # folder: (signature, CoordMap), so that changing the slice or metabolite does not reload the arrays
+
+class CoordMap:
+    def __init__(self, metabolites, conc, crlb, c_ref, present):
+        self.metabolites = list(metabolites)
+        self.conc = conc
+        self.crlb = crlb
+        self.c_ref = c_ref
+        self.present = present # voxels with a .coord file
+
+    @property
+    def shape(self):
+        return self.present.shape
+
+    def index(self, metname):
+        return self.metabolites.index(metname) if metname in self.metabolites else None
+
+    def save(self, filepath, signature):
+        with open(filepath + ".tmp", "wb") as f:
+            np.savez(f, signature=np.array(signature), metabolites=np.array(self.metabolites, dtype=str),
+                     conc=self.conc, crlb=self.crlb, c_ref=self.c_ref, present=self.present)
+        os.replace(filepath + ".tmp", filepath)
+
+    @classmethod
+    def load(cls, filepath, signature):
+        """None if the file does not exist or was saved from other .coord files"""
+        if not os.path.exists(filepath): return None
+        with np.load(filepath, allow_pickle=False) as npz:
+            if str(npz["signature"]) != signature: return None
+            return cls(npz["metabolites"].tolist(), npz["conc"], npz["crlb"], npz["c_ref"], npz["present"])
+
+def find_coord_files(folder):
+    """(m, n, k, filepath) of the m_n_k.coord files in folder and its subfolders"""
+    coord_files = []
+    for root, _, files in os.walk(folder):
+        for filename in files:
+            match = COORD_PATTERN.match(filename)
+            if match:
+                m, n, k = map(int, match.groups())
+                coord_files.append((m, n, k, os.path.join(root, filename)))
+    return sorted(coord_files)
+
+def _signature(folder, coord_files):
+    h = hashlib.blake2b(digest_size=20)
+    for m, n, k, filepath in coord_files:
+        stat = os.stat(filepath)
+        h.update(f"{os.path.relpath(filepath, folder)}:{stat.st_size}:{stat.st_mtime};".encode())
+    return h.hexdigest()
+
+def load_coord_map(folder, workers=8):
+    """CoordMap of the m_n_k.coord files of folder; None if there are none"""
+    coord_files = find_coord_files(folder)
+    if len(coord_files) == 0: return None
+    signature = _signature(folder, coord_files)
+    if folder in _loaded and _loaded[folder][0] == signature: return _loaded[folder][1]
+    filepath = os.path.join(folder, MAP_NAME)
+    try:
+        coord_map = CoordMap.load(filepath, signature)
+        if coord_map is not None:
+            _loaded[folder] = (signature, coord_map)
+            return coord_map
+    except Exception as e:
+        utils.log_debug(f"Could not read {filepath}: {e}")
+
+    def read(filepath):
+        try: return read_coord_conc(filepath)
+        except Exception as e:
+            utils.log_warning(f"Could not read {filepath}: {e}")
+            return None
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(coord_files)))) as executor:
+        tables = list(executor.map(read, [f[3] for f in coord_files]))
+
+    metabolites = []
+    for table in tables:
+        for entry in table or []:
+            if entry["name"] not in metabolites: metabolites.append(entry["name"])
+    shape = tuple(max(f[i] for f in coord_files) for i in range(3))
+    conc = np.full((len(metabolites),) + shape, np.nan)
+    crlb = np.full_like(conc, np.nan)
+    c_ref = np.full_like(conc, np.nan)
+    present = np.zeros(shape, dtype=bool)
+    index = {name: i for i, name in enumerate(metabolites)}
+    for (m, n, k, _), table in zip(coord_files, tables):
+        if table is None: continue
+        present[m - 1, n - 1, k - 1] = True
+        for entry in reversed(table): # first entry of a name wins, as in retrieve_conc_value
+            i = index[entry["name"]]
+            conc[i, m - 1, n - 1, k - 1] = entry["c"]
+            crlb[i, m - 1, n - 1, k - 1] = float(entry["SD"])
+            c_ref[i, m - 1, n - 1, k - 1] = entry["c_ref"]
+    coord_map = CoordMap(metabolites, conc, crlb, c_ref, present)
+    _loaded[folder] = (signature, coord_map)
+    try: coord_map.save(filepath, signature)
+    except Exception as e: # e.g. read-only folder
+        utils.log_debug(f"Could not write {filepath}: {e}")
+    return coord_map
@@ -0,0 +1,51 @@
+import numpy as np
+from suspect import MRSData
+
+# CSI data as one contiguous (x, y, z, points) MRSData instead of voxel-by-voxel access:
+# spectrum(), adjust_phase() and adjust_frequency() run over all voxels at once, with one value
+# per voxel allowed for the phases and frequency shifts, and voxel() returns views, not copies.
+# It is still an MRSData, so existing code indexing data["input"][0][i][j][k] keeps working.
+
+class CSIVolume(MRSData):
+    @classmethod
+    def from_mrsdata(cls, d: MRSData):
+        """Volume sharing the acquisition parameters of d; no copy if d is already contiguous"""
+        if isinstance(d, CSIVolume) and d.flags.c_contiguous: return d
+        return MRSData.inherit(d, np.ascontiguousarray(d)).view(cls)
+
+    @classmethod
+    def stack(cls, voxels):
+        """Volume from nested lists [x][y][z] of MRSData of the same length"""
+        first = voxels
+        while isinstance(first, (list, tuple)): first = first[0]
+        return MRSData.inherit(first, np.array(voxels, dtype=complex)).view(cls)
+
+    def inherit(self, new_array):
+        d = MRSData.inherit(self, new_array) # already viewed as CSIVolume
+        return d if np.ndim(new_array) > 1 else d.view(MRSData)
+
+    @property
+    def grid_shape(self):
+        return self.shape[:-1]
+
+    def _per_voxel(self, value):
+        """Scalars are used as is, arrays of grid_shape broadcast over the points"""
+        value = np.asarray(value)
+        if value.ndim == 0: return value
+        return value.reshape(self.grid_shape + (1,))
+
+    def voxel(self, i, j, k):
+        return MRSData.inherit(self, np.asarray(self)[i, j, k]).view(MRSData)
+
+    def voxels(self):
+        """Yields ((i, j, k), voxel) in the order of the labels i+1_j+1_k+1"""
+        for index in np.ndindex(*self.grid_shape):
+            yield index, self.voxel(*index)
+
+    def adjust_phase(self, zero_phase, first_phase=0, fixed_frequency=0):
+        # MRSData.adjust_phase goes through spectrum().fid(), which returns a plain MRSData
+        return self.inherit(MRSData.adjust_phase(self, self._per_voxel(zero_phase), first_phase=self._per_voxel(first_phase),
+                                                 fixed_frequency=self._per_voxel(fixed_frequency)))
+
+    def adjust_frequency(self, frequency_shift):
+        return MRSData.adjust_frequency(self, self._per_voxel(frequency_shift))
@@ -1,5 +1,5 @@
 import os
-from inout.read_mrs import load_file
+from inout.probe_header import probe_headers
 
 def group_files_by_header(filepaths, preferred_vendor=None):
     """
@@ -13,13 +13,9 @@ def group_files_by_header(filepaths, preferred_vendor=None):
       dict: Dictionary where keys are the grouping identifiers and values are lists of file paths.
     """
     groups = {}
-    for filepath in filepaths:
-        try:
-            # load_file returns: data, header, dtype, vendor
-            data, header, dtype, vendor = load_file(filepath)
-        except Exception as e:
-            # If header reading fails, fallback on the parent folder as key.
-            header = {}
+    # headers only, read concurrently; if header reading fails, fallback on the parent folder as key.
+    for filepath, (header, dtype, vendor) in zip(filepaths, probe_headers(filepaths)):
+        if header is None: header = {}
         
         # If a preferred vendor is provided, check that the current file matches.
         if preferred_vendor is not None and vendor is not None:
@@ -65,12 +61,8 @@ def group_water_files_by_header(water_filepaths):
       dict: Dictionary with grouping keys and corresponding water file lists.
     """
     groups = {}
-    for filepath in water_filepaths:
-        try:
-            # load_file returns: data, header, dtype, vendor
-            data, header, dtype, vendor = load_file(filepath)
-        except Exception as e:
-            header = {}
+    for filepath, (header, dtype, vendor) in zip(water_filepaths, probe_headers(water_filepaths)):
+        if header is None: header = {}
         
         # Here you might check for a water‐specific field.
         # For example, if water references are stored with a specific sequence name:
@@ -1,5 +1,4 @@
 import numpy as np
-import nibabel as nib
 import json
 import numpy as np
 import os
@@ -23,8 +22,29 @@ def save_raw(filepath, data, seq="PRESS"):
         if data.transform is not None: fout.write(" VOLUME = {}\n".format(data.voxel_volume() * 1e-3))
         # else: print("Saving LCModel data without a transform, using default voxel volume of 1ml")
         fout.write(" $END\n")
-        for point in np.nditer(data, order='C'):
-            fout.write("  {0: 4.6e}  {1: 4.6e}\n".format(float(point.real), float(point.imag)))
+        fout.write(format_raw_points(data))
+
+def format_raw_points(data):
+    """All points as '  {re: 4.6e}  {im: 4.6e}' lines, formatted in a single call (same text as point by point)"""
+    values = np.asarray(data).ravel(order='C')
+    values = np.column_stack((np.real(values), np.imag(values))).astype(float).ravel()
+    return ("  % 4.6e  % 4.6e\n" * (len(values) // 2)) % tuple(values.tolist())
+
+def read_raw(filepath):
+    """Reads a .RAW file written by save_raw; returns the complex data and the namelist parameters"""
+    with open(filepath, 'r') as fin:
+        text = fin.read()
+    params = {}
+    pos = 0
+    for _ in range(2): # $SEQPAR and $NMID namelists, each closed by $END
+        end = text.index("$END", pos)
+        for line in text[pos:end].splitlines():
+            if "=" in line:
+                key, value = line.split("=", 1)
+                params[key.strip()] = value.strip()
+        pos = end + len("$END")
+    values = np.array(text[pos:].split(), dtype=float)
+    return values[0::2] + 1j * values[1::2], params
 
 def read_control(filepath):
     output = {}
@@ -92,6 +112,7 @@ def save_control(filepath, params):
         fout.write(" $END\n")
 
 def save_nifti(filepath, data, seq="PRESS"):
+    import nibabel as nib
     # Convert to complex array if not already
     complex_array = np.asarray(data, dtype=np.complex64)
     
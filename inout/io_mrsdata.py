@@ -0,0 +1,42 @@
+import numpy as np
+from suspect import MRSData
+from inout.csi_volume import CSIVolume
+
+# MRSData loses its attributes (dt, f0, ...) when pickled as a plain ndarray subclass,
+# so it is packed into a tagged tuple of the array and the arguments needed to rebuild it.
+
+_TAG = "__mrsdata__"
+
+def pack_mrsdata(d: MRSData):
+    return (_TAG, np.asarray(d), {
+        "dt": d.dt,
+        "f0": d.f0,
+        "te": getattr(d, "te", 30),
+        "tr": getattr(d, "tr", -1),
+        "ppm0": getattr(d, "ppm0", 4.7),
+        "voxel_dimensions": getattr(d, "voxel_dimensions", (10, 10, 10)),
+        "transform": getattr(d, "transform", None),
+        "metadata": getattr(d, "metadata", None),
+        "csi": isinstance(d, CSIVolume) and d.ndim > 1, # not a voxel indexed out of a volume
+    })
+
+def unpack_mrsdata(packed):
+    _, array, attrs = packed
+    d = MRSData(array, attrs["dt"], attrs["f0"], te=attrs["te"], tr=attrs["tr"], ppm0=attrs["ppm0"],
+                voxel_dimensions=attrs["voxel_dimensions"], transform=attrs["transform"], metadata=attrs["metadata"])
+    return d.view(CSIVolume) if attrs.get("csi", False) else d
+
+def pack(obj):
+    """Recursively converts MRSData in lists, tuples and dicts into picklable tuples"""
+    if isinstance(obj, MRSData): return pack_mrsdata(obj)
+    if isinstance(obj, list): return [pack(o) for o in obj]
+    if isinstance(obj, tuple): return tuple(pack(o) for o in obj)
+    if isinstance(obj, dict): return {k: pack(v) for k, v in obj.items()}
+    return obj
+
+def unpack(obj):
+    if isinstance(obj, tuple) and len(obj) == 3 and isinstance(obj[0], str) and obj[0] == _TAG: return unpack_mrsdata(obj)
+    if isinstance(obj, list): return [unpack(o) for o in obj]
+    if isinstance(obj, tuple): return tuple(unpack(o) for o in obj)
+    if isinstance(obj, dict): return {k: unpack(v) for k, v in obj.items()}
+    return obj
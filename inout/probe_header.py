@@ -0,0 +1,83 @@
+import os
+import numpy
+from concurrent.futures import ThreadPoolExecutor
+from .read_header import DataReaders
+from .read_mrs import RDA_HEADER_END, parse_rda_header, nifti_mrs_extension, nifti_mrs_header
+
+# Header-only readers: the same header fields as load_file for the keys used to sort files,
+# without reading (and, for Twix, averaging) the data.
+
+def probe_twix(filepath):
+    """Parses the text buffers at the start of the measurement, as mapVBVD does before reading any data"""
+    from mapvbvd.read_twix_hdr import read_twix_hdr, twix_hdr
+    with open(filepath, 'rb') as fid:
+        first, second = numpy.fromfile(fid, dtype=numpy.uint32, count=2)
+        if first < 10000 and second <= 64: # VD/VE: raid file header with one entry of 152 bytes per measurement
+            nmeas = int(second)
+            meas = 1 if nmeas > 1 else 0 # same measurement as DataReaders.siemens_twix
+            fid.seek(16 + meas * 152)
+            offset = int(numpy.fromfile(fid, dtype=numpy.uint64, count=1)[0])
+        else: # VB: a single measurement at the start of the file
+            offset = 0
+        fid.seek(offset)
+        numpy.fromfile(fid, dtype=numpy.uint32, count=1) # header length
+        hdr, _ = read_twix_hdr(fid, twix_hdr())
+    header, _ = DataReaders().siemens_twix(filepath, None, twixHd=hdr)
+    return header
+
+def probe_dicom(filepath):
+    """Only the protocol name, which DataReaders.siemens_ima stores as Sequence"""
+    import pydicom
+    ds = pydicom.dcmread(filepath, stop_before_pixels=True, defer_size="1 KB", specific_tags=["ProtocolName"])
+    return {"Manufacturer": "Siemens", "Sequence": ds.get("ProtocolName", None)}
+
+def probe_spar(filepath):
+    spar = filepath.lower()[:-5] + ".spar" # as in load_file
+    if not os.path.exists(spar): return None
+    header, _ = DataReaders().philips_spar(spar, None)
+    return header
+
+def probe_rda(filepath, chunk=65536):
+    headerbytes = b""
+    with open(filepath, 'rb') as f:
+        while RDA_HEADER_END not in headerbytes:
+            block = f.read(chunk)
+            if not block: break
+            headerbytes += block
+    headerend = headerbytes.find(RDA_HEADER_END) + len(RDA_HEADER_END)
+    header, _ = parse_rda_header(headerbytes[:headerend].decode('utf-8'))
+    return header
+
+def probe_nifti(filepath):
+    import nibabel
+    img = nibabel.load(filepath) # the data array is only read on access
+    return nifti_mrs_header(nifti_mrs_extension(img))
+
+def probe_header(filepath):
+    """Returns header, dtype, vendor like load_file, without the data; header is None if it could not be read"""
+    ext = os.path.splitext(filepath)[-1][1:].lower()
+    if ext == "ima": header = probe_dicom(filepath)
+    elif ext == "dcm": header = probe_dicom(filepath)
+    elif ext == "dat":
+        try: header = probe_twix(filepath)
+        except Exception: header, _ = DataReaders().siemens_twix(filepath, None) # e.g. other pymapvbvd version
+    elif ext == "sdat": header = probe_spar(filepath)
+    elif ext == "rda": header = probe_rda(filepath)
+    elif ext == "nii" or filepath.endswith(".nii.gz"):
+        header = probe_nifti(filepath)
+        ext = "nii"
+    else:
+        return None, None, None
+    vendor = None
+    if ext in ["ima", "dat"]: vendor = "siemens"
+    elif ext == "sdat": vendor = "philips"
+    return header, ext, vendor
+
+def probe_headers(filepaths, workers=8):
+    """probe_header on all files, reading them concurrently; the results are in the order of filepaths"""
+    def probe(filepath):
+        try: return probe_header(filepath)
+        except Exception: return None, None, None
+    if len(filepaths) <= 1: return [probe(f) for f in filepaths]
+    with ThreadPoolExecutor(max_workers=min(workers, len(filepaths))) as executor:
+        return list(executor.map(probe, filepaths))
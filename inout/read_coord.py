@@ -1,8 +1,185 @@
+import os
 import re
+import json
+import warnings
+import numpy as np
 from interface import utils
 
-def ReadlcmCoord(filename, mrs_type='1H'):
-    import re
+# patterns of the .coord lines, compiled once
+_FLOAT = r'[-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?'
+# captures a possible '+' in the reference field
+metabolite_pattern = re.compile(r'^(' + _FLOAT + r')\s+([0-9]+)%\s+(\S+)\s+(.+)$')
+fwhm_pattern = re.compile(r'FWHM\s*[:=]\s*(' + _FLOAT + ')')
+sn_pattern = re.compile(r'S/N\s*[:=]\s*(' + _FLOAT + ')')
+data_shift_pattern = re.compile(r'Data shift\s*[:=]\s*(' + _FLOAT + ')')
+ph_pattern = re.compile(r'[-+]?\d*\.\d+|\d+')
+npoints_pattern = re.compile(r'(\d+(?:\.\d+)?)\s+points on ppm-axis')
+
+_ARRAYS = ['ppm', 'spec', 'fit', 'baseline', 'residue']
+SIDECAR_VERSION = 1
+
+def _to_floats(text):
+    """Whitespace-separated numbers of text, parsed in one call; None if one of them is not a number"""
+    if not text or text.isspace(): return np.zeros(0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error") # np.fromstring stops at the first invalid token with a warning (an error in newer NumPy)
+        try: return np.fromstring(text, sep=" ")
+        except (ValueError, DeprecationWarning): return None
+
+def _take(lines, start, need, commas=False):
+    """
+    Fast path for a block of need numbers starting at lines[start], assuming the lines are full:
+    returns the numbers and the index of the line after the one holding the last number,
+    or None if that does not hold (blank or shorter lines, or tokens that are not numbers).
+    """
+    if start >= len(lines): return None
+    per_line = len(lines[start].split())
+    if per_line == 0: return None
+    end = min(start - (-need // per_line), len(lines))
+    text = "".join(lines[start:end])
+    values = _to_floats(text.replace(',', ' ') if commas else text)
+    if values is None or len(values) < need: return None
+    last = lines[end - 1].replace(',', ' ') if commas else lines[end - 1]
+    if len(values) - len(last.split()) >= need: return None # the block ends before the last line
+    return values[:need], end
+
+def _read_block(lines, line_idx, nbpoints, what):
+    """
+    The nbpoints numbers following line_idx, skipping blank lines and the rest of the last line;
+    returns the values and the index of the next line
+    """
+    if nbpoints > 0:
+        block = _take(lines, line_idx, nbpoints)
+        if block is not None: return block
+    total_lines = len(lines)
+    start, count = line_idx, 0
+    while line_idx < total_lines and count < nbpoints:
+        count += len(lines[line_idx].split())
+        line_idx += 1
+    tokens = " ".join(lines[start:line_idx]).split()[:nbpoints]
+    values = []
+    for val in tokens:
+        try: values.append(float(val))
+        except ValueError: raise ValueError(f"Invalid {what} value: '{val}'")
+    if len(values) != nbpoints:
+        raise ValueError(f"Mismatch in number of {what} points.")
+    return np.array(values), line_idx
+
+def _read_subspec(lines, line_idx, first, nbpoints):
+    """
+    Values of a metabolite subspectrum: numbers after the '=' of its first line, then numbers of the next lines
+    until nbpoints are read; tokens that are not numbers are skipped. Returns the values and the index of the last line read.
+    """
+    values = []
+    for val in first.replace(',', ' ').split():
+        try: values.append(float(val.strip(',')))
+        except ValueError: pass
+    need = nbpoints - len(values)
+    if need > 0:
+        block = _take(lines, line_idx + 1, need, commas=True)
+        if block is not None:
+            return np.concatenate([values, block[0]]), block[1] - 1
+    total_lines = len(lines)
+    while len(values) < nbpoints and line_idx + 1 < total_lines:
+        line_idx += 1
+        additional_line = lines[line_idx].strip()
+        if not additional_line: continue
+        for val in additional_line.replace(',', ' ').split():
+            try:
+                values.append(float(val.strip(',')))
+                if len(values) == nbpoints: break
+            except ValueError:
+                pass
+    return np.array(values, dtype=float), line_idx
+
+def _conc_entry(match):
+    """Entry of the concentration table from a match of metabolite_pattern; None if malformed"""
+    try:
+        c = float(match.group(1))
+        SD = match.group(2)
+        c_ref_field = match.group(3)  # May contain a '+' if no space was present.
+        name_field = match.group(4).strip()
+        name_field = name_field.replace("Conc.", "").strip()
+
+        # Try to convert c_ref_field to float.
+        try:
+            c_ref_val = float(c_ref_field)
+            c_cr_val = c_ref_val
+        except ValueError:
+            # Possibly of the form "number+metabolite"
+            if ('+' in c_ref_field and c_ref_field[0] != '+' and
+                c_ref_field[-1] != '+' and c_ref_field[c_ref_field.find('+') - 1].isdigit()):
+                parts = c_ref_field.split('+', 1)
+                try:
+                    c_ref_val = float(parts[0])
+                except ValueError:
+                    c_ref_val = 0.0
+                # Use the part after the plus as the metabolite name if nonempty.
+                if parts[1].strip():
+                    name_field = parts[1].strip()
+                c_cr_val = c_ref_val
+            else:
+                # Fallback if conversion fails and no plus sign found.
+                c_ref_val = 0.0
+                c_cr_val = 0.0
+    except ValueError:
+        return None
+    return {'name': name_field, 'c_cr': c_cr_val, 'c_ref': c_ref_val, 'c': c, 'SD': SD}
+
+def read_coord_conc(filename):
+    """Only the concentration table of a .coord file, as ReadlcmCoord(filename)['conc']"""
+    conc = []
+    with open(filename, 'r') as f:
+        for line in f:
+            if '%' not in line: continue
+            match = metabolite_pattern.match(line.strip())
+            if match:
+                conc_entry = _conc_entry(match)
+                if conc_entry is not None: conc.append(conc_entry)
+    return conc
+
+def _sidecar_path(filename):
+    return filename + ".npz"
+
+def _read_sidecar(filename, mrs_type):
+    sidecar = _sidecar_path(filename)
+    try:
+        if not os.path.exists(sidecar): return None
+        stat = os.stat(filename)
+        with np.load(sidecar, allow_pickle=False) as npz:
+            meta = json.loads(str(npz["meta"]))
+            if meta.pop("_key") != [SIDECAR_VERSION, stat.st_mtime, stat.st_size, mrs_type]: return None
+            lcmdata = {k: npz[k].tolist() for k in _ARRAYS}
+            lcmdata["subspec"] = list(npz["subspec"].tolist())
+        lcmdata.update(meta)
+        return lcmdata
+    except Exception as e:
+        utils.log_debug(f"Could not read {sidecar}: {e}")
+        return None
+
+def _write_sidecar(filename, mrs_type, lcmdata, arrays):
+    sidecar = _sidecar_path(filename)
+    try:
+        stat = os.stat(filename)
+        meta = {k: v for k, v in lcmdata.items() if k not in arrays}
+        meta["_key"] = [SIDECAR_VERSION, stat.st_mtime, stat.st_size, mrs_type]
+        with open(sidecar + ".tmp", "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(sidecar + ".tmp", sidecar)
+    except Exception as e: # e.g. read-only folder
+        utils.log_debug(f"Could not write {sidecar}: {e}")
+        if os.path.exists(sidecar + ".tmp"): os.remove(sidecar + ".tmp")
+
+def ReadlcmCoord(filename, mrs_type='1H', cache=False):
+    """
+    Reads an LCModel .coord file. The numeric blocks are converted in bulk by NumPy and returned as lists.
+    With cache, the result is also stored in a .coord.npz file next to it, read instead of the .coord
+    file as long as the modification time and size of the .coord file are unchanged.
+    """
+    if cache:
+        lcmdata = _read_sidecar(filename, mrs_type)
+        if lcmdata is not None: return lcmdata
+
     # Updated template includes new key 'c_ref'
     lcmdata = {
         'ppm': [],
@@ -21,14 +198,8 @@ def ReadlcmCoord(filename, mrs_type='1H'):
         'subspec': [],
         'crnaa': ''
     }
-
-    conc_template = {
-        'name': '',
-        'c_cr': 0.0,
-        'c_ref': 0.0,
-        'c': 0.0,
-        'SD': ''
-    }
+    arrays = {k: np.zeros(0) for k in ['ppm', 'spec', 'fit', 'baseline']}
+    subspecs = []
 
     try:
         with open(filename, 'r') as f:
@@ -79,63 +250,17 @@ def ReadlcmCoord(filename, mrs_type='1H'):
             continue
         
         # Parse Metabolite Concentration Table
-        # Modified regex similar to the old version to capture possible '+' in the reference field.
-        metabolite_pattern = re.compile(
-            r'^([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s+([0-9]+)%\s+(\S+)\s+(.+)$'
-        )
-        
         match = metabolite_pattern.match(line)
         if match:
-            try:
-                c = float(match.group(1))
-                SD = match.group(2)
-                c_ref_field = match.group(3)  # May contain a '+' if no space was present.
-                name_field = match.group(4).strip()
-                name_field = name_field.replace("Conc.", "").strip()
-                
-                # Try to convert c_ref_field to float.
-                try:
-                    c_ref_val = float(c_ref_field)
-                    c_cr_val = c_ref_val
-                except ValueError:
-                    # Possibly of the form "number+metabolite"
-                    if ('+' in c_ref_field and c_ref_field[0] != '+' and 
-                        c_ref_field[-1] != '+' and c_ref_field[c_ref_field.find('+') - 1].isdigit()):
-                        parts = c_ref_field.split('+', 1)
-                        try:
-                            c_ref_val = float(parts[0])
-                        except ValueError:
-                            c_ref_val = 0.0
-                        # Use the part after the plus as the metabolite name if nonempty.
-                        if parts[1].strip():
-                            name_field = parts[1].strip()
-                        c_cr_val = c_ref_val
-                    else:
-                        # Fallback if conversion fails and no plus sign found.
-                        c_ref_val = 0.0
-                        c_cr_val = 0.0
-                
-                conc_entry = conc_template.copy()
-                conc_entry['c'] = c
-                conc_entry['SD'] = SD
-                conc_entry['c_cr'] = c_cr_val
-                conc_entry['c_ref'] = c_ref_val  # New key with c_ref information
-                conc_entry['name'] = name_field
-                lcmdata['conc'].append(conc_entry)
-            except ValueError:
-                # Log debug information or skip the malformed line.
-                # e.g., utils.log_debug(f"Skipping malformed metabolite line at {line_idx + 1}")
-                pass
+            conc_entry = _conc_entry(match)
+            if conc_entry is not None: lcmdata['conc'].append(conc_entry)
             line_idx += 1
             continue
         
         # Parse FWHM and S/N
-        if "FWHM" in line and "S/N" in line:
-            fwhm_pattern = re.compile(r'FWHM\s*[:=]\s*([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)')
-            sn_pattern = re.compile(r'S/N\s*[:=]\s*([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)')
-            
-            fwhm_match = fwhm_pattern.search(line)
-            sn_match = sn_pattern.search(line)
+        if "FWHM" in line or "S/N" in line:
+            fwhm_match = fwhm_pattern.search(line) if "FWHM" in line else None
+            sn_match = sn_pattern.search(line) if "S/N" in line else None
             
             if fwhm_match:
                 try:
@@ -152,31 +277,8 @@ def ReadlcmCoord(filename, mrs_type='1H'):
             line_idx += 1
             continue
         
-        if "FWHM" in line:
-            fwhm_pattern = re.compile(r'FWHM\s*[:=]\s*([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)')
-            fwhm_match = fwhm_pattern.search(line)
-            if fwhm_match:
-                try:
-                    lcmdata['linewidth'] = float(fwhm_match.group(1))
-                except ValueError:
-                    raise ValueError("Invalid FWHM value.")
-            line_idx += 1
-            continue
-        
-        if "S/N" in line:
-            sn_pattern = re.compile(r'S/N\s*[:=]\s*([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)')
-            sn_match = sn_pattern.search(line)
-            if sn_match:
-                try:
-                    lcmdata['SNR'] = float(sn_match.group(1))
-                except ValueError:
-                    raise ValueError("Invalid S/N value.")
-            line_idx += 1
-            continue
-        
         # Parse Data Shift
         if "Data shift" in line:
-            data_shift_pattern = re.compile(r'Data shift\s*[:=]\s*([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)')
             data_shift_match = data_shift_pattern.search(line)
             if data_shift_match:
                 try:
@@ -188,7 +290,7 @@ def ReadlcmCoord(filename, mrs_type='1H'):
         
         # Parse Phasing
         if "Ph:" in line:
-            ph_numbers = re.findall(r'[-+]?\d*\.\d+|\d+', line)
+            ph_numbers = ph_pattern.findall(line)
             if len(ph_numbers) >= 2:
                 try:
                     lcmdata['ph0'] = float(ph_numbers[0])
@@ -202,7 +304,7 @@ def ReadlcmCoord(filename, mrs_type='1H'):
         
         # Parse Number of Points on ppm-axis
         if "points on ppm-axis" in line:
-            match = re.match(r'(\d+(?:\.\d+)?)\s+points on ppm-axis', line)
+            match = npoints_pattern.match(line)
             if match:
                 try:
                     nbpoints = int(float(match.group(1)))
@@ -210,134 +312,29 @@ def ReadlcmCoord(filename, mrs_type='1H'):
                     raise ValueError("Invalid number of points on ppm-axis.")
             else:
                 raise ValueError("Number of points on ppm-axis not found.")
-            ppm_values = []
-            line_idx += 1
-            while line_idx < total_lines and len(ppm_values) < nbpoints:
-                ppm_line = lines[line_idx].strip()
-                if not ppm_line:
-                    line_idx += 1
-                    continue
-                ppm_parts = ppm_line.split()
-                for val in ppm_parts:
-                    try:
-                        ppm_values.append(float(val))
-                        if len(ppm_values) == nbpoints:
-                            break
-                    except ValueError:
-                        raise ValueError(f"Invalid ppm value: '{val}'")
-                line_idx += 1
-            if len(ppm_values) != nbpoints:
-                raise ValueError("Mismatch in number of ppm points.")
-            lcmdata['ppm'] = ppm_values
+            arrays['ppm'], line_idx = _read_block(lines, line_idx + 1, nbpoints, "ppm")
             continue
         
-        # Parse Spectrum Data
+        # Parse Spectrum, Fit and Baseline Data
         if "phased data points follow" in line:
-            spec_values = []
-            line_idx += 1
-            while line_idx < total_lines and len(spec_values) < nbpoints:
-                spec_line = lines[line_idx].strip()
-                if not spec_line:
-                    line_idx += 1
-                    continue
-                spec_parts = spec_line.split()
-                for val in spec_parts:
-                    try:
-                        spec_values.append(float(val))
-                        if len(spec_values) == nbpoints:
-                            break
-                    except ValueError:
-                        raise ValueError(f"Invalid spec value: '{val}'")
-                line_idx += 1
-            if len(spec_values) != nbpoints:
-                raise ValueError("Mismatch in number of spec points.")
-            lcmdata['spec'] = spec_values
+            arrays['spec'], line_idx = _read_block(lines, line_idx + 1, nbpoints, "spec")
             continue
-        
-        # Parse Fit Data
         if "points of the fit to the data follow" in line:
-            fit_values = []
-            line_idx += 1
-            while line_idx < total_lines and len(fit_values) < nbpoints:
-                fit_line = lines[line_idx].strip()
-                if not fit_line:
-                    line_idx += 1
-                    continue
-                fit_parts = fit_line.split()
-                for val in fit_parts:
-                    try:
-                        fit_values.append(float(val))
-                        if len(fit_values) == nbpoints:
-                            break
-                    except ValueError:
-                        raise ValueError(f"Invalid fit value: '{val}'")
-                line_idx += 1
-            if len(fit_values) != nbpoints:
-                raise ValueError("Mismatch in number of fit points.")
-            lcmdata['fit'] = fit_values
+            arrays['fit'], line_idx = _read_block(lines, line_idx + 1, nbpoints, "fit")
             continue
-        
-        # Parse Baseline Data
         if "background values follow" in line:
-            baseline_values = []
-            line_idx += 1
-            while line_idx < total_lines and len(baseline_values) < nbpoints:
-                baseline_line = lines[line_idx].strip()
-                if not baseline_line:
-                    line_idx += 1
-                    continue
-                baseline_parts = baseline_line.split()
-                for val in baseline_parts:
-                    try:
-                        baseline_values.append(float(val))
-                        if len(baseline_values) == nbpoints:
-                            break
-                    except ValueError:
-                        raise ValueError(f"Invalid baseline value: '{val}'")
-                line_idx += 1
-            if len(baseline_values) != nbpoints:
-                raise ValueError("Mismatch in number of baseline points.")
-            lcmdata['baseline'] = baseline_values
+            arrays['baseline'], line_idx = _read_block(lines, line_idx + 1, nbpoints, "baseline")
             continue
         
         # Parse Subspectra and Metabolites
         if '=' in line and not any(keyword in line.lower() for keyword in ['file', 'table', 'line', 'input']):
-            parts = line.split('=', 1)
-            if len(parts) != 2:
-                # e.g., utils.log_debug(f"Invalid subspectra format at line {line_idx + 1}")
-                line_idx += 1
-                continue 
-            metab_name = parts[0].strip()
-            metab_name = metab_name.replace("Conc.", "").strip()
-            subspec_str = parts[1].strip()
-            subspec_values = []
-            # Extract all numerical values from subspec_str
-            subspec_parts = subspec_str.replace(',', ' ').split() 
-            for val in subspec_parts:
-                val_clean = val.strip(',')
-                try:
-                    subspec_values.append(float(val_clean))
-                except ValueError:
-                    pass 
-            # If not enough subspec values, read from subsequent lines
-            while len(subspec_values) < nbpoints and line_idx + 1 < total_lines:
-                line_idx += 1
-                additional_line = lines[line_idx].strip()
-                if not additional_line:
-                    continue
-                additional_parts = additional_line.replace(',', ' ').split()
-                for val in additional_parts:
-                    val_clean = val.strip(',')
-                    try:
-                        subspec_values.append(float(val_clean))
-                        if len(subspec_values) == nbpoints:
-                            break
-                    except ValueError:
-                        pass
+            metab_name, subspec_str = line.split('=', 1)
+            metab_name = metab_name.strip().replace("Conc.", "").strip()
+            subspec_values, line_idx = _read_subspec(lines, line_idx, subspec_str.strip(), nbpoints)
             if len(subspec_values) == nbpoints:
                 # Subtract baseline
-                subspec_corrected = [x - b for x, b in zip(subspec_values, lcmdata['baseline'])]
-                lcmdata['subspec'].append(subspec_corrected)
+                n = min(nbpoints, len(arrays['baseline']))
+                subspecs.append(subspec_values[:n] - arrays['baseline'][:n])
                 lcmdata['metab'].append(metab_name)
                 lcmdata['nfit'] += 1
 
@@ -347,13 +344,18 @@ def ReadlcmCoord(filename, mrs_type='1H'):
         line_idx += 1
 
     # Calculate Residue
-    if lcmdata['spec'] and lcmdata['fit']:
-        if len(lcmdata['spec']) != len(lcmdata['fit']):
+    if len(arrays['spec']) and len(arrays['fit']):
+        if len(arrays['spec']) != len(arrays['fit']):
             raise ValueError("Spec and Fit data lengths do not match.")
-        lcmdata['residue'] = [s - f for s, f in zip(lcmdata['spec'], lcmdata['fit'])]
+        arrays['residue'] = arrays['spec'] - arrays['fit']
     else:
         raise ValueError("Spec or Fit data missing.")
-    
+
+    for k in _ARRAYS: lcmdata[k] = arrays[k].tolist()
+    lcmdata['subspec'] = [s.tolist() for s in subspecs]
+    if cache:
+        arrays['subspec'] = np.array(subspecs) if len(subspecs) else np.zeros((0, 0))
+        _write_sidecar(filename, mrs_type, lcmdata, arrays)
     return lcmdata
 
 def extract_reference(filename):
@@ -0,0 +1,512 @@
+__author__  = 'Aaron Gudmundson'
+__email__   = 'agudmun2@jhmi.edu'
+__date__    = '2023/06/01'
+
+# Standalone Reproducibility Made Easy window, split from read_header so that reading headers does not import tkinter
+
+from tkinter import filedialog 														# File Explorer through Tkinter
+import tkinter as tk     															# Graphical User Interface
+import subprocess 																	# Running Terminal Commands
+import shutil 																		# Copy, Move, "which $program"
+import copy  																		# Copying Objects
+import sys 																			# Interact with System
+import os																			# Interact with Operating System
+
+try:
+	from .read_header import setup_log, write_log, Table, DataReaders
+except ImportError: 																# Run as a script
+	from read_header import setup_log, write_log, Table, DataReaders
+
+
+class Application(tk.Tk): 															# Create Application Class
+	def __init__(self, lwrite=True): 												# Init
+		super().__init__() 															# Initialize tk.Tk
+
+		userwidth  = self.winfo_screenwidth() 										# User's Screen Width
+		userheight = self.winfo_screenheight() 										# User's Screen Height
+
+		width      = int(userwidth * 0.30) 											# Application Width
+		height     = int(userwidth * 0.20) 											# Application Height
+
+		# print('User Width : {}'.format(userwidth))									#
+		# print('User Height: {}'.format(userheight))									#
+		# print(' ')																	#
+		# print('Width      : {}'.format(width))										#
+		# print('Height     : {}'.format(height))										#
+		# print(' ')																	#
+
+
+		## Main Window Control 														
+		# self.geometry('{}x{}'.format(width, height))								# Geometry Width x Height
+		self.minsize(width, height) 												# Screen can't be smaller
+		self.config(bg='white') 													# Set Background White
+
+
+		## Required Classes, Functions, etc.													
+		self.Table   = Table() 														# MRSinMRS Table Creation
+		self.DRead   = DataReaders() 												# Vendor Data Readers
+		self.lwrite  = lwrite  														# Write to Log File
+		self.exe 	 = bool  														# Executable or CommandLine
+
+
+		## Window Label
+		self.title('Reproducibility Made Easy') 									# Label The Application Window
+
+
+		## This is the primary Grid Layout Frame
+		self.frame  = tk.Frame(self, borderwidth=10)# , width=width, height=height)
+		self.frame.grid(row=0, column=0, columnspan=2, rowspan=10, sticky=tk.W+tk.E+tk.N+tk.S)
+		self.frame.config(bg='white')
+		self.frame.pack(pady=5, padx=5)
+
+
+		## Primary Label (at Top)
+		prim_label      = '  \n'
+		prim_label      = 'Reproducibility Made Easy\n'.format(prim_label)
+		self.prim_label = tk.Label(self.frame, text='Reproducibility Made Easy')
+		self.prim_label.config(font=('Arial', 20, 'bold'), bg='royalblue')
+		self.prim_label.grid(row=0, column=0, rowspan=1, columnspan=2, sticky=tk.W+tk.E+tk.N+tk.S)
+
+
+		## Reproducibility Made Easy Description
+		desc_label       = ''
+		desc_label       = '{}Export a CSV File according to the '.format(desc_label)
+		desc_label       = '{}MRSinMRS guidelines using MRS files headers\n'.format(desc_label)
+		self.desc_label = tk.Label(self.frame, text=desc_label)
+		self.desc_label.config(font=('Arial', 16), bg='royalblue')
+		self.desc_label.grid(row=4, column=0, rowspan=1, columnspan=2, sticky=tk.W+tk.E+tk.N+tk.S)
+
+
+		## Reproducibility Made Easy Team
+		RME_label       = ''
+		RME_label       = '{}Reproducibility Made Easy Team:\n'.format(RME_label)
+		RME_label       = '{}Antonia Susjnar, Antonia Kaiser, Gianna Nossa, '.format(RME_label)
+		RME_label       = '{}Dunja Simicic, and\nAaron Gudmundson\n\n'.format(RME_label)
+		self.RME_label = tk.Label(self.frame, text=RME_label)
+		self.RME_label.config(font=('Arial',14), bg='white')
+		self.RME_label.grid(row=5, column=0, rowspan=1, columnspan=2, sticky=tk.W+tk.E+tk.N+tk.S)
+		# self.RME_label.pack(pady=0)
+
+ 
+		## MRSinMRS Citation
+		cite_names      = ''
+		cite_names      = '{}Lin A, Andronesi O, Bogner W, et al.\n'.format(cite_names)
+		cite_names      = '{}Minimum Reporting Standards for in vivo Magnetic '.format(cite_names)
+		cite_names      = '{}Resonance Spectroscopy (MRSinMRS):\n'.format(cite_names)
+		cite_names      = '{}Experts’ consensus recommendations. NMR in Biomedicine. '.format(cite_names)
+		cite_names      = '{}2021;34(5). doi:10.1002/nbm.4484\n\n'.format(cite_names)
+		self.citation   = tk.Label(self.frame, text=cite_names)
+		self.citation.config(font=('Arial', 12), bg='white')
+		self.citation.grid(row=6, column=0, sticky=tk.W+tk.E+tk.N+tk.S)
+		# self.citation.pack(pady=0)
+
+
+		## Main Button Box
+		self.button_frame      = tk.Frame(self.frame, borderwidth=5)
+		self.button_frame.grid(row=7, column=0, columnspan=2, rowspan=2, sticky=tk.W+tk.E+tk.N+tk.S)
+		self.button_frame.config(bg='white')
+
+
+		## Determine if running in application or 
+		if getattr(sys, 'frozen', False): 													# Determine if Application or CommandLine
+			print('Running inside executable...')
+			self.cwd = os.path.abspath(os.path.dirname(__file__))
+			self.exe = True 																# Note
+		elif __file__: 																		# Command Line
+			self.cwd = os.path.dirname(os.path.realpath(__file__)) 							# Command Line - Set Directory
+			self.exe = False 																# Note  
+		self.cwd = self.cwd.replace('\\', '/') 												# Remove any Windows' backslashes
+
+
+		## File Import Button
+		self.import_button = tk.Button(self.button_frame, text='Import', width=15, height=2, command=self.import_file)
+		self.import_button.grid(row=0, column=0)
+		self.import_label  = tk.Label(self.button_frame, text=self.cwd)
+		self.import_label.config(font=('Arial', 14), bg='white')
+		self.import_label.grid(row=0, column=1, sticky=tk.W+tk.E+tk.N+tk.S)
+
+
+		## File Export Button
+		self.export_button = tk.Button(self.button_frame, text='Export', width=15, height=2, command=self.export_file)
+		self.export_button.grid(row=1, column=0)
+		self.export_label  = tk.Label(self.button_frame, text=self.cwd)
+		self.export_label.config(font=('Arial', 14), bg='white')
+		self.export_label.grid(row=1, column=1, sticky=tk.W+tk.E+tk.N+tk.S)  
+
+
+		## Button Commands
+		self.command_frame = tk.Frame(self.frame, borderwidth=5)
+		self.command_frame.grid(row=9, column=0, columnspan=2)
+		self.command_frame.config(bg='white')
+
+
+		## User Data Selections - Vendor
+		self.vendor     = tk.StringVar()
+		self.vendor.set('Select Vendor')
+		self.vendor_opt = ['Siemens', 'Philips', 'GE', 'Bruker']
+		self.command_01 = tk.OptionMenu(self.command_frame, self.vendor, *self.vendor_opt, command=self.command_button_01)
+		self.command_01.config(height=2, width=30)
+		self.command_01.grid(row=0, column=1, sticky=tk.W+tk.E+tk.N+tk.S)
+
+
+		## User Data Selections - DataType
+		self.dtype     = tk.StringVar()
+		self.dtype.set('First Select Vendor')
+		self.dtype_opt = ['Siemens TWIX (.dat)' ,  											# Siemens Twix  (.dat)
+						  'Siemens Dicom (.ima)',  											# Siemens Dicom (.ima)
+						  'Philips (.spar)'     ,  											# Philips SPAR  (.sdat or .data/.list)
+						  'GE (.7)'             ,  											# GE      Pfile (.7)
+						  'Bruker (method)'     ,  											# Bruker  method
+						  'Bruker (2dseq)'      ]  											# Bruker  2dseq
+		self.command_02 = tk.OptionMenu(self.command_frame, self.dtype, *self.dtype_opt, command=self.command_button_02)
+		self.command_02.config(height=2, width=30)
+		self.command_02.grid(row=0, column=2, sticky=tk.W+tk.E+tk.N+tk.S)
+
+
+		## Instantiate Vendor and Dtype
+		self.vendor_selection = ''
+		self.dtype_selection  = ''
+
+
+		## Button Commands
+		self.run_frame = tk.Frame(self.frame, borderwidth=5)
+		self.run_frame.grid(row=10, column=0, columnspan=2, rowspan=1)
+		self.run_frame.config(bg='white')
+
+
+		## Run Script
+		self.command_03 = tk.Button(self.run_frame, text='Run', width = 30, command=self.command_button_03)
+		self.command_03.config(height=2, width=60)
+		self.command_03.grid(row=0, column=5, sticky=tk.W+tk.E+tk.N+tk.S)
+		self.update()
+
+
+	## Import Button Function
+	def import_file(self):
+		filepath = filedialog.askopenfilename()  											# Open File Explorer
+		filepath = filepath.replace('\\', '/') 												# Replace any Windows' backslashes
+
+		filepath = (filepath.replace('.SDAT', '.SPAR') if '.SDAT' in filepath else  		# Must be .spar - User gave .sdat
+					filepath.replace('.sdat', '.spar'))
+		filepath = (filepath.replace('.DATA', '.SPAR') if '.DATA' in filepath else   		# Must be .spar - User gave .data
+					filepath.replace('.data', '.spar'))
+		filepath = (filepath.replace('.LIST', '.SPAR') if '.LIST' in filepath else   		# Must be .spar - User gave .list
+					filepath.replace('.list', '.spar'))
+
+
+		if os.path.exists(filepath): 														# Ensure Path Exists
+			self.import_fpath = copy.deepcopy(filepath) 									# Import Path
+			self.export_fpath = os.path.dirname(filepath)
+			exp_fpath         = copy.deepcopy(self.export_fpath)
+
+			if len(filepath) > 60:
+				self.import_label['text'] = (  filepath[:30 ] + ' ... '  
+				 							 + filepath[-30:]        ) 						# Shorten Import Path Display
+
+				self.export_label['text'] = (  exp_fpath[:30 ] + ' ... '  
+				 							 + exp_fpath[-30:]        ) 					# Shorten Import Path Display
+
+			else:
+				self.export_fpath         = copy.deepcopy(exp_fpath)
+				self.import_label['text'] = filepath				 						# Display Import Path
+				self.import_label['text'] = filepath				 						# Display Import Path
+				# self.export_label['text'] = '{}_MRSinMRS.csv'.format(filepath.split('.')[0])# Display Updated Expport Path
+
+			self.command_03['text'] = 'Run' 												# Update Text
+			print('Import file:', filepath) 												# 
+
+	## Export Button Function
+	def export_file(self):
+		filepath = filedialog.askdirectory() 												# Open File Explorer
+		filepath = filepath.replace('\\', '/') 												# Replace any Windows' backslashes
+
+		if os.path.exists(filepath):
+			self.export_fpath         = copy.deepcopy(filepath) 							# Export Path
+		
+			if len(filepath) > 60: 															# Export Path is Long
+				self.export_label['text'] = (  filepath[ :30] + '...'  						# 
+				 							 + filepath[-30:]        ) 						# Shorten Export Path Display
+			else:
+				self.export_label['text'] = filepath 										# Display Full Export Path
+
+		print('Export file:', filepath)														# 
+
+
+	## Vendor Selection Button Function
+	def command_button_01(self, selection):
+		print('Selected: ', selection) 														# User Selected Vendor  
+		
+		self.vendor_selection = selection
+
+		if selection.lower() == 'siemens': 													# Siemens
+			self.dtype.set('{}: Select Twix (.dat) or Dicom (.ima)'.format(selection)) 		# Twix
+
+		elif selection.lower() == 'philips': 												# Philips
+			self.dtype.set('{}: Select (.spar) for .sdat or raw data'.format(selection)) 	# SDAT/SPAR and Data/List
+
+		elif selection.lower() == 'ge': 													# GE
+			self.dtype.set('{}: Select Pfile (.7)'.format(selection))						# PFile
+
+		elif selection.lower() == 'bruker': 												# Bruker
+			self.dtype.set('{}: Select (method OR 2dseq)'.format(selection))				# 2dseq
+
+
+	## Datatype Selection Button Function
+	def command_button_02(self, selection):
+		print('Selected: ', selection) 														# User Selected Datatype        
+
+															 								# Vendor Matched to avoid misclicks
+		vendor_dtypes = {'siemens': ['Siemens TWIX (.dat)'  , 								# Siemens Twix .dat
+									 'Siemens Dicom (.ima)' ], 								# Siemens Dicom .ima
+						 'philips': ['Philips (.spar)'      ],								# Philips sdat/spar or data/list
+						 'ge'     : ['GE (.7)'              ], 								# GE Pfile
+						 'bruker' : ['Bruker (method)'      , 								# Bruker Method File
+						 			 'Bruker (2dseq)'       ]} 								# Bruker 2dseq
+		
+		vendor_dtypes = vendor_dtypes[self.vendor_selection.lower()] 						# Current Vendor Datatypes
+
+		if selection not in vendor_dtypes: 													# User accidentally selected wrong datatype
+			self.command_03['text'] = 'Please Select Appropriate Datatype' 					# Update Text
+			return
+
+		self.dtype_selection = selection 													# Datatype Selection
+		self.dtype.set(selection) 															# Set the Datatype Text Display
+
+		self.dtype_selection = self.dtype_selection.lower()  								# Lowercase
+		self.dtype_selection = self.dtype_selection.split('(')[1] 							# Split off filetype
+		self.dtype_selection = self.dtype_selection.split(')')[0] 							# Split off filetype
+		self.dtype_selection = self.dtype_selection.replace('/', '_') 						# Remove / if spar/sdat 
+		self.dtype_selection = self.dtype_selection.replace('.', '') 						# Remove any period preceding extension
+
+	## Running the Script Button
+	def command_button_03(self):
+
+		self.command_03['text'] = 'Running...' 												# Update Text
+
+		## Update Button Selections
+		possible_vendors = ['siemens', 'philips', 'ge', 'bruker'] 							# Currently Supported Vendors 
+		if self.vendor_selection.lower() not in possible_vendors: 							# User dit not Select Supported Vendors 
+			self.command_03['text'] = 'Please select Vendor and Datatype' 					# Update Text
+			return
+
+		possible_dtypes  = ['spar', 'dat', '7', 'method', '2dseq']							# Currently Supported Datatypes 
+		if self.dtype_selection.lower()  not in possible_dtypes:							# User did not Select Supported Datatypes
+			self.command_03['text'] = 'Please select Datatype' 								# Update Text
+			return
+
+
+		## Filenames
+		if os.path.isdir(self.export_fpath): 												# Determine if Path or .csv
+			pname = self.export_fpath 														# Selected Path Name
+		else:
+			pname = os.path.dirname(self.export_fpath) 										# Selected Path Name
+
+		iname = self.import_fpath[:].split('/')[-1] 										# Get the Filename
+		fname = self.import_fpath[:].split('/')[-1] 										# Get the Filename
+
+		oname = '' 																			# This will be the Output file name
+		if len(fname.split('.')[0]) == 2: 													# Ensure user doesn't include . in filename
+			oname = fname.split('.')[0] 	 												# Remove file extension
+		else:  																				# User includes . in filename
+			fname_ = fname.split('.')[:-1] 													# Remove extension
+			for ii in range(len(fname_)): 													# Iterate back through fname pieces
+				oname = '{}{}'.format(oname, fname_[ii]) 									# Recombine into oname
+
+
+		## Setup Log File
+		if self.lwrite: 																	# Create a Logfile
+			log = setup_log(oname, '{}/{}_Log.log'.format(pname, oname)) 					# Log File
+		else:
+			log = None 																		# User Selected Not to Create Log File
+
+
+		## Begin Writing Log File 
+		write_log(log, ' ') 																# Log - Intentional Empty Line
+		write_log(log, '--'*30)  															# Log - Dashed Line to Separate Entries
+		write_log(log, 'Reproducibility Made Easy is Starting..') 							# Log - Reproducibility Made Easy
+
+		if self.exe == True:
+			write_log(log, 'Software Running with Application') 							# Log - Running from Application
+			write_log(log, 'Software Directory: {}'.format(self.cwd)) 						# Log - Running from Application
+		else:
+			write_log(log, 'Software Running from Command Line') 							# Log - Running from the Command Line
+			write_log(log, 'Software Directory: {}'.format(self.cwd)) 						# Log - Running from Application
+
+		write_log(log, ' ') 																# Log - Intentional Empty Line
+		write_log(log, 'Base Dir : {}'.format(pname))  										# Log - Base Directory
+		write_log(log, 'Filename : {}'.format(iname))										# Log - Filename
+		write_log(log, 'Out Dir  : {}'.format(pname))										# Log - Export Directory
+		write_log(log, 'Out Name : {}.csv'.format(oname))									# Log - Export Filename (without extension)
+		write_log(log, 'Vendor   : {}'.format(self.vendor_selection)) 						# Log - Vendor Selected
+		write_log(log, 'Datatype : {}\n'.format(self.dtype_selection)) 						# Log - Datatype Selected
+
+
+		## Data Read using Spec2nii
+		write_log(log, 'Data Read: ') 														# Log - Intentional Empty Line
+		write_log(log, 'Data Read: Starting Data Read using spec2nii')  					# Log - Failed to Read Data
+		if (    (self.exe == False and isinstance(shutil.which('spec2nii'), str) == True) 	# spec2nii at command line
+		     or (self.exe == True)): 														# spec2nii from executable
+			write_log(log, 'Data Read: spec2nii is installed'             +					# Log - Successfully Read Data
+						   '\n\tNote** The Application version of '  	  +	
+						   'Reproducibility Made Easy comes with spec2nii'+
+						   ' installed.\n\tThis is intentional to make '  + 
+						   'this product usable for anyone\n\tHowever, '  +
+						   'this means the downloaded version may become '+
+						   'outdated...\n\tWe recommend re-installing '   +
+						   'if experiencing problems' 					  )
+
+			try: 																			# Try using spec2nii to Read Data
+				import_text  = self.import_fpath
+				if self.vendor_selection.lower() == 'siemens': 								# Siemens
+					if self.dtype_selection == 'dat': 										# Brukler Data Reader from Method file
+						write_log(log, 'Data Read: Siemens Twix uses pyMapVBVD ')			# Log - pyMapVBVD
+						MRSinMRS, log = self.DRead.siemens_twix(import_text, log) 			# Siemens Data Reader from mapVBVD
+
+					if self.dtype_selection == 'ima': 										# Brukler Data Reader from Method file
+						write_log(log, 'Data Read: Siemens Dicom uses pydicom ')			# Log - pyDicom
+						MRSinMRS, log = self.DRead.siemens_ima(import_text, log) 			# Siemens Data Reader from mapVBVD
+
+				elif self.vendor_selection.lower() == 'philips': 							# Philips 
+					MRSinMRS, log = self.DRead.philips_spar(import_text, log)				# Philips .spar Reader from spec2nii
+					
+				elif self.vendor_selection.lower() == 'ge': 								# GE
+					MRSinMRS, log = self.DRead.ge_7(import_text, log) 						# GE Data Reader from spec2nii
+
+				elif self.vendor_selection.lower() == 'bruker': 							# Bruker
+					if self.dtype_selection == 'method': 									# Brukler Data Reader from Method file
+						MRSinMRS, log = self.DRead.bruker_2dseq(import_text, log) 			# Brukler Data Reader from Method file
+					
+					elif self.dtype_selection == '2dseq':
+						write_log(log, 'Data Read: Bruker uses BrukerAPI '    + 			# Log - BrukerAPI
+									   'developed by Tomáš Pšorn\n\t'         +				# Log - BrukerAPI Creator
+									   'github.com/isi-nmr/brukerapi-python'  )				# Log - BrukerAPI Address
+						MRSinMRS, log = self.DRead.bruker_2dseq(import_text, log) 			# Brukler Data Reader from BrukerAPI
+
+				write_log(log, 'Data Read: Completed\n') 									# Log - Successfully Read Data
+
+			except Exception as e: 															# Data Reader Failed
+				write_log(log, 'Data Read: Failed ** **')  									# Log - Failed to Read Data
+				write_log(log, 'Data Read: Error - {}\n'.format(e))  						# Log - Error
+
+		else:
+			d1 = 'aarongudmundsonphd@gmail.com'  											# Aaron Gudmundson, PhD
+			d2 = 'antonia.kaiser@epfl.ch'  													# Antonia Kaiser, PhD
+			d3 = 'asusnjar@mgh.harvard.edu'  												# Antonia Susjnar, PhD
+			write_log(log, 'spec2nii : spec2nii was not found..'          + 				# Log - Successfully Read Data
+						   '\n\tNote** The Application version of '  	  +	
+						   'Reproducibility Made Easy comes with spec2nii'+
+						   ' installed.\n\tHowever, it is not being '     +
+						   'located during runtime..\n\tPlease contact '  +
+						   'the developers:'             				  +
+						   '\n\t\t{}\n\t\t{}\n\t\t{}'.format(d1, d2, d3)  )
+
+
+		write_log(log, 'Table    :') 																# Log - 
+		## Check for Missing MRSinMRS Values that might have different names across versions
+		try:
+			MRSinMRS = self.Table.table_clean(self.vendor_selection, self.dtype_selection, MRSinMRS)
+			write_log(log, 'Table    : table_clean Successful') 							# Log - Failed to Populate Table
+		except Exception as e:
+			write_log(log, 'Table    : table_clean Failed') 								# Log - Failed to Populate Table
+			write_log(log, 'Table    : table_clean Error - {}'.format(e))  					# Log - Error
+
+
+		## Populate MRS Table
+		try:
+			self.Table.populate(self.vendor_selection, self.dtype_selection, MRSinMRS)
+			write_log(log, 'Table    : populate table Successful') 							# Log - Successfully Populated Table
+		except Exception as e:
+			write_log(log, 'Table    : populate table Failed') 								# Log - Failed to Populate Table
+			write_log(log, 'Table    : populate table Error - {}'.format(e))  				# Log - Error
+
+
+		## Export Table as .csv
+		csvname = '{}/{}_Table.csv'.format(pname, oname) 									# Name of .csv file
+		csvcols = ['Header', 'SubHeader', 'MRSinMRS', 'Values'] 							# Columns to Include in Output .csv
+
+		self.Table.MRSinMRS_Table[csvcols].to_csv(csvname) 									# Create .csv
+		write_log(log, 'Table    : Created MRSinMRS Table as .csv file\n') 					# Log - Failed to Populate Table
+
+
+		## Export LaTeX .pdf
+		write_log(log, 'LaTeX PDF: ') 														# Log - Intentional Empty Line
+		write_log(log, 'LaTeX PDF: Starting LaTeX to PDF') 									# Log - Starting LaTeX
+		try:
+
+			LaTeX_dir   = '{}/LaTeX_Extras'.format(pname) 									# LaTeX Extras Directory Name
+			os.mkdir(LaTeX_dir) 	 														# Store all the LaTeX Files									
+
+			## LaTeX File
+			latex_name  = '{}/{}.tex'.format(LaTeX_dir, oname) 								# LaTeX Filename
+			latex_content,errors = self.Table.table_to_latex() 								# Read LaTeX Template
+			if len(errors) > 1:
+				write_log(log, 'LaTeX PDF: Replaced LaTeX Content w/Errors:') 				# Log - Read LaTeX w/Errors
+				write_log(log, errors) 														# Log - Log the Errors
+			else:
+				write_log(log, 'LaTeX PDF: Replaced LaTeX Content without Errors') 			# Log - Successfully Read LaTeX
+
+			with open(latex_name, 'w') as f: 												# Create Tex File in Subject's Directory
+				f.write(latex_content) 														# Write Content to Subject's LaTeX File
+			write_log(log, 'LaTeX PDF: Created LaTeX File') 								# Log - Successfully Wrote New LaTeX
+
+
+			## Control File
+			bcf_name        = '{}/MRSinMRS.bcf'.format(self.cwd) 							# LaTeX Control File Template
+			with open(bcf_name, 'r') as f: 													# Open LaTeX Control File Template
+				bcf_content = f.read() 														# Read LaTeX Control File Template
+
+			bcf_name    = '{}/{}.bcf'.format(LaTeX_dir, oname) 								# LaTeX Control File Filename
+			bib_name    = '{}/{}.bib'.format(LaTeX_dir, oname) 								# LaTeX Bibliography Filename
+			bcf_content = bcf_content.replace('/MRSinMRS.bib', bib_name) 					# Replace Generic Bilbiography Name
+			with open(bcf_name, 'w') as f: 													# Create LaTeX Control File in Subject Directory
+				f.write(bcf_content) 														# Write LaTeX Control File in Subject Directory
+			write_log(log, 'LaTeX PDF: Created LaTeX Control file') 						# Log - Successfully Created PDF
+
+
+			## LaTeX Extra Files
+			shutil.copy('{}/MRSinMRS.aux'.format(self.cwd),  								# Generic LaTeX Auxilliary File
+						'{}/{}.aux'.format(LaTeX_dir, oname)) 								# Subject LaTeX Auxilliary File
+
+			shutil.copy('{}/MRSinMRS.bbl'.format(self.cwd),   								# Generic LaTeX Bibliography-formatted LaTeX
+					    '{}/{}.bbl'.format(LaTeX_dir, oname)) 								# Subject LaTeX Bibliography-formatted LaTeX
+
+			shutil.copy('{}/MRSinMRS.bib'.format(self.cwd),   								# Generic LaTeX Bibliography File
+						'{}/{}.bib'.format(LaTeX_dir, oname)) 								# Subject LaTeX Bibliography File
+			
+			shutil.copy('{}/MRSinMRS.blg'.format(self.cwd),   								# Generic LaTeX Bibliography Log File
+						'{}/{}.blg'.format(LaTeX_dir, oname)) 								# Subject LaTeX Bibliography Log File
+
+			write_log(log, 'LaTeX PDF: Copied LaTeX Extra Files') 							# Log - Successfully Created PDF
+
+
+			## Running PDFLaTeX
+			if isinstance(shutil.which('pdflatex'), str) == True: 							# Check User has LaTeX Installed
+				write_log(log, 'LaTeX PDF: PDFLaTeX is installed') 							# Log - Successfully Created PDF
+
+				script = 'pdflatex -interaction=nonstopmode'
+				script = '{} {}.tex > /dev/null 2>&1'.format(script, oname) 				# PDFLaTeX Script to call 
+				P = subprocess.run(script, cwd=LaTeX_dir, shell=True) 						# Run PDFLaTeX Script
+				write_log(log, 'LaTeX PDF: Created PDF from LaTeX') 						# Log - Successfully Created PDF
+
+				shutil.move('{}/{}.tex'.format(LaTeX_dir, oname), pname) 					# Move LaTeX PDF to Subject Direcctory
+				write_log(log, 'LaTeX PDF: Moved Tex to Subject Directory') 				# Log - Successfully Created PDF
+
+				shutil.move('{}/{}.pdf'.format(LaTeX_dir, oname), pname) 					# Move LaTeX PDF to Subject Direcctory
+				write_log(log, 'LaTeX PDF: Moved PDF to Subject Directory\n') 				# Log - Successfully Created PDF
+
+			else: 																			# User does not have LaTeX installed
+				write_log(log, 'LaTeX PDF: PDFLaTeX is not installed\n' + 					# Log - pdflatex not installed
+							   'visit https://www.latex-project.org/get\n') 				# Log - pdflatex download page
+
+		except Exception as e:
+			write_log(log, 'LaTeX PDF: Failed Error Below') 								# Log - Failed to Populate Table
+			write_log(log, 'LaTeX PDF: Error - {}\n'.format(e))  							# Log - Error
+
+
+		write_log(log, 'Reproducibility Made Easy has Completed!') 							# Log - Failed to Populate Table
+		write_log(log, '--'*30)  															# Log - Dashed Line to Separate Entries
+		self.command_03['text'] = 'Completed!' 												# Note Completion
+
+if __name__ == '__main__':
+	app = Application(lwrite=True)
+	app.mainloop()
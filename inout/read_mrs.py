@@ -1,17 +1,18 @@
 import os
 import numpy
-import mapvbvd
+import json
 import suspect.io
-import pydicom.dicomio
-import nibabel, json
 from suspect import MRSData
 from suspect.io._common import complex_array_from_iter
 from suspect.io.twix import calculate_orientation
 from suspect._transforms import rotation_matrix
 from .read_header import DataReaders
+from .csi_volume import CSIVolume
 import interface.utils as utils
 
-def load_file(filepath):
+RDA_HEADER_END = ">>> End of header <<<".encode('utf-8')
+
+def load_file(filepath, memmap=False):
     header = None
     ext = os.path.splitext(filepath)[-1][1:].lower()
     if ext == "ima":
@@ -23,8 +24,7 @@ def load_file(filepath):
         if header["Nucleus"] != "1H":
             data.ppm0 = 0
     elif ext == "dat":
-        data = loadVBVD(filepath)
-        header, _ = DataReaders().siemens_twix(filepath, None)
+        data, header = loadVBVD(filepath, memmap=memmap) # data and header from the same parse
     elif ext == "sdat":
         data = suspect.io.load_sdat(filepath, None) # should find .spar
         spar = filepath.lower()[:-5] + ".spar"
@@ -35,6 +35,11 @@ def load_file(filepath):
     elif ext == "nii" or filepath.endswith(".nii.gz"):
         data, header = load_nifti(filepath) # no nii in DataReaders
         ext = "nii"
+    elif ext == "npz":
+        from .step_store import StepStore
+        store = StepStore(filepath)
+        try: data, _, header = store.load() # last stored step
+        finally: store.close() # releases the .npz file, which Windows keeps locked while it is open
     else:
         return None, None, None, None
     vendor = None
@@ -43,17 +48,27 @@ def load_file(filepath):
     if not isinstance(data, list): data = [data]
     return data, header, ext, vendor
 
-def loadVBVD(filepath):
+def loadVBVD(filepath, memmap=False):
+    """
+    Returns the list of FIDs and the MRSinMRS header dict, both from a single mapVBVD parse of the file.
+    With memmap, the raw data is gathered from a memory map of the file (see read_twix_memmap).
+    """
+    import mapvbvd
     twixobj = mapvbvd.mapVBVD(filepath, quiet=True)
     if isinstance(twixobj, list):
         if len(twixobj) == 1: twixobj = twixobj[0]
-        if len(twixobj) == 2: twixobj = twixobj[1] # twixobj[0] is reference noise
+        elif len(twixobj) == 2: twixobj = twixobj[1] # twixobj[0] is reference noise
         else:
             utils.log_error("Multiple acquisitions found in Twix file.")
-            return None
+            return None, None
+    header, _ = DataReaders().siemens_twix(filepath, None, twixHd=twixobj.hdr)
 
     twixobj.image.removeOS = False
-    data = twixobj.image['']
+    data = None
+    if memmap:
+        try: data = read_twix_memmap(twixobj.image, filepath)
+        except Exception as e: utils.log_debug(f"Memory-mapped Twix reading failed, using mapVBVD: {e}")
+    if data is None: data = twixobj.image['']
     data = numpy.squeeze(data)
     axes = twixobj.image.sqzDims
     # print(axes, data.shape)
@@ -86,7 +101,34 @@ def loadVBVD(filepath):
         "ave_per_rep": ave_per_rep
     }
     
-    return [MRSData(data[i], dt, f0, te=te, tr=tr, transform=transform, metadata=metadata) for i in range(data.shape[0])] # separate repetitions
+    return [MRSData(data[i], dt, f0, te=te, tr=tr, transform=transform, metadata=metadata) for i in range(data.shape[0])], header # separate repetitions
+
+def read_twix_memmap(image, filepath):
+    """
+    Same array as image[''] with removeOS off, gathered in one indexing operation from a memory map of the file
+    instead of reading the readouts one by one, so that only the pages holding the samples are read.
+    Returns None if the layout is not the plain one assumed here (constant readout size, no reflected lines).
+    """
+    if image.softwareVersion == 'vb': scan_header, channel_header = 0, 128 # bytes
+    else: scan_header, channel_header = 192, 32
+    ncol, ncha = numpy.unique(image.NCol), numpy.unique(image.NCha)
+    if len(ncol) != 1 or len(ncha) != 1: return None
+    if numpy.any(getattr(image, "IsReflected", False)): return None
+    ncol, ncha = int(ncol[0]), int(ncha[0])
+    size = [int(s) for s in image.dataSize]
+    if size[0] != ncol or size[1] != ncha: return None
+    counters = [numpy.atleast_1d(numpy.asarray(getattr(image, dim), dtype=int)) for dim in image.dataDims[2:]] # Lin, Par, Sli, Ave, ...
+    if any(numpy.any(c < 0) or numpy.any(c >= n) for c, n in zip(counters, size[2:])): return None
+    mempos = numpy.atleast_1d(numpy.asarray(image.memPos, dtype=numpy.int64))
+    offsets = mempos[:, None] + scan_header + numpy.arange(ncha) * (channel_header + 8 * ncol) + channel_header
+    if numpy.any(offsets % 4 != 0): return None
+    mm = numpy.memmap(filepath, dtype=numpy.float32, mode='r', shape=(os.path.getsize(filepath) // 4,))
+    raw = mm[(offsets // 4)[..., None] + numpy.arange(2 * ncol)] # (readouts, channels, 2 * samples)
+    samples = (raw[..., 0::2] + 1j * raw[..., 1::2]).astype(numpy.complex64)
+    data = numpy.zeros(size, dtype=numpy.complex64)
+    data[(slice(None), slice(None)) + tuple(counters)] = numpy.transpose(samples, (2, 1, 0))
+    del mm
+    return numpy.squeeze(data)
 
 def get_transform(twixobj):
     pos_sag = twixobj.hdr["Config"]["VoI_Position_Sag"]
@@ -145,6 +187,7 @@ def transformation_matrix(x_vector, y_vector, translation, spacing):
 
 # adapted from suspect.io.load_dicom
 def load_dicom(filename):
+    import pydicom.dicomio
     dataset = pydicom.dicomio.read_file(filename)
     sw = dataset[0x0018, 0x9052].value
     dt = 1.0 / sw
@@ -162,7 +205,8 @@ def load_dicom(filename):
     data = complex_array_from_iter(data_iter, shape=data_shape, chirality=-1)
     return MRSData(data, dt, f0=f0, te=te, tr=tr, ppm0=ppm0)
 
-def load_rda(filepath):
+def parse_rda_header(headerstr):
+    """Returns the header dict and the acquisition parameters (dt, tr, te, f0, vector_size, CSIMatrix_Size) of an .rda header"""
     header = {}
     dt = None
     tr = None
@@ -170,11 +214,6 @@ def load_rda(filepath):
     f0 = None
     vector_size = None
     CSIMatrix_Size = [0, 0, 0]
-    filebytes = open(filepath, 'rb').read()
-    headerend = filebytes.find(">>> End of header <<<".encode('utf-8')) + 21
-    headerstr = filebytes[:headerend].decode('utf-8')
-    data = filebytes[headerend:]
-    data = data[len(data) % 16:]
     for line in headerstr.split('\n'):
         if line.startswith('Nucleus: '):
             header["Nucleus"] = line.split(':')[1].strip()
@@ -210,6 +249,15 @@ def load_rda(filepath):
             CSIMatrix_Size[2] = int(line.split(':')[1].strip())
             header["CSIMatrix_Size[2]"] = CSIMatrix_Size[2]
             continue
+    return header, (dt, tr, te, f0, vector_size, CSIMatrix_Size)
+
+def load_rda(filepath):
+    filebytes = open(filepath, 'rb').read()
+    headerend = filebytes.find(RDA_HEADER_END) + len(RDA_HEADER_END)
+    headerstr = filebytes[:headerend].decode('utf-8')
+    data = filebytes[headerend:]
+    data = data[len(data) % 16:]
+    header, (dt, tr, te, f0, vector_size, CSIMatrix_Size) = parse_rda_header(headerstr)
     
     utils.log_info(f"CSIMatrix_Size: {CSIMatrix_Size}")
 
@@ -238,13 +286,30 @@ def load_rda(filepath):
 
 
     # assert data.size == vector_size
+    if data.ndim > 1:
+        return CSIVolume(data, dt, f0=f0, te=te, tr=tr, ppm0=ppm0), header
     return MRSData(data, dt, f0=f0, te=te, tr=tr, ppm0=ppm0), header
 
 
+def nifti_mrs_extension(img):
+    """JSON header extension (code 44) of a NIfTI-MRS image"""
+    hdr_ext_codes = img.header.extensions.get_codes()
+    return json.loads(img.header.extensions[hdr_ext_codes.index(44)].get_content())
+
+def nifti_mrs_header(mrs_hdr_ext):
+    header = {}
+    header["Nucleus"] = mrs_hdr_ext["ResonantNucleus"][0]
+    header["Sequence"] = None
+    if "SequenceName" in mrs_hdr_ext:
+        header["Sequence"] = mrs_hdr_ext["SequenceName"]
+    elif "siemens_sequence_info" in mrs_hdr_ext and "sequence" in mrs_hdr_ext["siemens_sequence_info"]:
+        header["Sequence"] = mrs_hdr_ext["siemens_sequence_info"]["sequence"]
+    return header
+
 def load_nifti(filepath):
+    import nibabel
     img: nibabel.nifti2.Nifti2Image = nibabel.load(filepath)
-    hdr_ext_codes = img.header.extensions.get_codes()
-    mrs_hdr_ext = json.loads(img.header.extensions[hdr_ext_codes.index(44)].get_content())
+    mrs_hdr_ext = nifti_mrs_extension(img)
 
     if img.header.get_value_label("datatype") == "complex128":
         data = img.get_fdata(dtype=numpy.complex128)
@@ -298,13 +363,7 @@ def load_nifti(filepath):
     except:
         utils.log_error("Repetition time time not found in header extension")
 
-    header = {}
-    header["Nucleus"] = mrs_hdr_ext["ResonantNucleus"][0]
-    header["Sequence"] = None
-    if "SequenceName" in mrs_hdr_ext:
-        header["Sequence"] = mrs_hdr_ext["SequenceName"]
-    elif "siemens_sequence_info" in mrs_hdr_ext and "sequence" in mrs_hdr_ext["siemens_sequence_info"]:
-        header["Sequence"] = mrs_hdr_ext["siemens_sequence_info"]["sequence"]
+    header = nifti_mrs_header(mrs_hdr_ext)
     
     transform = numpy.array(img.header.get_best_affine())
     metadata = {
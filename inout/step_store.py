@@ -0,0 +1,90 @@
+import os
+import json
+import zipfile
+import numpy as np
+from inout.io_mrsdata import pack_mrsdata, unpack_mrsdata
+from inout.io_lcmodel import save_raw
+
+# All intermediate data of a run in one .npz file instead of one .RAW file per FID and step.
+# Each step is appended as "<step>_<name>/data.npy", "wref.npy" (FIDs stacked when they have the same shape,
+# else one member per FID) and "meta.json" (acquisition parameters and header); np.load only reads
+# the members that are accessed, so single steps can be read back without loading the whole run.
+
+def _json_default(o):
+    if isinstance(o, np.ndarray): return o.tolist()
+    if isinstance(o, np.generic): return o.item()
+    return str(o)
+
+class StepStore:
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._npz = None
+
+    def close(self):
+        if self._npz is not None:
+            self._npz.close()
+            self._npz = None
+
+    def _write_fids(self, zf, prefix, fids):
+        if fids is None or len(fids) == 0: return None
+        packed = [pack_mrsdata(d) if d is not None else None for d in fids]
+        shapes = set(p[1].shape for p in packed if p is not None)
+        stacked = len(shapes) == 1 and all(p is not None for p in packed)
+        if stacked:
+            arrays = {prefix: np.stack([p[1] for p in packed])}
+        else:
+            arrays = {f"{prefix}_{i}": p[1] for i, p in enumerate(packed) if p is not None}
+        for name, array in arrays.items():
+            with zf.open(name + ".npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, np.ascontiguousarray(array), allow_pickle=False)
+        return {"count": len(fids), "stacked": stacked, "attrs": [p[2] if p is not None else None for p in packed]}
+
+    def add_step(self, nstep, name, data, wref=None, header=None):
+        """Appends the output of a step; called as each step completes"""
+        self.close()
+        prefix = f"{nstep:03d}_{name}"
+        meta = {"step": nstep, "name": name, "header": header}
+        with zipfile.ZipFile(self.filepath, "a", allowZip64=True) as zf:
+            meta["data"] = self._write_fids(zf, prefix + "/data", data)
+            meta["wref"] = self._write_fids(zf, prefix + "/wref", wref)
+            zf.writestr(prefix + "/meta.json", json.dumps(meta, default=_json_default, skipkeys=True))
+
+    def _open(self):
+        if self._npz is None: self._npz = np.load(self.filepath, allow_pickle=False)
+        return self._npz
+
+    def steps(self):
+        """(step, name) of the stored steps, in order"""
+        npz = self._open()
+        names = sorted(f[:-len("/meta.json")] for f in npz.zip.namelist() if f.endswith("/meta.json"))
+        return [(int(n.split("_", 1)[0]), n.split("_", 1)[1]) for n in names]
+
+    def _read_fids(self, prefix, meta):
+        if meta is None: return None
+        npz = self._open()
+        fids = []
+        for i, attrs in enumerate(meta["attrs"]):
+            if attrs is None:
+                fids.append(None)
+                continue
+            array = npz[prefix][i] if meta["stacked"] else npz[f"{prefix}_{i}"]
+            if attrs["transform"] is not None: attrs["transform"] = np.array(attrs["transform"])
+            fids.append(unpack_mrsdata((None, array, attrs)))
+        return fids
+
+    def load(self, nstep=-1):
+        """Returns the FIDs, water reference FIDs (or None) and header of a step; the last one by default"""
+        steps = self.steps()
+        if nstep < 0: nstep = steps[nstep][0]
+        prefix = [f"{s:03d}_{n}" for s, n in steps if s == nstep][0]
+        meta = json.loads(self._open()[prefix + "/meta.json"])
+        return self._read_fids(prefix + "/data", meta["data"]), self._read_fids(prefix + "/wref", meta["wref"]), meta["header"]
+
+    def export_raw(self, nstep, folder, seq=None):
+        """Writes the .RAW files of a step, as saved per step without the store"""
+        data, wref, _ = self.load(nstep)
+        if not os.path.exists(folder): os.makedirs(folder)
+        for i, d in enumerate(data or []):
+            if d is not None: save_raw(os.path.join(folder, f"{i}.RAW"), d, seq=seq)
+        for i, d in enumerate(wref or []):
+            save_raw(os.path.join(folder, f"wref_{i}.RAW"), d, seq=seq)
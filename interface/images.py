@@ -1,6 +1,10 @@
-from wx.lib.embeddedimage import PyEmbeddedImage
+# Base64 PNGs of the toolbar and window icons. The PyEmbeddedImage of a name is only created when it is
+# first accessed (images.run_img), and the PNG is only decoded when its bitmap is requested.
 
-folder_img = PyEmbeddedImage(
+_DATA = {}
+_images = {}
+
+_DATA["folder_img"] = (
     b'iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAYAAACqaXHeAAAAAXNSR0IArs4c6QAAAARnQU1B'
     b'AACxjwv8YQUAAAAJcEhZcwAADsAAAA7AAWrWiQkAAARXSURBVHhe7ZvfaxxVFMfPuTP7Y7am'
     b'3ST9hRKlCj6a4GOCKJSA1B+IPyDP/QMUEcQXX3ySfRCEKD6IvklbEfHXky0ifVGKRawSWltb'
@@ -25,7 +29,7 @@ folder_img = PyEmbeddedImage(
     b'xQIE0AE6HoyifUjXRC36oExnzfbqJs7z1kbsGKvrhmyxYx4o3NCGilSANm0B8IP0J8pPY+U3'
     b'3vb2eDye24XoX179mYl2+ccmAAAAAElFTkSuQmCC')
 
-pipeline_img = PyEmbeddedImage(
+_DATA["pipeline_img"] = (
     b'iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAYAAACqaXHeAAAAAXNSR0IArs4c6QAAAARnQU1B'
     b'AACxjwv8YQUAAAAJcEhZcwAADsEAAA7BAbiRa+0AAAPISURBVHhe7ZZZaFRXGMe/mWhNFIxr'
     b'taKgaCtiorXghsWNaFqLguCKby5Pvviq9sEHV/BFEASXvmk1EUQQXMCl0FCrIOqkFjSiKK5R'
@@ -47,7 +51,7 @@ pipeline_img = PyEmbeddedImage(
     b'1CLYdJXvN8amGN6pC21HenHRuqCSjXq6UExa4PZh1FvgJ0XzTHurgivWetQ2167JLRm90GiE'
     b'ii0jjZLmveM4juM4juM4juM4juM4juM4TjvA7B0MUyRk0nBPxwAAAABJRU5ErkJggg==')
 
-run_img = PyEmbeddedImage(
+_DATA["run_img"] = (
     b'iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAYAAACqaXHeAAAAAXNSR0IArs4c6QAAAARnQU1B'
     b'AACxjwv8YQUAAAAJcEhZcwAADsIAAA7CARUoSoAAABDtSURBVHhe7TsJkBzVdb/PuWdnZ2ZX'
     b'B0hCixaZFJVybcUQkaSCSEAgY8CyZBtk2TKhwJYJicGQVKUcF4krDkhGgnCGAhJvCYSwYmJ0'
@@ -132,7 +136,7 @@ run_img = PyEmbeddedImage(
     b'+Eua+HdtuOp3TT1/WsYoulpYfl2xKi99asnyUZQd9/CtLX8lp8T/w/8JYOx/AdFvpGZ8IFoB'
     b'AAAAAElFTkSuQmCC')
 
-terminate_img = PyEmbeddedImage(
+_DATA["terminate_img"] = (
     b'iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAYAAACqaXHeAAAAAXNSR0IArs4c6QAAAARnQU1B'
     b'AACxjwv8YQUAAAAJcEhZcwAADsEAAA7BAbiRa+0AABJOSURBVHhezVvbj11ndf/OPrc5M+N4'
     b'PLZjSOwEQoAINUiUCEJklVaoSRU5UiueqJqH+KFFgpSXqBWPVdsXxB+A1EdeWiIEaiUakJqL'
@@ -223,7 +227,7 @@ terminate_img = PyEmbeddedImage(
     b'trl+49P3yhe/iD/dllp4tSwPIynIhyBt4NYo71GzYfEvO2FTRf2ykIM/2mJBNhvys4YQMzgG'
     b'/50XjM8V/NdedT383LMGeDcrpf8BW3NpRu+G82cAAAAASUVORK5CYII=')
 
-autorun_img = PyEmbeddedImage(
+_DATA["autorun_img"] = (
     b'iVBORw0KGgoAAAANSUhEUgAAAFMAAABACAYAAABm8Es1AAAAAXNSR0IArs4c6QAAAARnQU1B'
     b'AACxjwv8YQUAAAAJcEhZcwAADsIAAA7CARUoSoAAABejSURBVHhe7TsJlFxVle8vtVd1VXdX'
     b'd2dpEsIiORzXWVAHl4CasAkkEIhk2IaTgSABAVlGYJiB6GAbtigDRJZIiGFXiCRploxCBkeU'
@@ -340,7 +344,7 @@ autorun_img = PyEmbeddedImage(
     b'Dp+/Xoo+2HDb6gvaCqvg3sHvbZf/buHN/P0F/gJ/gbEFIf4f8hjl6F1ZOH4AAAAASUVORK5C'
     b'YII=')
 
-pause_img = PyEmbeddedImage(
+_DATA["pause_img"] = (
     b'iVBORw0KGgoAAAANSUhEUgAAADYAAABACAYAAABRPoQBAAAAAXNSR0IArs4c6QAAAARnQU1B'
     b'AACxjwv8YQUAAAAJcEhZcwAADsIAAA7CARUoSoAAAA9JSURBVGhD5Vt3kJ1VFb+vbU+yqShk'
     b'0ggJIZkUCEQTCSAzDoSJQUEkytgY0SFUAwPSFUUzKjCGjgIWkLEgjFIcQRmHIhAGUBIICSEk'
@@ -417,7 +421,7 @@ pause_img = PyEmbeddedImage(
     b'pzcbO1eO7prsJtoev7vv26cl/l8R9dD5v32xYfMrL5+UzuZWUN4CdBG6VJZ0Nz547ZcfVcX/'
     b'Czn3HwqnoLosapxDAAAAAElFTkSuQmCC')
 
-icon_img_32 = PyEmbeddedImage(
+_DATA["icon_img_32"] = (
     b'iVBORw0KGgoAAAANSUhEUgAAACAAAAAgCAIAAAD8GO2jAAAAAXNSR0IArs4c6QAAAARnQU1B'
     b'AACxjwv8YQUAAAAJcEhZcwAADsMAAA7DAcdvqGQAAAXDSURBVEhL1ZZtTFNXGMfPube3LdRS'
     b'qLXagbGIKG4ycG6LhjgicUw0M8BmomSLg8ywLDObL0yyRLOFzBA/gINlX2aiqCzDTafGQTQp'
@@ -449,7 +453,7 @@ icon_img_32 = PyEmbeddedImage(
     b'ZMrOzt61a1c4iT1ifg+vMBcvXuzs7ITXA6in0Wgg78LSSUlJkiYz+S8O5sX//fGL0N+9b1Jv'
     b'm4LccgAAAABJRU5ErkJggg==')
 
-cibm_logo_img = PyEmbeddedImage(
+_DATA["cibm_logo_img"] = (
     b'iVBORw0KGgoAAAANSUhEUgAAAMgAAABxCAYAAACQnewjAAAAAXNSR0IArs4c6QAAAARnQU1B'
     b'AACxjwv8YQUAAAAJcEhZcwAADsMAAA7DAcdvqGQAAANDaVRYdFhNTDpjb20uYWRvYmUueG1w'
     b'AAAAAAA8P3hwYWNrZXQgYmVnaW49Iu+7vyIgaWQ9Ilc1TTBNcENlaGlIenJlU3pOVGN6a2M5'
@@ -640,7 +644,7 @@ cibm_logo_img = PyEmbeddedImage(
     b'+I2dDu805okCgUAgEAgEAoFAIBAIBAKBQCAQCAQCgUAgEAgEAoFAIBAIBLUTov8HiHsi8AZn'
     b'tA8AAAAASUVORK5CYII=')
 
-nplot_img = PyEmbeddedImage(
+_DATA["nplot_img"] = (
     b'iVBORw0KGgoAAAANSUhEUgAAAEwAAABMCAYAAADHl1ErAAAACXBIWXMAAA7EAAAOxAGVKw4b'
     b'AAAF8mlUWHRYTUw6Y29tLmFkb2JlLnhtcAAAAAAAPD94cGFja2V0IGJlZ2luPSLvu78iIGlk'
     b'PSJXNU0wTXBDZWhpSHpyZVN6TlRjemtjOWQiPz4gPHg6eG1wbWV0YSB4bWxuczp4PSJhZG9i'
@@ -800,3 +804,11 @@ nplot_img = PyEmbeddedImage(
     b'BEAEozrqXXLh1ubknk2QP1eiVCEIPFGcYUPfVOTuPExSRNqvrRbDdYEN9+NbkT8TiORfkKSp'
     b'wTu7HZWXGpt9y2f8utXyNxopMKc8N/cAB7D/+DMz6X84DhA2SxwgbJY4QNgscYCwWeIAYbPE'
     b'AcJmiQOEzRIHCJsl/guoQBZLkGVMYQAAAABJRU5ErkJggg==')
+
+def __getattr__(name):
+    if name not in _DATA:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if name not in _images:
+        from wx.lib.embeddedimage import PyEmbeddedImage
+        _images[name] = PyEmbeddedImage(_DATA[name])
+    return _images[name]
@@ -18,23 +18,18 @@ from inout.read_coord import ReadlcmCoord"""
 import wx
 import os
 import glob
-import inspect
-import importlib.util
+import filecmp
 import threading
 import pickle
 import shutil
 
 
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
-import nibabel as nib
-from scipy.ndimage import rotate, zoom
 #import cv2
 #from skimage import measure
 
 from interface.metabolite_map_frame import MetaboliteMapParameterDialog
-from processing.get_mapping import create_brain_mask
+from interface.map_cache import MapCache
 
 
 from interface import utils
@@ -43,6 +38,11 @@ from interface.fitting_frame import FittingFrame
 from interface.main_layout import LayoutFrame
 from interface.plot_helpers import plot_coord, get_coord_info#, plot_ext
 from processing.processing_pipeline import processPipeline, autorun_pipeline_exe
+from processing.step_cache import StepCache
+from processing.node_manifest import NodeManifest, register_nodes
+from processing.fit_cache import FitCache
+from processing import batch
+from processing.batch_ledger import BatchLedger, LEDGER_NAME
 from inout.read_coord import ReadlcmCoord
 from inout.group_files_by_header import group_files_by_header, group_water_files_by_header
 
@@ -64,6 +64,10 @@ class MainFrame(LayoutFrame):
         self.csf_file_user = None
 
         self.skip_manual_adjustment = False
+        self.lcmodel_workers = os.cpu_count() or 1 # number of LCModel fits run in parallel
+        self.batch_workers = batch.default_workers() # participants processed at the same time in batch mode
+        self.step_cache = None # skips unchanged steps on re-runs, see on_toggle_step_cache
+        self.fit_cache = None # skips unchanged LCModel fits, see on_toggle_fit_cache
 
         self.batch_mode = False      # Will be True when "Run in Batch Mode" is toggled.
         self.batch_folder = None     # Will store the path to the batch system folder.
@@ -76,6 +80,7 @@ class MainFrame(LayoutFrame):
             "vmax": None,
         }
 
+        self.map_cache = MapCache()
         self.brain_image = {
             "selected_img_path": None,
             "selected_img": None,
@@ -146,10 +151,12 @@ class MainFrame(LayoutFrame):
         self.Bind(wx.EVT_BUTTON, self.on_open_fitting, self.fitting_button)
         self.Bind(wx.EVT_TOGGLEBUTTON, self.on_show_debug, self.show_debug_button)
         self.Bind(wx.EVT_CHECKBOX, self.on_toggle_debug, self.debug_button)
+        self.Bind(wx.EVT_CHECKBOX, self.on_toggle_step_cache, self.cache_steps_button)
+        self.Bind(wx.EVT_CHECKBOX, self.on_toggle_fit_cache, self.cache_fits_button)
         self.Bind(wx.EVT_BUTTON, self.on_reload, self.reload_button)
         self.Bind(wx.EVT_SIZE, self.on_resize)
         self.Bind(wx.EVT_BUTTON, self.on_button_step_processing, self.button_step_processing)
-        self.Bind(wx.EVT_COMBOBOX, self.on_plot_box_selection)
+        self.Bind(wx.EVT_COMBOBOX, self.on_plot_box_selection, self.plot_box)
         self.Bind(wx.EVT_BUTTON, self.on_open_metabolite_map_plot, self.button_nplot)
 
         self.Bind(wx.EVT_BUTTON, self.on_create_batch, self.create_batch_button)
@@ -235,6 +242,8 @@ class MainFrame(LayoutFrame):
             for file_path in python_files:
                 file_name = os.path.basename(file_path)
                 destination_path = os.path.join(destination_folder, file_name)
+                if os.path.exists(destination_path) and filecmp.cmp(file_path, destination_path, shallow=False):
+                    continue # already copied, no new backup
 
 
                 # # Check if a file with the same name already exists
@@ -298,18 +307,10 @@ class MainFrame(LayoutFrame):
 
     def retrieve_steps(self):
         self.programpath = os.path.dirname(os.path.dirname(__file__))
-        processing_files = glob.glob(os.path.join(self.programpath, "nodes", "*.py"))
-        self.processing_steps = {}
-        for file in processing_files:
-            module_name = os.path.basename(file)[:-3]
-            if module_name.startswith("_"): continue
-            spec = importlib.util.spec_from_file_location(module_name, file)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            for name, obj in inspect.getmembers(module):
-                if inspect.isclass(obj) and obj.__module__ == module_name:
-                    obj = getattr(module, name)
-                    self.processing_steps[name] = obj
+        if getattr(self, "node_manifest", None) is None:
+            self.node_manifest = NodeManifest(os.path.join(self.programpath, "nodes"))
+        # node modules are imported when a node is placed or run; only changed files are reloaded
+        self.processing_steps = register_nodes(self.node_manifest)
 
     def update_statusbar(self):
         self.SetStatusText("Current pipeline: " + " → ".join(step.__class__.__name__ for step in self.steps))
@@ -353,8 +354,8 @@ class MainFrame(LayoutFrame):
         # Check if self.img_file_user has a valid path
         if self.brain_image["selected_img_path"] is not None:
             # Use the stored path from self.img_file_user
-            img = nib.load(self.brain_image["selected_img_path"])  # Load the image from the file path stored in self.img_file_user
-            return img.get_fdata()  # Get the data from the NIfTI file
+            import nibabel as nib
+            return self.map_cache.image(self.brain_image["selected_img_path"], lambda path: nib.load(path).get_fdata())
         else:
             utils.log_info(f"Image file is not set.")
 
@@ -389,21 +390,16 @@ class MainFrame(LayoutFrame):
         # Handle background image
         if self.brain_image["selected_img_path"]: 
             if self.brain_image["selected_img"] is not None:
+                background_slice = None
                 if self.brain_image["selected_img"].size > 0:
-                    views = {
-                        0: self.brain_image["selected_img"][self.brain_image['slice_index'], :, :],
-                        1: self.brain_image["selected_img"][:, self.brain_image['slice_index'], :],
-                        2: self.brain_image["selected_img"][:, :, self.brain_image['slice_index']]
-                    }
-                    background_slice = views.get(self.brain_image["selected_img_view"])
+                    background_key = (self.brain_image["selected_img"], self.brain_image["selected_img_path"], self.brain_image["selected_img_view"],
+                                      self.brain_image['slice_index'], self.brain_image["selected_img_rotation"])
+                    background_slice = self.map_cache.background(*background_key)
 
                 if background_slice is None:
                     utils.log_error("Selected image view is incorrect!")
                     return
 
-                background_slice = rotate(
-                    background_slice, self.brain_image["selected_img_rotation"], reshape=False, mode='nearest'
-                )
                 ax.imshow(background_slice, cmap='gray', interpolation='nearest')
 
         # Handle metabolite concentration map
@@ -416,8 +412,8 @@ class MainFrame(LayoutFrame):
             # If background exists, interpolate concentration map to match its size
             if self.brain_image["selected_img"] is not None and self.brain_image["selected_img"].size > 0:
                 background_height, background_width = background_slice.shape
-                concentration_masked = zoom(conc_map, (background_height / conc_map.shape[0], background_width / conc_map.shape[1]), order=1)
-                mask = create_brain_mask(background_slice)  # Assuming mask function exists
+                concentration_masked = self.map_cache.upsampled(conc_map, (background_height, background_width))
+                mask = self.map_cache.mask(*background_key)
                 concentration_masked = np.where(mask == 1, concentration_masked, np.nan)
 
             cax = ax.imshow(concentration_masked, cmap='coolwarm', interpolation='nearest', alpha=1, vmin=self.param["vmin"], vmax=self.param["vmax"])
@@ -453,6 +449,8 @@ class MainFrame(LayoutFrame):
                 utils.log_error(f"Could not create folder {temp}")
                 return
         self.outputpath_base = temp
+        self.on_toggle_step_cache(None) # the caches are kept in the output folder
+        self.on_toggle_fit_cache(None)
 
     def on_open_fitting(self, event):
         self.fitting_frame.Show()
@@ -470,9 +468,37 @@ class MainFrame(LayoutFrame):
         self.Layout()
         if event is not None: event.Skip()
 
+    @property
+    def plot_dpi(self): # saved plots, rendered in the background (processing/plot_queue.py)
+        return int(self.plot_dpi_box.GetValue())
+
+    @property
+    def plot_format(self):
+        return self.plot_format_box.GetValue()
+
     def on_toggle_debug(self, event):
         utils.set_debug(self.debug_button.GetValue())
         if event is not None: event.Skip()
+
+    def on_toggle_step_cache(self, event):
+        self.step_cache = None
+        if self.cache_steps_button.GetValue():
+            folder = os.path.join(self.outputpath_base, "cache", "steps")
+            try: self.step_cache = StepCache(folder)
+            except Exception as e:
+                utils.log_error(f"Could not create folder {folder}: {e}")
+                self.cache_steps_button.SetValue(False)
+        if event is not None: event.Skip()
+
+    def on_toggle_fit_cache(self, event):
+        self.fit_cache = None
+        if self.cache_fits_button.GetValue():
+            folder = os.path.join(self.outputpath_base, "cache", "lcmodel")
+            try: self.fit_cache = FitCache(folder)
+            except Exception as e:
+                utils.log_error(f"Could not create folder {folder}: {e}")
+                self.cache_fits_button.SetValue(False)
+        if event is not None: event.Skip()
     
     def on_reload(self, event):
         self.copy_customer_processing_scripts()
@@ -488,7 +514,7 @@ class MainFrame(LayoutFrame):
         elif selected_item == "lcmodel":
             if os.path.exists(self.last_coord):
                 self.matplotlib_canvas.clear()
-                f = ReadlcmCoord(self.last_coord)
+                f = ReadlcmCoord(self.last_coord, cache=True)
                 plot_coord(f, self.matplotlib_canvas.figure, title=self.last_coord)
                 self.matplotlib_canvas.draw()
                 self.file_text.SetValue(f"File: {self.last_coord}\n{get_coord_info(f)}")
@@ -586,12 +612,7 @@ class MainFrame(LayoutFrame):
 
         try:
             # Only load subfolders that begin with "Participant" (case-insensitive).
-            self.batch_participants = [
-                os.path.join(self.batch_folder, d)
-                for d in os.listdir(self.batch_folder)
-                if os.path.isdir(os.path.join(self.batch_folder, d))
-                and d.lower().startswith("participant")
-            ]
+            self.batch_participants = batch.find_participants(self.batch_folder)
 
             count = len(self.batch_participants)
             wx.MessageBox(f"Loaded {count} participant folder{'s' if count != 1 else ''}.",
@@ -625,108 +646,49 @@ class MainFrame(LayoutFrame):
         import datetime
 
         prefix = datetime.datetime.now().strftime("%Y%m%d_%H%M%S") + "_output"
-        self.batch_study_folder = os.path.join(self.batch_folder, prefix)
-        os.mkdir(self.batch_study_folder)
-
-
-        basis_candidates = []
-        control_candidates = []
-
-        # We do a simple iteration over the batch folder
-        for fname in os.listdir(self.batch_folder):
-            fullpath = os.path.join(self.batch_folder, fname)
-            # Must be an actual file
-            if not os.path.isfile(fullpath):
-                continue
-            # Check extension
-            fname_lower = fname.lower()
-            if fname_lower.endswith(".basis"):
-                basis_candidates.append(fullpath)
-            elif fname_lower.endswith(".control"):
-                control_candidates.append(fullpath)
-
-        # If we found any .BASIS file with size > 0, pick the first
-        self.basis_file_user = None
-        if basis_candidates:
-            # Sort them or just pick the first
-            basis_candidates.sort()
-            first_basis = basis_candidates[0]
-            if os.path.getsize(first_basis) > 0:
-                self.basis_file_user = first_basis
-                utils.log_info(f"Using custom BASIS file for all participants: {first_basis}")
-
-        # If we found any .CONTROL file with size > 0, pick the first
-        self.control_file_user = None
-        if control_candidates:
-            control_candidates.sort()
-            first_control = control_candidates[0]
-            if os.path.getsize(first_control) > 0:
-                self.control_file_user = first_control
-                utils.log_info(f"Using custom CONTROL file for all participants: {first_control}")
-
+        study_folder = os.path.join(self.batch_folder, prefix) # only created if a participant has to be processed
+
+        # custom .BASIS and .CONTROL files of the batch folder are used for all participants
+        self.basis_file_user, self.control_file_user = batch.shared_files(self.batch_folder)
+        if self.basis_file_user is not None:
+            utils.log_info(f"Using custom BASIS file for all participants: {self.basis_file_user}")
+        if self.control_file_user is not None:
+            utils.log_info(f"Using custom CONTROL file for all participants: {self.control_file_user}")
+
+        # every participant is run from the saved pipeline in its own worker process
+        pipeline_filepath = os.path.join(self.batch_folder, "pipeline.pipe.tmp") # moved to the study folder below
+        self.pipeline_frame.on_save_pipeline(None, pipeline_filepath)
+        workers = self.batch_workers
+        options = dict(basis=self.basis_file_user, control=self.control_file_user,
+                       save_plots=self.save_plots_button.GetValue(), save_raw=self.save_raw_button.GetValue(),
+                       save_store=self.save_store_button.GetValue(), plot_dpi=self.plot_dpi, plot_format=self.plot_format,
+                       workers=max(1, self.lcmodel_workers // workers), fit_cache=self.fit_cache)
+        jobs = {}
         for part_folder in self.batch_participants:
-            try:
-                self.participant_name = os.path.basename(part_folder)
-
-                wx.CallAfter(self.reset)
-
-                import time
-
-                # For example, assume that metabolite files are in the "metabolite_files" subfolder
-                met_folder = os.path.join(part_folder, "metabolite_files")
-                water_folder = os.path.join(part_folder, "water_reference")
-                # Update file lists:
-                if os.path.exists(met_folder):
-                    met_files = [os.path.join(met_folder, f) for f in os.listdir(met_folder)
-                                if f.lower().endswith(tuple(utils.supported_files))]
-                    wx.CallAfter(self.MRSfiles.on_drop_files, met_files)
-                    time.sleep(0.5)
-                else:
-                    self.MRSfiles.on_drop_files([])
-                if os.path.exists(water_folder):
-                    water_files = [os.path.join(water_folder, f) for f in os.listdir(water_folder)
-                                if f.lower().endswith(tuple(utils.supported_files))]
-                    wx.CallAfter(self.Waterfiles.on_drop_files, water_files)
-                    time.sleep(0.5)
-                else:
-                    self.Waterfiles.on_drop_files([])
-
-                seg_folder = os.path.join(part_folder, "tissue_segmentation_files")
-                self.wm_file_user = None
-                self.gm_file_user = None
-                self.csf_file_user = None
-                if os.path.exists(seg_folder):
-                    seg_files = [
-                        os.path.join(seg_folder, f)
-                        for f in os.listdir(seg_folder)
-                        # You can refine this if you want only .nii or .nii.gz
-                    ]
-                    # For example, pick a file with 'wm' in its name
-                    for f in seg_files:
-                        fname_lower = os.path.basename(f).lower()
-                        if "wm" in fname_lower:
-                            self.wm_file_user = f
-                        elif "gm" in fname_lower:
-                            self.gm_file_user = f
-                        elif "csf" in fname_lower:
-                            self.csf_file_user = f
-
-                if len(self.MRSfiles.filepaths) == 0 and len(self.Waterfiles.filepaths) == 0:
-                    utils.log_warning("No input files found for participant " + self.participant_name + "; skipping.")
-                    continue
-
-                # Reset processing state for the new participant
-                
-                # You can choose auto-run mode for each participant
-                self.fast_processing = True
-                autorun_pipeline_exe(self)
-                
-                self.MRSfiles.clear()
-                self.Waterfiles.clear()
-                # Optionally wait for the current run to complete (or add a delay)
-                # You might want to update a progress indicator, etc.
-            except Exception as e:
-                utils.log_error(f"Processing failed for {part_folder}: {e}")
+            name = os.path.basename(part_folder)
+            job = batch.participant_job(part_folder, study_folder, pipeline_filepath, **options)
+            if job is None:
+                utils.log_warning("No input files found for participant " + name + "; skipping.")
+                continue
+            jobs[name] = job
+
+        # participants completed by a previous run with the same inputs and pipeline are skipped
+        ledger = BatchLedger(os.path.join(self.batch_folder, LEDGER_NAME))
+        jobs = batch.pending_jobs(jobs, ledger)
+        if len(jobs) == 0:
+            os.remove(pipeline_filepath)
+            ledger.close()
+            utils.log_info("All participants are already processed")
+            wx.MessageBox("All participants are already processed.", "Batch Mode", wx.OK | wx.ICON_INFORMATION)
+            return
+        self.batch_study_folder = study_folder
+        os.mkdir(self.batch_study_folder)
+        os.replace(pipeline_filepath, os.path.join(self.batch_study_folder, "pipeline.pipe"))
+        for job in jobs.values(): job["pipeline"] = os.path.join(self.batch_study_folder, "pipeline.pipe")
+        utils.log_info(f"Processing {len(jobs)} participants, {min(workers, len(jobs))} at a time")
+        for done, result in enumerate(batch.run_batch(jobs, workers, debug=utils.debug, ledger=ledger), 1):
+            batch.log_result(result, done, len(jobs))
+        ledger.close()
         wx.MessageBox("Batch processing complete.", "Batch Mode", wx.OK | wx.ICON_INFORMATION)
     
     def save_lastfiles(self):
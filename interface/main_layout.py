@@ -115,10 +115,37 @@ class LayoutFrame(wx.Frame):
         self.save_plots_button.SetMinSize((-1, 25))
         self.save_plots_button.SetToolTip("Toggle saving plots in the output folder")
 
+        self.plot_format_box = wx.ComboBox(self.right_panel, value="pdf", choices=["pdf", "png", "svg"], style=wx.CB_READONLY)
+        self.plot_format_box.SetMinSize((70, 25))
+        self.plot_format_box.SetToolTip("File format of the saved plots")
+
+        self.plot_dpi_box = wx.ComboBox(self.right_panel, value="600", choices=["150", "300", "600", "1200"], style=wx.CB_READONLY)
+        self.plot_dpi_box.SetMinSize((70, 25))
+        self.plot_dpi_box.SetToolTip("Resolution of the saved plots in dots per inch")
+
+        plot_options_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        plot_options_sizer.Add(self.plot_format_box, 0, wx.ALL, 2)
+        plot_options_sizer.Add(self.plot_dpi_box, 0, wx.ALL, 2)
+
         self.save_raw_button = wx.CheckBox(self.right_panel, wx.ID_ANY, "Save intermediate data files", style=wx.BORDER_NONE | wx.BU_LEFT)
         self.save_raw_button.SetValue(False)
         self.save_raw_button.SetMinSize((-1, 25))
         self.save_raw_button.SetToolTip("Toggle saving raw data in the output folder")
+
+        self.save_store_button = wx.CheckBox(self.right_panel, wx.ID_ANY, "Store intermediate data in one file", style=wx.BORDER_NONE | wx.BU_LEFT)
+        self.save_store_button.SetValue(False)
+        self.save_store_button.SetMinSize((-1, 25))
+        self.save_store_button.SetToolTip("Toggle saving the data of all steps in steps.npz instead of .RAW files")
+
+        self.cache_steps_button = wx.CheckBox(self.right_panel, wx.ID_ANY, "Skip unchanged steps", style=wx.BORDER_NONE | wx.BU_LEFT)
+        self.cache_steps_button.SetValue(False)
+        self.cache_steps_button.SetMinSize((-1, 25))
+        self.cache_steps_button.SetToolTip("Toggle reusing the results of unchanged steps from output/cache/steps when re-running a pipeline")
+
+        self.cache_fits_button = wx.CheckBox(self.right_panel, wx.ID_ANY, "Skip unchanged LCModel fits", style=wx.BORDER_NONE | wx.BU_LEFT)
+        self.cache_fits_button.SetValue(False)
+        self.cache_fits_button.SetMinSize((-1, 25))
+        self.cache_fits_button.SetToolTip("Toggle reusing the LCModel outputs of unchanged fits from output/cache/lcmodel")
         
         plot_label = wx.StaticText(self.right_panel, wx.ID_ANY, "Show plot of node:", style=wx.ALIGN_CENTRE_VERTICAL)
         plot_label.SetForegroundColour(wx.Colour(BLACK_WX))
@@ -129,7 +156,11 @@ class LayoutFrame(wx.Frame):
 
         plot_sizer = wx.BoxSizer(wx.VERTICAL)
         plot_sizer.Add(self.save_plots_button, 0, wx.ALL | wx.ALIGN_CENTER, 0)
+        plot_sizer.Add(plot_options_sizer, 0, wx.ALL | wx.ALIGN_CENTER, 0)
         plot_sizer.Add(self.save_raw_button, 0, wx.ALL | wx.ALIGN_CENTER, 0)
+        plot_sizer.Add(self.save_store_button, 0, wx.ALL | wx.ALIGN_CENTER, 0)
+        plot_sizer.Add(self.cache_steps_button, 0, wx.ALL | wx.ALIGN_CENTER, 0)
+        plot_sizer.Add(self.cache_fits_button, 0, wx.ALL | wx.ALIGN_CENTER, 0)
         plot_sizer.AddSpacer(5)
         plot_sizer.Add(plot_label, 0, wx.ALL | wx.ALIGN_CENTER, 0)
         plot_sizer.Add(self.plot_box, 0, wx.ALL | wx.ALIGN_CENTER, 0)
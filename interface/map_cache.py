@@ -0,0 +1,59 @@
+import os
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from processing.get_mapping import create_brain_mask
+
+# Rasters of the metabolite map view, kept between redraws: the loaded image, its rotated slice and
+# brain mask are keyed on (image path, view, slice index, rotation), and the concentration map upsampled
+# to the background on (map content, target shape). Changing the colour limits, the metabolite or the slice
+# of the map only recomputes what depends on it. Entries are dropped in least-recently-used order.
+
+class MapCache:
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._images = OrderedDict()
+        self._slices = OrderedDict()
+        self._masks = OrderedDict()
+        self._maps = OrderedDict()
+
+    def clear(self):
+        for d in [self._images, self._slices, self._masks, self._maps]: d.clear()
+
+    def _get(self, store, key, compute):
+        if key in store:
+            store.move_to_end(key)
+            return store[key]
+        value = compute()
+        store[key] = value
+        while len(store) > self.max_entries: store.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _image_key(path):
+        stat = os.stat(path)
+        return (path, stat.st_size, stat.st_mtime)
+
+    def image(self, path, load):
+        """load(path), reused until the file changes"""
+        return self._get(self._images, self._image_key(path), lambda: load(path))
+
+    def background(self, img, path, view, slice_index, rotation):
+        """Rotated slice of the image; None if the view is incorrect"""
+        if view not in (0, 1, 2): return None
+        def compute():
+            from scipy.ndimage import rotate
+            background_slice = np.take(img, slice_index, axis=view)
+            return rotate(background_slice, rotation, reshape=False, mode='nearest')
+        return self._get(self._slices, self._image_key(path) + (view, slice_index, rotation), compute)
+
+    def mask(self, img, path, view, slice_index, rotation):
+        """Brain mask of the background slice"""
+        return self._get(self._masks, self._image_key(path) + (view, slice_index, rotation),
+                         lambda: create_brain_mask(self.background(img, path, view, slice_index, rotation)))
+
+    def upsampled(self, conc_map, shape):
+        """Concentration map linearly interpolated to shape"""
+        from scipy.ndimage import zoom
+        key = (hashlib.blake2b(np.ascontiguousarray(conc_map).tobytes(), digest_size=16).hexdigest(), conc_map.shape, tuple(shape))
+        return self._get(self._maps, key, lambda: zoom(conc_map, (shape[0] / conc_map.shape[0], shape[1] / conc_map.shape[1]), order=1))
@@ -19,6 +19,7 @@ import wx
 import wx.adv
 import wx.stc
 from interface.colours import(XISLAND2, ACCENT_COLOR, ADD_NODE_MENU_BG)
+from processing.node_manifest import LazyNode
 
 class NodesVListBox(wx.VListBox):
     def __init__(self, *args, **kw):
@@ -28,6 +29,8 @@ class NodesVListBox(wx.VListBox):
         self.Bind(wx.EVT_MOTION, self.OnStartDrag)
 
     def GetItemText(self, item):
+        node = self.NodeRegistry[self.NodeRegistryMap[item]]
+        if isinstance(node, LazyNode): return node.label # label from the manifest, without importing the node
         return self.GetNodeObject(item).GetLabel()
 
     def GetNodeObject(self, node_type):
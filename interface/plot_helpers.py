@@ -1,7 +1,6 @@
 import os
 import numpy as np
 from suspect import MRSData
-from scipy.optimize import curve_fit
 from inout.read_mrs import load_file
 from inout.read_coord import ReadlcmCoord
 from nodes._CoilCombinationAdaptive import coil_combination_adaptive
@@ -89,6 +88,7 @@ def gaussian(x, a, x0, sigma):
     return a * np.exp(-(x - x0)**2 / (2 * sigma**2))
 
 def gaussian_fit(data: MRSData):
+    from scipy.optimize import curve_fit
     spec = np.real(data.spectrum())
     gaussparams, _ = curve_fit(gaussian, data.frequency_axis_ppm(), spec, p0=[np.max(spec), 4.7, 0.01])
     fwhm = np.abs(2 * np.sqrt(2 * np.log(2)) * gaussparams[2])
@@ -1,10 +1,13 @@
 import wx
+import sys
 from datetime import datetime
 from .colours import INFO_COLOR, WARNING_COLOR, ERROR_COLOR, DEBUG_COLOR
 
 text_dst = None
+text_stream = None # console destination for runs without the GUI
+debug = False
 last_directory = None
-supported_files = ["ima", "IMA", "dcm", "dat", "sdat", "rda", "coord", "nii", "nii.gz"]
+supported_files = ["ima", "IMA", "dcm", "dat", "sdat", "rda", "coord", "nii", "nii.gz", "npz"]
 supported_sequences = {
     "PRESS": ["PRESS", "press"],
     "STEAM": ["STEAM", "steam"],
@@ -29,14 +32,25 @@ def init_logging(text, _debug=False):
     debug = _debug
     text_dst.Bind(EVT_LOG, on_log)
 
+def init_console_logging(stream=None, _debug=False):
+    """Logs to stream (stderr by default) only, e.g. in a worker process forked from the GUI"""
+    global text_dst, text_stream, debug
+    text_dst = None
+    text_stream = stream if stream is not None else sys.stderr
+    debug = _debug
+
 def set_debug(_debug):
     global debug
     debug = _debug
 
 def log_text( colour, *args):
-        if not text_dst: return
+        if not text_dst and not text_stream: return
         text = ""
         for arg in args: text += str(arg)
+        if text_stream:
+            text_stream.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S")+": " + text + "\n")
+            text_stream.flush()
+        if not text_dst: return
         evt = LogEvent(myEVT_LOG, -1, text=text, colour=colour)
         wx.PostEvent(text_dst, evt)
 
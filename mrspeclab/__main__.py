@@ -0,0 +1,141 @@
+import os
+import sys
+import argparse
+
+# Command-line entry point, run from the repository folder:
+#   python -m mrspeclab run --pipeline x.pipe --input file1.dat [file2.dat ...] --wref wref.dat --out folder
+#   python -m mrspeclab startup --budget 2.0
+
+def run(args):
+    from interface import utils
+    from processing.headless import HeadlessSession
+    from processing.step_cache import StepCache
+    from processing.fit_cache import FitCache
+    utils.init_console_logging(_debug=args.debug)
+    session = HeadlessSession(
+        args.pipeline, args.input, wref=args.wref, out=args.out,
+        basis=args.basis, control=args.control, wm=args.wm, gm=args.gm, csf=args.csf,
+        save_plots=args.save_plots, save_raw=args.save_raw, workers=args.workers,
+        step_cache=StepCache(args.cache) if args.cache else None, twix_memmap=args.memmap,
+        save_store=args.store, plot_dpi=args.plot_dpi, plot_format=args.plot_format,
+        fit_cache=FitCache(os.path.join(args.cache, "lcmodel")) if args.cache else None
+    )
+    try:
+        ok = session.run()
+    except Exception:
+        import traceback
+        utils.log_error(f"Pipeline error:\n{traceback.format_exc()}")
+        ok = False
+    return 0 if ok else 1
+
+def run_batch(args):
+    import datetime
+    from interface import utils
+    from processing import batch
+    from processing.batch_ledger import BatchLedger, LEDGER_NAME
+    from processing.fit_cache import FitCache
+    utils.init_console_logging(_debug=args.debug)
+    out = args.out or os.path.join(args.folder, datetime.datetime.now().strftime("%Y%m%d_%H%M%S") + "_output")
+    basis, control = batch.shared_files(args.folder)
+    options = dict(basis=args.basis or basis, control=args.control or control, save_plots=args.save_plots,
+                   save_raw=args.save_raw, save_store=args.store, workers=args.workers, plot_dpi=args.plot_dpi,
+                   plot_format=args.plot_format, fit_cache=FitCache(os.path.join(args.cache, "lcmodel")) if args.cache else None)
+    jobs = {}
+    for part_folder in batch.find_participants(args.folder):
+        job = batch.participant_job(part_folder, out, os.path.abspath(args.pipeline), **options)
+        if job is None: utils.log_warning("No input files found for participant " + os.path.basename(part_folder) + "; skipping.")
+        else: jobs[os.path.basename(part_folder)] = job
+    ledger = BatchLedger(os.path.join(args.folder, LEDGER_NAME))
+    jobs = batch.pending_jobs(jobs, ledger)
+    if len(jobs) == 0: utils.log_info("All participants are already processed")
+    elif not os.path.exists(out): os.makedirs(out) # no new output folder when nothing is left to process
+    failed = 0
+    for done, result in enumerate(batch.run_batch(jobs, args.jobs, debug=args.debug, ledger=ledger), 1):
+        batch.log_result(result, done, len(jobs))
+        if not result["ok"]: failed += 1
+    ledger.close()
+    return 0 if failed == 0 else 1
+
+def export(args):
+    from interface import utils
+    from inout.step_store import StepStore
+    utils.init_console_logging(_debug=args.debug)
+    store = StepStore(args.store)
+    steps = store.steps() if args.step is None else [s for s in store.steps() if s[0] in args.step]
+    for nstep, name in steps:
+        folder = os.path.join(args.out, str(nstep) + name, "data")
+        store.export_raw(nstep, folder, seq=args.seq)
+        utils.log_info("Exported " + name + " to " + folder)
+    store.close()
+    return 0
+
+def startup(args):
+    from interface import utils
+    from mrspeclab.startup import check
+    utils.init_console_logging(_debug=args.debug)
+    try:
+        ok = check(args.entry, args.budget, repeat=args.repeat, top=args.top, log=utils.log_info)
+    except RuntimeError as e:
+        utils.log_error(str(e))
+        return 1
+    if not ok: utils.log_error("Startup import time is over budget")
+    return 0 if ok else 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mrspeclab", description="MRSpecLAB without the graphical interface")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    p = subparsers.add_parser("run", help="process and fit a dataset with a saved pipeline")
+    p.add_argument("--pipeline", required=True, help=".pipe file saved from the pipeline editor")
+    p.add_argument("--input", required=True, nargs="+", help="MRS data file(s)")
+    p.add_argument("--wref", default=None, help="water reference file")
+    p.add_argument("--out", required=True, help="output folder")
+    p.add_argument("--basis", default=None, help="basis set (default: the one matching the data in lcmodel/basis)")
+    p.add_argument("--control", default=None, help="LCModel CONTROL file (default: lcmodel/default.CONTROL)")
+    p.add_argument("--wm", default=None, help="WM segmentation file")
+    p.add_argument("--gm", default=None, help="GM segmentation file")
+    p.add_argument("--csf", default=None, help="CSF segmentation file")
+    p.add_argument("--save-plots", action="store_true", help="save the plots of every step")
+    p.add_argument("--plot-format", default="pdf", choices=["pdf", "png", "svg"], help="file format of the saved plots")
+    p.add_argument("--plot-dpi", type=int, default=600, help="resolution of the saved plots")
+    p.add_argument("--save-raw", action="store_true", help="save the data of every step")
+    p.add_argument("--workers", type=int, default=None, help="number of parallel LCModel fits (default: CPU count)")
+    p.add_argument("--cache", default=None, help="cache folder, to skip unchanged steps and LCModel fits on re-runs")
+    p.add_argument("--memmap", action="store_true", help="read Twix raw data through a memory map of the file")
+    p.add_argument("--store", action="store_true", help="save the data of every step in a single steps.npz file")
+    p.add_argument("--debug", action="store_true", help="show debug messages")
+    p = subparsers.add_parser("batch", help="process every Participant* folder of a batch folder")
+    p.add_argument("--pipeline", required=True, help=".pipe file saved from the pipeline editor")
+    p.add_argument("--folder", required=True, help="batch folder with Participant* subfolders")
+    p.add_argument("--out", default=None, help="output folder (default: <date>_output in the batch folder)")
+    p.add_argument("--jobs", type=int, default=None, help="number of participants processed at the same time")
+    p.add_argument("--basis", default=None, help="basis set (default: a .BASIS file of the batch folder)")
+    p.add_argument("--control", default=None, help="LCModel CONTROL file (default: a .CONTROL file of the batch folder)")
+    p.add_argument("--save-plots", action="store_true", help="save the plots of every step")
+    p.add_argument("--plot-format", default="pdf", choices=["pdf", "png", "svg"], help="file format of the saved plots")
+    p.add_argument("--plot-dpi", type=int, default=600, help="resolution of the saved plots")
+    p.add_argument("--save-raw", action="store_true", help="save the data of every step")
+    p.add_argument("--store", action="store_true", help="save the data of every step in a single steps.npz file")
+    p.add_argument("--workers", type=int, default=1, help="number of parallel LCModel fits per participant")
+    p.add_argument("--cache", default=None, help="cache folder, to skip unchanged LCModel fits on re-runs, shared by the participants")
+    p.add_argument("--debug", action="store_true", help="show debug messages")
+    p = subparsers.add_parser("export", help="write .RAW files from the steps.npz of a run")
+    p.add_argument("--store", required=True, help="steps.npz file of a run")
+    p.add_argument("--out", required=True, help="output folder")
+    p.add_argument("--step", type=int, nargs="+", default=None, help="step numbers to export (default: all)")
+    p.add_argument("--seq", default="PRESS", help="sequence written in the .RAW header")
+    p.add_argument("--debug", action="store_true", help="show debug messages")
+    p = subparsers.add_parser("startup", help="check the import time of the graphical entry points against a budget")
+    p.add_argument("--entry", nargs="+", default=["MRSpecLAB", "MRSviewer"], choices=["MRSpecLAB", "MRSviewer"], help="entry points to measure")
+    p.add_argument("--budget", type=float, default=2.0, help="maximum import time of each entry point, in seconds")
+    p.add_argument("--repeat", type=int, default=3, help="number of measurements, of which the median is used")
+    p.add_argument("--top", type=int, default=10, help="number of slowest imports listed")
+    p.add_argument("--debug", action="store_true", help="show debug messages")
+    args = parser.parse_args(argv)
+    if args.command == "run": return run(args)
+    if args.command == "batch": return run_batch(args)
+    if args.command == "export": return export(args)
+    if args.command == "startup": return startup(args)
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
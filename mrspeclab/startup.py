@@ -0,0 +1,49 @@
+import os
+import sys
+import subprocess
+import statistics
+
+# Import time of the graphical entry points, each measured in a fresh interpreter with python -X importtime:
+#   python -m mrspeclab startup --budget 2.0
+# The median over the runs is compared to the budget, and the slowest top-level imports are listed so that
+# a dependency imported at startup again shows up by name.
+
+ENTRY_POINTS = {"MRSpecLAB": "MRSpecLAB", "MRSviewer": "MRSviewer"} # the scripts, run only under __main__
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_importtime(stderr):
+    """(total seconds, [(cumulative seconds, package)] of the top-level imports) from the -X importtime output"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"): continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit(): continue # header line
+        name = fields[2].rstrip()
+        if name.startswith("  "): continue # imported by another module, already in its cumulative time
+        imports.append((int(fields[1]) * 1e-6, name.strip()))
+    return sum(t for t, _ in imports), imports
+
+def measure(module, root=ROOT):
+    """parse_importtime of importing module from root in a new interpreter"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                            cwd=root, capture_output=True, text=True)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"Could not import {module}:\n" + "\n".join(errors[-5:]))
+    return parse_importtime(result.stderr)
+
+def check(entries, budget, repeat=3, top=10, log=print):
+    """True if the median import time of every entry point is within budget (seconds)"""
+    ok = True
+    for name in entries:
+        module = ENTRY_POINTS[name]
+        runs = [measure(module) for _ in range(max(1, repeat))]
+        total = statistics.median(t for t, _ in runs)
+        imports = min(runs, key=lambda r: abs(r[0] - total))[1]
+        within = total <= budget
+        ok = ok and within
+        log(f"{name} ({module}): {total:.3f} s for {len(imports)} top-level imports, budget {budget:.3f} s"
+            + ("" if within else " EXCEEDED"))
+        for t, package in sorted(imports, reverse=True)[:top]:
+            log(f"\t{t:.3f} s\t{package}")
+    return ok
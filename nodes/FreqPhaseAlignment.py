@@ -1,6 +1,6 @@
 import processing.api as api
 import numpy as np
-import scipy
+from nodes._SpectralRegistration import spectral_registration
 
 class FreqPhaseAlignment(api.ProcessingNode):
     def __init__(self, nodegraph, id):
@@ -54,6 +54,12 @@ class FreqPhaseAlignment(api.ProcessingNode):
                 idname="target",
                 default="0",
                 fpb_label="Set target to index of input data (if not median; starts at 0)"
+            ),
+            api.ChoiceProp(
+                idname="xcorrInit",
+                default="False",
+                choices=["True", "False"],
+                fpb_label="Initial frequency guess by cross-correlation (for large shifts)"
             )
         ]
         super().__init__(nodegraph, id)
@@ -89,33 +95,14 @@ class FreqPhaseAlignment(api.ProcessingNode):
         if self.get_parameter("median"): target = _data[0].inherit(np.median(_data, axis=0))
         elif int(self.get_parameter("target")) in range(len(_data)): target = _data[int(self.get_parameter("target"))]
         else: target = _data[0]
-        self.freqShifts = []
-        self.phaseShifts = []
+        freqShifts, phaseShifts = spectral_registration(_data, target, freqRange,
+            align_freq=self.get_parameter("alignFreq"), align_phase=self.get_parameter("alignPhase"),
+            init_xcorr=self.get_parameter("xcorrInit") == "True")
+        self.freqShifts = list(freqShifts)
+        self.phaseShifts = list(phaseShifts)
         output = []
         for i in range(len(_data)):
-            # adapted from suspect.processing.frequency_correction.spectral_registration
-            spectral_weights = np.logical_and(freqRange[0] < _data[i].frequency_axis(), freqRange[1] > _data[i].frequency_axis())
-
-            def residual(input_vector):
-                transformed_data = _data[i]
-                if self.get_parameter("alignFreq"): transformed_data = transformed_data.adjust_frequency(-input_vector[0])
-                if self.get_parameter("alignPhase"): transformed_data = transformed_data.adjust_phase(-input_vector[1])
-                residual_data = transformed_data - target
-                spectrum = residual_data.spectrum()
-                weighted_spectrum = spectrum * spectral_weights
-                weighted_spectrum = weighted_spectrum[weighted_spectrum != 0]
-                residual_data = np.fft.ifft(np.fft.ifftshift(weighted_spectrum))
-                return_vector = np.zeros(len(residual_data) * 2)
-                return_vector[:len(residual_data)] = residual_data.real
-                return_vector[len(residual_data):] = residual_data.imag
-                return return_vector
-            
-            out = scipy.optimize.leastsq(residual, (0, 0), maxfev=200)
-            [freqShift, phaseShift] = out[0][:2]
-
-            self.freqShifts.append(freqShift)
-            self.phaseShifts.append(phaseShift)
-            output.append(data["input"][i].adjust_frequency(-freqShift).adjust_phase(-phaseShift))
+            output.append(data["input"][i].adjust_frequency(-freqShifts[i]).adjust_phase(-phaseShifts[i]))
         data["output"] = output
 
     def plot(self, figure, data):
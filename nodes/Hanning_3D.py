@@ -1,8 +1,8 @@
 import processing.api as api
 import numpy as np
 import interface.utils as utils
-from scipy.ndimage import convolve
-import copy
+from scipy.ndimage import convolve1d
+from inout.csi_volume import CSIVolume
 
 
 class Hanning_3D(api.ProcessingNode):
@@ -79,61 +79,30 @@ class Hanning_3D(api.ProcessingNode):
         utils.log_info(f"CSIMatrix_Size: {CSIMatrix_Size}")
 
 
-        # Ensure input is at least 5D (Batch, X, Y, Z, Time)
-        input_data = np.array(data["input"])  # Convert input to NumPy array
+        input_data = CSIVolume.from_mrsdata(data["input"][0])  # (X, Y, Z, Time)
 
 
         utils.log_info(f"Shape of the input data: {input_data.shape}")
 
 
-        # Create a 3D Hanning filter (X, Y, Z) with separate window sizes
-        def hanning_filter_3d(size_x, size_y, size_z):
-            hx = np.hanning(size_x)
-            hy = np.hanning(size_y)
-            hz = np.hanning(size_z)
-
-
-            hxy = np.outer(hx, hy)  # 2D Hanning
-            hxyz = np.outer(hxy.ravel(), hz).reshape(size_x, size_y, size_z)
-
-
-            return hxyz / np.sum(hxyz)  # Normalize the filter
-
-
-        hanning_kernel = hanning_filter_3d(window_size_x, window_size_y, window_size_z)  # Shape: (X, Y, Z)
-
-
-        # Reshape kernel to match the data shape (1, X, Y, Z, 1) for convolution
-        hanning_kernel = hanning_kernel.reshape(window_size_x, window_size_y, window_size_z, 1)
-
-
-        # Apply the 3D Hanning filter while preserving the 1st and 5th dimensions
-        smoothed_data = np.empty_like(input_data)
-        for t in range(input_data.shape[-1]):  # Loop over the Time (5th) dimension
-            smoothed_data[..., t] = convolve(input_data[..., t], hanning_kernel, mode='nearest')
+        # The 3D Hanning filter is the outer product of three 1D windows, so it is applied as
+        # three 1D convolutions along X, Y and Z, each over all time points at once
+        smoothed_data = np.asarray(input_data)
+        for axis, size in enumerate([window_size_x, window_size_y, window_size_z]):
+            h = np.hanning(size)
+            smoothed_data = convolve1d(smoothed_data, h / np.sum(h), axis=axis, mode='nearest')
 
 
         utils.log_info(f"Shape of the smoothed data: {smoothed_data.shape}")
 
 
-        # Create the output list and inherit the processed data
-        output = copy.deepcopy(data["input"])
-
-
-        for i in range(CSIMatrix_Size[0]):
-            for j in range(CSIMatrix_Size[1]):
-                for k in range(CSIMatrix_Size[2]):
-                    temp = smoothed_data[0, i, j, k, :]
-                    temp = np.squeeze(temp)
-                    output[0][i][j][k] = temp  # Store the processed data
-
-
+        output = list(data["input"])
+        output[0] = input_data.inherit(smoothed_data)
         data["output"] = output
 
 
         # Log the output shape
-        output_np = np.array(data["output"])
-        utils.log_info(f"Shape of the output data: {output_np.shape}")
+        utils.log_info(f"Shape of the output data: {np.shape(data['output'])}")
 
 
     def plot(self, figure, data):
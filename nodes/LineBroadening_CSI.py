@@ -1,9 +1,7 @@
 import processing.api as api
 import numpy as np
 import interface.utils as utils
-import tkinter as tk
-from tkinter import simpledialog
-import copy
+from inout.csi_volume import CSIVolume
 
 
 # import matplotlib.pyplot as plt
@@ -36,23 +34,10 @@ class LineBroadening_CSI(api.ProcessingNode):
         self.exp = np.exp(-( (data["input"][0].time_axis() * np.pi * self.get_parameter("Gaussian_lw_hz")) / (2 * np.sqrt(np.log(2)))) ** 2)
 
 
-        header = data["header"]
-        CSIMatrix_Size = [header["CSIMatrix_Size[0]"],
-                          header["CSIMatrix_Size[1]"],
-                          header["CSIMatrix_Size[2]"]]
-
-
-        # Create the output list and inherit the processed data
-        output = copy.deepcopy(data["input"])
-
-
-        for i in range(CSIMatrix_Size[0]):
-            for j in range(CSIMatrix_Size[1]):
-                for k in range(CSIMatrix_Size[2]):
-                    d = np.squeeze(data["input"][0][i][j][k])
-                    output[0][i][j][k] = d * self.exp
-
-
+        # the whole volume is filtered at once
+        volume = CSIVolume.from_mrsdata(data["input"][0])
+        output = list(data["input"])
+        output[0] = volume.inherit(volume * self.exp)
         data["output"] = output
 
 
@@ -64,8 +49,7 @@ class LineBroadening_CSI(api.ProcessingNode):
         # data["output"] = output
 
 
-        output_np = np.array(output)
-        utils.log_info(f"Shape of the output data: {output_np.shape}")
+        utils.log_info(f"Shape of the output data: {np.shape(output)}")
         input0_np = np.array(data["input"][0].time_axis() )
         utils.log_info(f"Shape of the input0 data: {input0_np.shape}")
 
@@ -161,8 +145,7 @@ class LineBroadening_CSI(api.ProcessingNode):
             self.dmax = max(self.dmax, np.max(d)) # for plotting exp
         data["output"] = output
 
-        output_np = np.array(output)
-        utils.log_info(f"Shape of the output data: {output_np.shape}")
+        utils.log_info(f"Shape of the output data: {np.shape(output)}")
         input0_np = np.array(data["input"][0].time_axis() )
         utils.log_info(f"Shape of the input0 data: {input0_np.shape}")
 
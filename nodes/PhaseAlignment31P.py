@@ -1,8 +1,10 @@
 import processing.api as api
 import numpy as np
 import interface.utils as utils
-from scipy.optimize import differential_evolution, minimize, dual_annealing, leastsq
-import copy
+from scipy.optimize import minimize, dual_annealing, leastsq
+from nodes._Phasing31P import (peak_max_phase_search, phase_ramps, refine_phases, de_runs,
+                               entropy_objective, two_peak_objective)
+from inout.csi_volume import CSIVolume
 
 class PhaseAlignment31P(api.ProcessingNode):
     def __init__(self, nodegraph, id):
@@ -51,6 +53,13 @@ class PhaseAlignment31P(api.ProcessingNode):
                 idname="target",
                 default="0",
                 fpb_label="Set target to index of input data (if not median; starts at 0)"
+            ),
+            # How the zero- and first-order phases of the target are found
+            api.ChoiceProp(
+                idname="phasing",
+                default="Peak maximum",
+                choices=["Peak maximum", "Entropy", "Two peaks"],
+                fpb_label="Target phasing (Two peaks: reference range and 6 to 9 ppm)"
             )
         ]
         
@@ -68,38 +77,12 @@ class PhaseAlignment31P(api.ProcessingNode):
         """
         _data = data["input"]
 
-        utils.log_info("Running auto phase frequency correction (may take about 10 minutes)")
+        utils.log_info("Running auto phase frequency correction")
 
         def peak_max_phase_correction(data_obj,lower_bound, upper_bound):
-            candidate_phases = np.arange(-180, 181, 2) #-180 181
-            candidate_1p = np.arange(0, 0.004, 0.0000005)
-            best_phase = 0
-            best_1p = 0
-            best_peak_amp = -np.inf
-            freq_ppm = data_obj.frequency_axis_ppm()
-            region_indices = np.where((freq_ppm >= lower_bound) & (freq_ppm <= upper_bound))[0]
-            if len(region_indices) == 0:
-                region_indices = np.arange(len(freq_ppm))
-            i = 0
-            p = 0
-            for phase_deg in candidate_phases:
-                if i >= 36:
-                    p += 10
-                    utils.log_info(f"{p}% done")
-                    i = 0
-                i += 2
-                #print(phase_deg)
-                for phase_1p in candidate_1p:
-                    candidate = data_obj.adjust_phase(-np.deg2rad(phase_deg), first_phase = -phase_1p)
-                    spec = np.real(candidate.spectrum())
-                    current_peak = np.max(spec[region_indices])
-                    if current_peak > best_peak_amp:
-                        best_peak_amp = current_peak
-                        best_phase = phase_deg
-                        best_1p = phase_1p                            
-                        #print("0: ", best_phase, "1: ", best_1p)
-            #print(current_peak)
-            return best_phase, best_1p
+            # same grid as the exhaustive search: zero-order -180..180 deg by 2, first-order 0..0.004 by 0.0000005
+            return peak_max_phase_search(data_obj, lower_bound, upper_bound,
+                                         phases0=np.arange(-180, 181, 2), phases1=np.arange(0, 0.004, 0.0000005))
         
         
 
@@ -120,81 +103,28 @@ class PhaseAlignment31P(api.ProcessingNode):
                         phc0 is in degrees; phc1 is in the original units.
             """
             
-            def entropy_objective(params, data_obj, m=1, c=1.0):
-                """
-                Entropy-based objective function for phase correction.
-                Applies phase correction using:
-                S_corr = S.adjust_phase(-np.deg2rad(phc0), first_phase=-phc1)
-                then computes the Shannon-type entropy of the normalized derivative of
-                the real part and adds a penalty for negative absorption.
-                """
-                phc0, phc1 = params
-                S = data_obj.spectrum()  # complex spectrum array
-                n = len(S)
-                
-                # Apply phase correction: convert phc0 from degrees to radians; use phc1 as-is.
-                S_corr = data_obj.adjust_phase(-np.deg2rad(phc0), first_phase=-phc1)
-                R = np.real(S_corr)
-                
-                # Compute derivative of order m (default is 1)
-                if m == 1:
-                    dR = np.gradient(R)
-                else:
-                    dR = R.copy()
-                    for _ in range(m):
-                        dR = np.gradient(dR)
-                        
-                abs_dR = np.abs(dR)
-                total = np.sum(abs_dR)
-                if total == 0:
-                    return np.inf
-                h = abs_dR / total  # normalized derivative
-                
-                epsilon = 1e-12
-                entropy_val = np.sum(h * np.log(h + epsilon))
-                
-                # Penalty: fraction of points with negative absorption.
-                penalty = np.sum(R < 0) / n
-                
-                return entropy_val + c * penalty
+            # the population of each DE generation is phased at once from the cached spectrum
+            args = (np.asarray(data_obj.spectrum()),) + phase_ramps(data_obj) + (m, c)
 
             # Define broad search bounds.
             bounds = [(-180, 180), (-0.1, 0.1)]
             
-            solutions = []
-            for seed in range(num_de_runs):
-                # Global search with DE for each seed.
-                result_de = differential_evolution(
-                    entropy_objective, bounds,
-                    args=(data_obj, m, c),
-                    maxiter=10000,
-                    disp=False,
-                    seed=seed
-                )
-                de_solution = result_de.x
-                
-                # Local refinement using Nelder-Mead, starting from the DE solution.
-                result_nm = minimize(
-                    entropy_objective, de_solution,
-                    args=(data_obj, m, c),
-                    method='Nelder-Mead',
-                    options={'maxiter': 10000, 'disp': False}
-                )
-                refined_solution = result_nm.x
-                obj_value = entropy_objective(refined_solution, data_obj, m, c)
-                solutions.append((refined_solution, obj_value))
+            # Global search with DE for each seed, run concurrently, each refined with Nelder-Mead.
+            solutions = de_runs(entropy_objective, bounds, args, list(range(num_de_runs)), refine=True,
+                                maxiter=10000, disp=False)
+            for seed, (refined_solution, obj_value) in enumerate(solutions):
                 print(f"Run {seed}: phc0={refined_solution[0]:.4f}, phc1={refined_solution[1]:.4f}, obj={obj_value:.6f}")
             
             theoretical_candidate = (-82,0.0021991148575128553)
 
             result_theo = minimize(
                 entropy_objective, theoretical_candidate,
-                args=(data_obj, m, c),
+                args=args,
                 method='Nelder-Mead',
                 options={'maxiter': 10000, 'disp': False}
             )
             refined_theo = result_theo.x
-            obj_theo = entropy_objective(refined_theo, data_obj, m, c)
+            obj_theo = entropy_objective(refined_theo, *args)
             solutions.append((refined_theo, obj_theo))
             print(f"Theoretical candidate refined: phc0 = {refined_theo[0]:.4f}, phc1 = {refined_theo[1]:.10f}, obj = {obj_theo:.6f}")
 
@@ -342,25 +272,6 @@ class PhaseAlignment31P(api.ProcessingNode):
             best_1p    : Optimized 1st order phase.
             """
             
-            def objective(params, data_obj, region_indices_pcr, region_indices_atp, weight_pcr, weight_atp, epsilon=1e-6):
-                """
-                Objective function that rewards a high ratio of the real peak amplitude to the 
-                overall imaginary content in each region. This measure is scale invariant.
-                """
-                phase_deg, phase_1p = params
-                candidate = data_obj.adjust_phase(-np.deg2rad(phase_deg), first_phase=-phase_1p)
-                spec = candidate.spectrum()
-                spec_re = np.real(spec)
-                spec_im = np.imag(spec)
-                
-                # For the PCr region:
-                ratio_pcr = np.max(spec_re[region_indices_pcr]) / (np.sum(np.abs(spec_im[region_indices_pcr])) + epsilon)
-                # For the a-ATP region:
-                ratio_atp = np.max(spec_re[region_indices_atp]) / (np.sum(np.abs(spec_im[region_indices_atp])) + epsilon)
-                
-                # We want to maximize the sum of the ratios, so we return the negative.
-                return - (ratio_pcr + ratio_atp)
-                        
             # Define search bounds.
             bounds = [(-180, 180), (0, 0.04)]
             
@@ -372,38 +283,28 @@ class PhaseAlignment31P(api.ProcessingNode):
                 region_indices_pcr = np.arange(len(freq_ppm))
             if len(region_indices_atp) == 0:
                 region_indices_atp = np.arange(len(freq_ppm))
+
+            # the candidates are phased from the cached spectrum of each region, a whole DE population at once
+            S = np.asarray(data_obj.spectrum())
+            a0, k1 = phase_ramps(data_obj)
+            args = (S[region_indices_pcr], k1[region_indices_pcr], S[region_indices_atp], k1[region_indices_atp], a0)
             
-            # Run multiple differential evolution searches.
-            best_de_obj = np.inf
-            best_de_params = None
-            
-            for seed in range(num_de_runs):
-                result_de = differential_evolution(
-                    objective, bounds,
-                    args=(data_obj, region_indices_pcr, region_indices_atp, weight_pcr, weight_atp),
-                    maxiter=2000, popsize=100, mutation=(0.5, 1.5), recombination=0.8,
-                    tol=1e-7, polish=False, seed=seed, disp=False
-                )
-                if result_de.fun < best_de_obj:
-                    best_de_obj = result_de.fun
-                    best_de_params = result_de.x
+            # Run multiple differential evolution searches, concurrently.
+            solutions = de_runs(two_peak_objective, bounds, args, list(range(num_de_runs)),
+                                maxiter=2000, popsize=100, mutation=(0.5, 1.5), recombination=0.8,
+                                tol=1e-7, polish=False, disp=False)
+            best_de_params, best_de_obj = min(solutions, key=lambda x: x[1]) # first best seed
 
             # Optionally include a theoretical candidate based on known TE, if available.
             if hasattr(data_obj, "te"):
                 p1_theoretical = 2 * np.pi * data_obj.te * 1e-3  # Theoretical 1st order phase
-                best_val_theo = np.inf
-                best_phase_theo = None
-                for phase_deg in np.linspace(-180, 180, 181):
-                    params = [phase_deg, p1_theoretical]
-                    val = objective(params, data_obj, region_indices_pcr, region_indices_atp, weight_pcr, weight_atp)
-                    if val < best_val_theo:
-                        best_val_theo = val
-                        best_phase_theo = phase_deg
-                theoretical_candidate = np.array([best_phase_theo, p1_theoretical])
+                phases = np.linspace(-180, 180, 181)
+                values = two_peak_objective(np.array([phases, np.full_like(phases, p1_theoretical)]), *args)
+                theoretical_candidate = np.array([phases[np.argmin(values)], p1_theoretical])
                 # If the theoretical candidate beats DE, adopt it.
-                if objective(theoretical_candidate, data_obj, region_indices_pcr, region_indices_atp, weight_pcr, weight_atp) < best_de_obj:
+                if np.min(values) < best_de_obj:
                     best_de_params = theoretical_candidate
-                    best_de_obj = objective(theoretical_candidate, data_obj, region_indices_pcr, region_indices_atp, weight_pcr, weight_atp)
+                    best_de_obj = np.min(values)
                     print("Theoretical candidate adopted:", theoretical_candidate)
             
             print("Best DE result before local refinement:")
@@ -412,8 +313,8 @@ class PhaseAlignment31P(api.ProcessingNode):
             
             # Refine the best DE result using a local optimizer.
             result_local = minimize(
-                objective, best_de_params,
-                args=(data_obj, region_indices_pcr, region_indices_atp, weight_pcr, weight_atp),
+                two_peak_objective, best_de_params,
+                args=args,
                 bounds=bounds, method='L-BFGS-B'
             )
             
@@ -424,12 +325,16 @@ class PhaseAlignment31P(api.ProcessingNode):
             
             return best_params[0], best_params[1]
 
-        try: 
-            header = data["header"]
-            xdim = header["CSIMatrix_Size[0]"]
-            self.issvs = False
-        except:
-            self.issvs = True
+        def phase_target(data_obj, lower_bound, upper_bound):
+            """(zero-order phase in degrees, first-order phase) of the target with the selected method"""
+            phasing = self.get_parameter("phasing")
+            if phasing == "Entropy":
+                return tuple(phase_correction_entropy(data_obj))
+            if phasing == "Two peaks":
+                return peak_max_phase_correction_two_peaks(data_obj, (lower_bound, upper_bound), (6, 9), 1, 1)
+            return peak_max_phase_correction(data_obj, lower_bound, upper_bound)
+
+        self.issvs = "CSIMatrix_Size[0]" not in (data.get("header") or {})
 
         if self.issvs:
             # 2. Zero-padding
@@ -472,7 +377,7 @@ class PhaseAlignment31P(api.ProcessingNode):
             entropy_c = 0#self.get_parameter("entrop_c")
             entropy_m = 0#self.get_parameter("entropy_m")
 
-            best_phase_deg, best_1p = peak_max_phase_correction(self.target,lower_bound_ppm, upper_bound_ppm) #phase_correction_automics(self.target) #-80, 0.0029579999999999997 #peak_max_phase_correction(self.target,lower_bound_ppm, upper_bound_ppm)#peak_max_phase_correction_two_peaks(self.target,(lower_bound_ppm, upper_bound_ppm), (6,9),1,1)
+            best_phase_deg, best_1p = phase_target(self.target, lower_bound_ppm, upper_bound_ppm) #phase_correction_automics(self.target) #-80, 0.0029579999999999997
             
             self.target = self.target.adjust_phase(-np.deg2rad(best_phase_deg), first_phase = -best_1p)
 
@@ -564,41 +469,21 @@ class PhaseAlignment31P(api.ProcessingNode):
             data["output"] = output
 
         else:
-            _data = copy.deepcopy(data["input"])  # e.g. shape = (16, 16, 8, 1024)
+            # the whole (x, y, z, points) volume at once, without copying the input
+            volume = CSIVolume.from_mrsdata(data["input"][0])
             
             ppm_bounds = self.get_parameter("freqRange")[:-1]  # e.g. (lower, upper)
             lower_bound_ppm, upper_bound_ppm = ppm_bounds
             print("PPM bounds: ", ppm_bounds)
             
-            header = data["header"]
-            xdim = header["CSIMatrix_Size[0]"]
-            ydim = header["CSIMatrix_Size[1]"]
-            zdim = header["CSIMatrix_Size[2]"]
-            
-            # Ensure _data has the expected dimensions
-            np_data = np.array(_data)
-            if np_data.ndim > 3:
-                _data = _data[0]
-                np_data = np.array(_data)
-            
             # --- Determine the target voxel based on highest spectral area ---
-            highest_spec_area_id = (0, 0, 0)
-            target_voxel = _data[0][0][0]
-            highest_spec_area = np.sum(np.real(target_voxel.spectrum()))
-            for ix in range(xdim):
-                for iy in range(ydim):
-                    for iz in range(zdim):
-                        d = _data[ix][iy][iz]
-                        spec = np.real(d.spectrum())
-                        spec_area = np.sum(spec)
-                        if spec_area > highest_spec_area:
-                            highest_spec_area_id = (ix, iy, iz)
-                            highest_spec_area = spec_area
-                            target_voxel = d
-                            print("spec area:", highest_spec_area)
+            spec_area = np.sum(np.real(volume.spectrum()), axis=-1)
+            highest_spec_area_id = np.unravel_index(np.argmax(spec_area), spec_area.shape) # first highest, in voxel order
+            target_voxel = volume.voxel(*highest_spec_area_id)
+            print("spec area:", spec_area[highest_spec_area_id])
             
             # --- Get best phase parameters from the target voxel ---
-            best_phase_deg, best_1p = peak_max_phase_correction(
+            best_phase_deg, best_1p = phase_target(
                 target_voxel, lower_bound_ppm, upper_bound_ppm
             )
             # Apply the initial correction to the target to generate the reference spectrum.
@@ -611,39 +496,18 @@ class PhaseAlignment31P(api.ProcessingNode):
             spectral_weights = np.logical_and(freq_array > freqRange_Hz[0],
                                               freq_array < freqRange_Hz[1])
             
-            # --- Define a residual function for least squares refinement ---
-            # Here params = (delta0, delta1) which are additional corrections
-            def residual(params, data_obj, target, spectral_weights):
-                delta0, delta1 = params
-                # Apply additional phase corrections on top of the initial correction.
-                corrected = data_obj.adjust_phase(-np.deg2rad(delta0), first_phase=-delta1)
-                diff = corrected - target
-                spec_diff = diff.spectrum()
-                weighted_spec = spec_diff * spectral_weights
-                # Remove any zeros (to avoid division issues)
-                weighted_spec = weighted_spec[weighted_spec != 0]
-                resid_td = np.fft.ifft(np.fft.ifftshift(weighted_spec))
-                return np.concatenate([resid_td.real, resid_td.imag])
-            
-            # --- Loop over all voxels and perform LS optimization ---
-            output = copy.deepcopy(data["input"])
-            for ix in range(xdim):
-                for iy in range(ydim):
-                    for iz in range(zdim):
-                        voxel = _data[ix][iy][iz]
-                        # Start by applying the initial (target-derived) phase corrections.
-                        initial = voxel.adjust_phase(-np.deg2rad(best_phase_deg), first_phase=-best_1p)
-                        # For the target voxel itself, we keep the initial correction.
-                        if (ix, iy, iz) == highest_spec_area_id:
-                            final_corrected = initial
-                        else:
-                            # Use LS optimization to determine additional phase adjustments.
-                            guess = (0.0, 0.0)
-                            result = leastsq(residual, x0=guess, args=(initial, target, spectral_weights), maxfev=500)
-                            delta0, delta1 = result[0]
-                            final_corrected = initial.adjust_phase(-np.deg2rad(delta0), first_phase=-delta1)
-                        # Save the final corrected voxel.
-                        output[0][ix][iy][iz] = final_corrected
+            # --- Least-squares refinement (delta0, delta1) of every voxel on top of the initial correction ---
+            initial = volume.adjust_phase(-np.deg2rad(best_phase_deg), first_phase=-best_1p)
+            # For the target voxel itself, we keep the initial correction.
+            others = np.ones(volume.grid_shape, dtype=bool)
+            others[highest_spec_area_id] = False
+            a0, k1 = phase_ramps(target_voxel)
+            deltas = np.zeros(volume.grid_shape + (2,))
+            deltas[others] = refine_phases(np.asarray(initial.spectrum())[others], target.spectrum(),
+                                           np.nonzero(spectral_weights)[0], a0, k1, maxfev=500)
+            output = list(data["input"])
+            output[0] = initial.adjust_phase(-np.deg2rad(deltas[..., 0]), first_phase=-deltas[..., 1])
+            np.asarray(output[0])[highest_spec_area_id] = np.asarray(initial)[highest_spec_area_id]
             data["output"] = output
 
         """else:
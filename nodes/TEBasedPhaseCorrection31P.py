@@ -1,8 +1,10 @@
 import processing.api as api
+import time
 import numpy as np
-import scipy
-import copy
 from interface import utils
+from inout.csi_volume import CSIVolume
+from nodes._Phasing31P import phase_ramps
+from nodes._SpectralRegistration import spectral_registration
 
 class TEBasedPhaseCorrecton31P(api.ProcessingNode):
     def __init__(self, nodegraph, id):
@@ -110,6 +112,8 @@ class TEBasedPhaseCorrecton31P(api.ProcessingNode):
           8) Output the final aligned data.
         """
         raw_data = data["input"]
+        timings = {}
+        start_time = time.time()
 
         do_freq  = (self.get_parameter("alignFreq") == "True")
         do_phase = (self.get_parameter("alignPhase") == "True")
@@ -124,20 +128,13 @@ class TEBasedPhaseCorrecton31P(api.ProcessingNode):
             user_te = 0.0
             utils.log_error("Warning: manualTE was not a valid float. Using 0.0 s.")
 
-        # Check if this is CSI (multivoxel) data by trying to read header dimensions.
-        try:
-            header = data["header"]
-            xdim = header["CSIMatrix_Size[0]"]
-            ydim = header["CSIMatrix_Size[1]"]
-            zdim = header["CSIMatrix_Size[2]"]
-            isCSI = True
-        except Exception:
-            isCSI = False
+        # Check if this is CSI (multivoxel) data from the header dimensions.
+        header = data.get("header") or {}
+        isCSI = all(f"CSIMatrix_Size[{i}]" in header for i in range(3))
 
-        # 1) Prepare working copy(s)
+        # 1) Working data: for CSI, the whole (x, y, z, points) volume, processed with broadcast operations
         if isCSI:
-            # For CSI, assume raw_data is a multidimensional structure.
-            _data = copy.deepcopy(raw_data)
+            _data = CSIVolume.from_mrsdata(raw_data[0])
         else:
             _data = [d.copy() for d in raw_data]
 
@@ -145,14 +142,8 @@ class TEBasedPhaseCorrecton31P(api.ProcessingNode):
         zp_factor = self.get_parameter("zp_factor")
         if zp_factor != 0:
             if isCSI:
-                # For CSI data, iterate over voxels.
-                for ix in range(xdim):
-                    for iy in range(ydim):
-                        for iz in range(zdim):
-                            d = _data[ix][iy][iz]
-                            pad_len = int(np.floor(len(d) * zp_factor))
-                            padding = np.zeros(pad_len, dtype=d.dtype)
-                            _data[ix][iy][iz] = d.inherit(np.concatenate((d, padding), axis=None))
+                pad_len = int(np.floor(_data.shape[-1] * zp_factor))
+                _data = _data.inherit(np.concatenate((_data, np.zeros(_data.grid_shape + (pad_len,), dtype=_data.dtype)), axis=-1))
             else:
                 new_data = []
                 for d in _data:
@@ -160,25 +151,21 @@ class TEBasedPhaseCorrecton31P(api.ProcessingNode):
                     padding = np.zeros(pad_len, dtype=d.dtype)
                     new_data.append(d.inherit(np.concatenate((d, padding), axis=None)))
                 _data = new_data
+        timings["zero-filling"] = time.time() - start_time
 
         # 2b) Line broadening
         lb_factor = self.get_parameter("lb_factor")
         if lb_factor != 0:
+            time_axis = _data.time_axis() if isCSI else _data[0].time_axis()
+            exp_weight = np.exp(-time_axis * np.pi * lb_factor)
             if isCSI:
-                for ix in range(xdim):
-                    for iy in range(ydim):
-                        for iz in range(zdim):
-                            d = _data[ix][iy][iz]
-                            time_axis = d.time_axis()
-                            exp_weight = np.exp(-time_axis * np.pi * lb_factor)
-                            _data[ix][iy][iz] = d.inherit(d * exp_weight)
+                _data = _data.inherit(np.asarray(_data) * exp_weight)
             else:
-                time_axis = _data[0].time_axis()
-                exp_weight = np.exp(-time_axis * np.pi * lb_factor)
                 lb_data = []
                 for d in _data:
                     lb_data.append(d.inherit(d * exp_weight))
                 _data = lb_data
+        timings["line broadening"] = time.time() - start_time - sum(timings.values())
 
         # Keep a copy for plotting (for both SVS and CSI, store the pre-aligned data)
         self.freq_in = _data
@@ -194,13 +181,10 @@ class TEBasedPhaseCorrecton31P(api.ProcessingNode):
         # 3) Apply first-order correction once to all data
         self.firstOrderPhases = []
         if isCSI:
-            for ix in range(xdim):
-                for iy in range(ydim):
-                    for iz in range(zdim):
-                        d = _data[ix][iy][iz]
-                        p1 = get_phase_from_TE(d)
-                        self.firstOrderPhases.append(p1)  # (for plotting, order may be arbitrary)
-                        _data[ix][iy][iz] = d.adjust_phase(0.0, first_phase=-p1)
+            # the voxels share the acquisition parameters, hence the TE
+            p1 = get_phase_from_TE(_data)
+            self.firstOrderPhases = [p1] * int(np.prod(_data.grid_shape))
+            _data = _data.adjust_phase(0.0, first_phase=-p1)
         else:
             corrected_data = []
             for d in _data:
@@ -208,21 +192,13 @@ class TEBasedPhaseCorrecton31P(api.ProcessingNode):
                 self.firstOrderPhases.append(p1)
                 corrected_data.append(d.adjust_phase(0.0, first_phase=-p1))
             _data = corrected_data
+        timings["first-order phase"] = time.time() - start_time - sum(timings.values())
 
         # 4) Build target spectrum
         if isCSI:
-            # For multivoxel, choose the voxel with the highest spectral area.
-            target_voxel = _data[0][0][0]
-            highest_spec_area = np.sum(np.real(target_voxel.spectrum()))
-            for ix in range(xdim):
-                for iy in range(ydim):
-                    for iz in range(zdim):
-                        d = _data[ix][iy][iz]
-                        spec_area = np.sum(np.real(d.spectrum()))
-                        if spec_area > highest_spec_area:
-                            highest_spec_area = spec_area
-                            target_voxel = d
-            self.target = target_voxel.copy()
+            # For multivoxel, choose the voxel with the highest spectral area (the first one in voxel order).
+            spec_area = np.sum(np.real(_data.spectrum()), axis=-1)
+            self.target = _data.voxel(*np.unravel_index(np.argmax(spec_area), spec_area.shape)).copy()
         else:
             # For SVS, use median or user-specified target.
             if self.get_parameter("median") == "True":
@@ -241,21 +217,16 @@ class TEBasedPhaseCorrecton31P(api.ProcessingNode):
         lower_ppm, upper_ppm = ppm_bounds
 
         def peak_max_zero_phase(data_obj, ppm1, ppm2):
+            # all candidates at once: adjust_phase(-np.deg2rad(ph_deg)) multiplies the spectrum by exp(-1j * a0 * ph_rad)
             candidate_phases_deg = np.arange(-180, 181, 3)
             freq_ppm = data_obj.frequency_axis_ppm()
             idxs = np.where((freq_ppm >= ppm1) & (freq_ppm <= ppm2))[0]
             if len(idxs) == 0:
                 idxs = np.arange(len(freq_ppm))
-            best_phase_deg = 0.0
-            best_peak = -np.inf
-            for ph_deg in candidate_phases_deg:
-                trial = data_obj.adjust_phase(-np.deg2rad(ph_deg))
-                spec = np.real(trial.spectrum())
-                peak_val = np.max(spec[idxs])
-                if peak_val > best_peak:
-                    best_peak = peak_val
-                    best_phase_deg = ph_deg
-            return best_phase_deg
+            a0, _ = phase_ramps(data_obj)
+            spec = np.asarray(data_obj.spectrum())[idxs]
+            peak_vals = np.max(np.real(spec[None, :] * np.exp(-1j * a0 * np.deg2rad(candidate_phases_deg))[:, None]), axis=-1)
+            return candidate_phases_deg[np.argmax(peak_vals)] # first best, as in a loop over the candidates
 
         if do_phase:
             best_phase_deg = peak_max_zero_phase(self.target, lower_ppm, upper_ppm)
@@ -271,99 +242,43 @@ class TEBasedPhaseCorrecton31P(api.ProcessingNode):
         # Compute frequency shift in Hz (target.f0 is the Larmor frequency)
         freq_shift_Hz = -peak_ppm * self.target.f0
         self.target = self.target.adjust_frequency(-freq_shift_Hz)
+        timings["target"] = time.time() - start_time - sum(timings.values())
 
-        # 7) Now perform LS optimization (only on frequency and 0th-order phase)
-        # Compute spectral weights based on the target's frequency axis.
-        freq_array = self.target.frequency_axis()
+        # 7) Now perform LS optimization (only on frequency and 0th-order phase),
+        # within the reference range of the target's frequency axis, for all spectra or voxels at once
         freqRange_Hz = [self.target.ppm_to_hertz(ppm) for ppm in ppm_bounds]
         freqRange_Hz.sort()
-        spectral_weights_global = np.logical_and(
-            freq_array >= freqRange_Hz[0],
-            freq_array <= freqRange_Hz[1]
-        )
+        spectra = _data.reshape(-1, _data.shape[-1]) if isCSI else _data
+        n = len(spectra)
+        if do_freq or do_phase:
+            # initial guess from the target frequency shift
+            final_freqShift, final_zeroPhase = spectral_registration(spectra, self.target, freqRange_Hz,
+                align_freq=do_freq, align_phase=do_phase, init_freq=freq_shift_Hz, inclusive=True)
+        else:
+            final_freqShift, final_zeroPhase = np.zeros(n), np.zeros(n)
+        timings["least squares"] = time.time() - start_time - sum(timings.values())
 
-        # Define residual function
-        def residual(params, dataset, spectral_weights):
-            idx = 0
-            temp = dataset.copy()
+        # Apply the corrections to get final aligned data.
+        if isCSI:
+            aligned = _data
             if do_freq:
-                fs = params[idx]
-                idx += 1
-                temp = temp.adjust_frequency(-fs)
-            else:
-                fs = 0.0
+                aligned = aligned.adjust_frequency(-final_freqShift.reshape(_data.grid_shape))
             if do_phase:
-                zp = params[idx]
-                idx += 1
-                temp = temp.adjust_phase(-zp)
-            else:
-                zp = 0.0
-            diff_data = temp - self.target
-            spec_diff = diff_data.spectrum()
-            weighted_spectrum = spec_diff * spectral_weights
-            weighted_spectrum = weighted_spectrum[weighted_spectrum != 0]
-            resid_td = np.fft.ifft(np.fft.ifftshift(weighted_spectrum))
-            out_vec = np.concatenate([resid_td.real, resid_td.imag])
-            return out_vec
-
-        output = []
-        # LS optimization differs for SVS versus CSI
-        if not isCSI:
-            # For single voxel: iterate over _data (a list)
+                aligned = aligned.adjust_phase(-final_zeroPhase.reshape(_data.grid_shape))
+            output = list(raw_data)
+            output[0] = aligned
+        else:
+            output = []
             for i, d in enumerate(_data):
-                guess_list = []
-                if do_freq:
-                    guess_list.append(freq_shift_Hz)  # initial guess from target frequency shift
-                if do_phase:
-                    guess_list.append(0.0)
-                guess = np.array(guess_list)
-                if do_freq or do_phase:
-                    out = scipy.optimize.leastsq(residual, guess, args=(d, spectral_weights_global), maxfev=500)
-                    pars = out[0]
-                    idx_par = 0
-                    final_freqShift = pars[idx_par] if do_freq else 0.0
-                    if do_freq: idx_par += 1
-                    final_zeroPhase = pars[idx_par] if do_phase else 0.0
-                else:
-                    final_freqShift = 0.0
-                    final_zeroPhase = 0.0
-                # Apply the corrections to get final aligned dataset.
                 aligned = d.copy()
                 if do_freq:
-                    aligned = aligned.adjust_frequency(-final_freqShift)
+                    aligned = aligned.adjust_frequency(-final_freqShift[i])
                 if do_phase:
-                    aligned = aligned.adjust_phase(-final_zeroPhase)
+                    aligned = aligned.adjust_phase(-final_zeroPhase[i])
                 output.append(aligned)
-        else:
-            # For CSI: iterate over voxels in a triple loop
-            output = copy.deepcopy(_data)
-            for ix in range(xdim):
-                for iy in range(ydim):
-                    for iz in range(zdim):
-                        voxel = _data[ix][iy][iz]
-                        guess_list = []
-                        if do_freq:
-                            guess_list.append(freq_shift_Hz)
-                        if do_phase:
-                            guess_list.append(0.0)
-                        guess = np.array(guess_list)
-                        if do_freq or do_phase:
-                            out = scipy.optimize.leastsq(residual, guess, args=(voxel, spectral_weights_global), maxfev=500)
-                            pars = out[0]
-                            idx_par = 0
-                            final_freqShift = pars[idx_par] if do_freq else 0.0
-                            if do_freq: idx_par += 1
-                            final_zeroPhase = pars[idx_par] if do_phase else 0.0
-                        else:
-                            final_freqShift = 0.0
-                            final_zeroPhase = 0.0
-                        corrected_voxel = voxel.copy()
-                        if do_freq:
-                            corrected_voxel = corrected_voxel.adjust_frequency(-final_freqShift)
-                        if do_phase:
-                            corrected_voxel = corrected_voxel.adjust_phase(-final_zeroPhase)
-                        output[ix][iy][iz] = corrected_voxel
         data["output"] = output
+        timings["output"] = time.time() - start_time - sum(timings.values())
+        utils.log_info("Time per stage of " + self.__class__.__name__ + ": " + ", ".join("{} {:.3f}".format(k, v) for k, v in timings.items()))
 
     def plot(self, figure, data):
         """
@@ -399,13 +314,13 @@ class TEBasedPhaseCorrecton31P(api.ProcessingNode):
                               header["CSIMatrix_Size[2]"]]
             central_idx = (int(CSIMatrix_Size[0]//2), int(CSIMatrix_Size[1]//2), int(CSIMatrix_Size[2]//2))
             ax = figure.add_subplot(1, 2, 1)
-            central_input = data["input"][central_idx[0]][central_idx[1]][central_idx[2]]
+            central_input = data["input"][0][central_idx[0]][central_idx[1]][central_idx[2]]
             ax.plot(central_input.frequency_axis_ppm(), np.real(central_input.spectrum()))
             ax.set_xlabel("ppm")
             ax.set_ylabel("Amplitude")
             ax.set_title("Input central voxel")
             ax = figure.add_subplot(1, 2, 2)
-            central_output = data["output"][central_idx[0]][central_idx[1]][central_idx[2]]
+            central_output = data["output"][0][central_idx[0]][central_idx[1]][central_idx[2]]
             ax.plot(central_output.frequency_axis_ppm(), np.real(central_output.spectrum()))
             ax.set_xlabel("ppm")
             ax.set_ylabel("Amplitude")
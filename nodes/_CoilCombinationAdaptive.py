@@ -20,30 +20,38 @@ def eig_power(R):
     v = np.ones((rows, cols, ncoils), dtype=complex)
     d = np.zeros((rows, cols))
     for i in range(0, N_iterations):
-        v = np.sum(R * np.tile(v[..., None], (1, 1, 1, ncoils)), 2)
+        v = np.sum(R * v[..., None], 2) # broadcast instead of tiling v over the last axis
         d = np.sqrt(np.sum(np.abs(v) ** 2, 2))
         d[d <= np.finfo(float).eps] = np.finfo(float).eps
-        v = v / np.tile(d[..., None], (1, 1, ncoils))
+        v = v / d[..., None]
     p1 = np.angle(np.conj(v[:, :, 0]))
-    v = v * np.tile(np.exp(1j * p1)[..., None], (1, 1, ncoils))
+    v = v * np.exp(1j * p1)[..., None]
     v = np.conj(v)
     return v, d
 
+def combine_coils(fids, csm, phase, csmsq, chunk=16):
+    """
+    fids: list of (coils, points) MRSData; returns the list of combined FIDs.
+    All transients are combined at once, with the coils moved to the last, contiguous axis so that
+    the sums over coils are done in the same order as for a single time point, giving identical results.
+    """
+    stack = np.array(fids)
+    output = np.empty((stack.shape[0], stack.shape[-1]), dtype=complex)
+    for n in range(0, stack.shape[0], chunk): # bounds the size of the temporaries
+        d = np.ascontiguousarray(np.swapaxes(stack[n:n+chunk], -1, -2)) # (transients, points, coils)
+        output[n:n+chunk] = np.sum(np.conj(csm) * d * phase, -1) / csmsq
+    return [fids[i].inherit(output[i]) for i in range(len(fids))]
+
 def coil_combination_adaptive(data, p=0):
     if p == 0: p = data["input"][0].metadata["ave_per_rep"]
     ref = "wref" if "wref" in data and data["wref"] is not None and len(data["wref"]) != 0 else "input"
     if ref == "input": utils.log_warning("No water reference provided, using averaged FIDs as reference")
-    ref = np.mean(np.array(data[ref]), 0)[:, 0]
+    ref = np.mean(np.array([d[:, 0] for d in data[ref]]), 0) # only the first point is used
     phase = np.exp(-1j*np.angle(ref))
     csm = np.array(estimate_csm(ref * phase)[0][0])
     csmsq = np.sum(csm * np.conj(csm), 0)
     csm[csm < np.finfo(float).eps] = 1
-    output = []
-    for d in data["input"]:
-        output2 = []
-        for i in range(0, d.shape[-1]):
-            output2.append(np.sum(np.conj(csm) * d[:, i] * phase, 0) / csmsq)
-        output.append(d.inherit(np.array(output2)))
+    output = combine_coils(data["input"], csm, phase, csmsq)
 
     sz_output = len(output)
 
@@ -53,12 +61,7 @@ def coil_combination_adaptive(data, p=0):
         data["output"] = [output[i].inherit(np.mean(output[i:i+p], 0)) for i in range(0,len(output), p)]
  
     if "wref" in data and data["wref"] is not None and len(data["wref"]) != 0:
-        output = []
-        for d in data["wref"]:
-            output2 = []
-            for i in range(0, d.shape[-1]):
-                output2.append(np.sum(np.conj(csm) * d[:, i] * phase, 0) / csmsq)
-            output.append(d.inherit(np.array(output2)))
+        output = combine_coils(data["wref"], csm, phase, csmsq)
 
         if p == sz_output:
             data["wref_output"] = output
@@ -0,0 +1,177 @@
+# phase searches shared by the 31P nodes, evaluated on one precomputed spectrum instead of one MRSData per candidate
+import os
+import numpy as np
+from scipy.optimize import leastsq, differential_evolution, minimize
+from concurrent.futures import ProcessPoolExecutor
+import interface.utils as utils
+
+def phase_ramps(d):
+    """
+    Coefficients (a0, k1) such that d.adjust_phase(p0, first_phase=p1).spectrum() equals
+    d.spectrum() * exp(1j * (a0 * p0 + p1 * k1)), probed so that the sign conventions of MRSData are matched exactly
+    """
+    f = d.frequency_axis()
+    probe = d.inherit(np.fft.ifft(np.fft.ifftshift(np.ones(d.shape[-1], dtype=complex))))
+    a0 = np.angle(np.asarray(probe.adjust_phase(0.5).spectrum())[0]) / 0.5
+    p1 = 0.5 / max(np.max(np.abs(f)), 1e-12) # keeps the probed phase within (-pi, pi)
+    k1 = np.angle(np.asarray(probe.adjust_phase(0, first_phase=p1).spectrum())) / p1
+    return a0, k1
+
+def _peak_values(S, a0k, k1, phases0, phases1, i, j, chunk=16384):
+    """max over the region of the real spectrum phased by (phases0[i], phases1[j]), for each pair"""
+    out = np.empty(len(i))
+    for c in range(0, len(i), chunk):
+        ii, jj = i[c:c + chunk], j[c:c + chunk]
+        phi = a0k * phases0[ii, None] + phases1[jj, None] * k1[None, :]
+        out[c:c + chunk] = np.max(S.real * np.cos(phi) - S.imag * np.sin(phi), axis=-1)
+    return out
+
+def peak_max_phase_search(data_obj, lower_bound, upper_bound, phases0=None, phases1=None, strides=(8, 256)):
+    """
+    Zero-order (degrees) and first-order phases of the grid phases0 x phases1 that maximise the real spectrum
+    between lower_bound and upper_bound (ppm). Same result as trying every pair in order and keeping the first best,
+    found coarse-to-fine: a grid cell is only refined if its best value, bounded from the corner value by the
+    derivative of the phased spectrum, can still beat the best peak found so far; the search stops when no cell can.
+    """
+    phases0 = np.arange(-180, 181, 2) if phases0 is None else np.asarray(phases0)
+    phases1 = np.arange(0, 0.004, 0.0000005) if phases1 is None else np.asarray(phases1)
+    freq_ppm = data_obj.frequency_axis_ppm()
+    region_indices = np.where((freq_ppm >= lower_bound) & (freq_ppm <= upper_bound))[0]
+    if len(region_indices) == 0:
+        region_indices = np.arange(len(freq_ppm))
+    a0, k1 = phase_ramps(data_obj)
+    # the candidates are data_obj.adjust_phase(-np.deg2rad(phase0), first_phase=-phase1)
+    S = np.asarray(data_obj.spectrum())[region_indices]
+    k1 = -k1[region_indices]
+    a0k = -a0 * np.pi / 180
+    n0, n1 = len(phases0), len(phases1)
+    # Lipschitz constants of the peak value along each grid axis, per grid step
+    L0 = np.max(np.abs(S)) * abs(a0k) * (np.max(np.abs(np.diff(phases0))) if n0 > 1 else 0)
+    L1 = np.max(np.abs(S * k1)) * (np.max(np.abs(np.diff(phases1))) if n1 > 1 else 0)
+    tol = 1e-9 * max(np.max(np.abs(S)), np.finfo(float).tiny) # keeps cells that could tie up to rounding errors
+
+    s0, s1 = min(strides[0], n0), min(strides[1], n1)
+    i, j = np.meshgrid(np.arange(0, n0, s0), np.arange(0, n1, s1), indexing="ij")
+    i, j = i.ravel(), j.ravel()
+    seen_i, seen_j, seen_v = [], [], []
+    best = -np.inf
+    while len(i) > 0:
+        v = _peak_values(S, a0k, k1, phases0, phases1, i, j)
+        seen_i.append(i); seen_j.append(j); seen_v.append(v)
+        best = max(best, np.max(v))
+        if s0 == 1 and s1 == 1: break
+        # each point is the corner of a cell [i, i+s0) x [j, j+s1) of the finer grid
+        keep = v + L0 * (s0 - 1) + L1 * (s1 - 1) >= best - tol
+        i, j = i[keep], j[keep]
+        h0, h1 = (s0 + 1) // 2, (s1 + 1) // 2
+        ci = [i] if s0 == 1 else [i, i + h0]
+        cj = [j] if s1 == 1 else [j, j + h1]
+        i = np.concatenate([a for a in ci for _ in cj])
+        j = np.concatenate([b for _ in ci for b in cj])
+        inside = np.logical_and(i < n0, j < n1)
+        i, j = i[inside], j[inside]
+        s0, s1 = (s0 + 1) // 2 if s0 > 1 else 1, (s1 + 1) // 2 if s1 > 1 else 1
+    i, j, v = np.concatenate(seen_i), np.concatenate(seen_j), np.concatenate(seen_v)
+    # first best in the order of the exhaustive loops (zero-order outer, first-order inner)
+    candidates = np.nonzero(v == np.max(v))[0]
+    k = candidates[np.lexsort((j[candidates], i[candidates]))[0]]
+    return phases0[i[k]], phases1[j[k]]
+
+def _refine_residual(params, S, T, a0, k1):
+    # spectrum of S.adjust_phase(-np.deg2rad(delta0), first_phase=-delta1) - T within the region, back in the time domain
+    delta0, delta1 = params
+    diff = S * np.exp(1j * (-a0 * np.deg2rad(delta0) - delta1 * k1)) - T
+    diff = diff[diff != 0]
+    resid_td = np.fft.ifft(np.fft.ifftshift(diff))
+    return np.concatenate([resid_td.real, resid_td.imag])
+
+def _refine_chunk(args):
+    S, T, a0, k1, maxfev = args
+    out = np.zeros((len(S), 2))
+    for v in range(len(S)):
+        out[v] = leastsq(_refine_residual, x0=(0.0, 0.0), args=(S[v], T, a0, k1), maxfev=maxfev)[0]
+    return out
+
+def _pool_map(fn, items, workers, what):
+    """list(map(fn, items)) over a process pool of workers, in place if it cannot be started"""
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(fn, items))
+        except Exception as e: # e.g. no process pool in this environment
+            utils.log_debug(f"{what} in place: {e}")
+    return [fn(item) for item in items]
+
+def refine_phases(spectra, target, region_indices, a0, k1, maxfev=500, workers=None, min_parallel=64):
+    """
+    Additional (zero-order in degrees, first-order) phases fitting each spectrum to the target spectrum by least squares
+    within region_indices, as leastsq on the residual of adjust_phase(-np.deg2rad(delta0), first_phase=-delta1) - target,
+    for spectra of shape (n, points) and the phase_ramps (a0, k1) of the data. The fits are split in chunks run by a
+    process pool when there are at least min_parallel spectra; only the region of each spectrum is sent to the workers.
+    """
+    S = np.ascontiguousarray(np.asarray(spectra)[:, region_indices])
+    T = np.asarray(target)[region_indices]
+    k1 = np.asarray(k1)[region_indices]
+    if workers is None: workers = os.cpu_count() or 1
+    workers = max(1, min(int(workers), len(S)))
+    if workers == 1 or len(S) < min_parallel:
+        return _refine_chunk((S, T, a0, k1, maxfev))
+    chunks = [(c, T, a0, k1, maxfev) for c in np.array_split(S, min(len(S), workers * 4))]
+    return np.concatenate(_pool_map(_refine_chunk, chunks, workers, "Refining phases"))
+
+def phased_spectra(S, a0, k1, params):
+    """
+    Spectra of adjust_phase(-np.deg2rad(phc0), first_phase=-phc1) for params = (phc0, phc1) of shape (2,) or (2, P),
+    from the spectrum S and its phase_ramps; shape (P, points)
+    """
+    phc0, phc1 = np.atleast_1d(params[0]), np.atleast_1d(params[1])
+    return S[None, :] * np.exp(1j * (-a0 * np.deg2rad(phc0)[:, None] - phc1[:, None] * k1[None, :]))
+
+def entropy_objective(params, S, a0, k1, m=1, c=1.0):
+    """
+    Shannon-type entropy of the normalized derivative of order m of the real phased spectrum, plus c times the
+    fraction of negative points; params as in phased_spectra, one value per candidate for a (2, P) population
+    """
+    R = np.real(phased_spectra(S, a0, k1, params))
+    n = R.shape[-1]
+    dR = R
+    for _ in range(m):
+        dR = np.gradient(dR, axis=-1)
+    abs_dR = np.abs(dR)
+    total = np.sum(abs_dR, axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        h = abs_dR / total # normalized derivative
+    epsilon = 1e-12
+    value = np.sum(h * np.log(h + epsilon), axis=-1) + c * np.sum(R < 0, axis=-1) / n
+    value[total[:, 0] == 0] = np.inf
+    return value if np.ndim(params[0]) > 0 else value[0]
+
+def two_peak_objective(params, S_pcr, k1_pcr, S_atp, k1_atp, a0, epsilon=1e-6):
+    """
+    Negative sum over the PCr and a-ATP regions of the ratio of the real peak amplitude to the overall imaginary
+    content, which is scale invariant; params as in phased_spectra
+    """
+    value = 0
+    for S, k1 in [(S_pcr, k1_pcr), (S_atp, k1_atp)]:
+        spec = phased_spectra(S, a0, k1, params)
+        value = value - np.max(np.real(spec), axis=-1) / (np.sum(np.abs(np.imag(spec)), axis=-1) + epsilon)
+    return value if np.ndim(params[0]) > 0 else value[0]
+
+def _de_run(job):
+    objective, bounds, args, seed, options, refine = job
+    # the objectives evaluate the whole population at once
+    result = differential_evolution(objective, bounds, args=args, seed=seed, vectorized=True, updating="deferred", **options)
+    x = result.x
+    if refine: # local refinement using Nelder-Mead, starting from the DE solution
+        x = minimize(objective, x, args=args, method="Nelder-Mead", options={"maxiter": 10000, "disp": False}).x
+    return x, objective(x, *args)
+
+def de_runs(objective, bounds, args, seeds, refine=False, workers=None, **options):
+    """
+    [(x, objective value)] of differential_evolution of objective for each seed, optionally refined by Nelder-Mead;
+    the seeds are run concurrently in a process pool. objective must accept a (2, P) population
+    """
+    if workers is None: workers = os.cpu_count() or 1
+    workers = max(1, min(int(workers), len(seeds)))
+    jobs = [(objective, bounds, args, seed, options, refine) for seed in seeds]
+    return _pool_map(_de_run, jobs, workers, "Differential evolution")
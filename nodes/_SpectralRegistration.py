@@ -0,0 +1,116 @@
+# batched spectral registration used by FreqPhaseAlignment
+# adapted from suspect.processing.frequency_correction.spectral_registration, solved for all transients at once
+import numpy as np
+
+def shift_signs(d):
+    """Signs used by MRSData.adjust_frequency and adjust_phase, so that the batched model matches them exactly"""
+    probe = d.inherit(np.ones(d.shape[-1], dtype=complex))
+    t = d.time_axis()
+    sf = np.sign(np.angle(probe.adjust_frequency(0.25 / (t[1] - t[0]))[1])) # quarter turn over one dwell time
+    sp = np.sign(np.angle(probe.adjust_phase(np.pi / 2)[0]))
+    return sf, sp
+
+def xcorr_frequency_guess(spectra, target_spectrum, window, df):
+    """Frequency offsets (Hz) maximising the cross-correlation of the magnitude spectra in the window"""
+    n = spectra.shape[-1]
+    a = np.abs(spectra) * window
+    b = np.abs(target_spectrum) * window
+    corr = np.fft.ifft(np.fft.fft(a, axis=-1) * np.conj(np.fft.fft(b)), axis=-1).real
+    lag = np.argmax(corr, axis=-1)
+    lag[lag > n // 2] -= n
+    return lag * df
+
+def spectral_registration(data, target, freq_range, align_freq=True, align_phase=True, init_xcorr=False, maxiter=100, tol=1.49012e-08,
+                          init_freq=None, inclusive=False):
+    """
+    data: list of MRSData of the same length, or an (N, points) MRSData; target: MRSData; freq_range: (low, high) in Hz,
+    bounds excluded unless inclusive. Returns the frequency (Hz) and phase (rad) shifts to remove from each transient with
+    adjust_frequency(-freqShift).adjust_phase(-phaseShift), as found by a Levenberg-Marquardt fit
+    of the spectra within freq_range, vectorised over the transients, starting from the frequency init_freq if given.
+    """
+    sf, sp = shift_signs(data[0])
+    t = data[0].time_axis()
+    if inclusive:
+        window = np.logical_and(freq_range[0] <= data[0].frequency_axis(), freq_range[1] >= data[0].frequency_axis())
+    else:
+        window = np.logical_and(freq_range[0] < data[0].frequency_axis(), freq_range[1] > data[0].frequency_axis())
+    idx = np.nonzero(window)[0]
+    X = np.array(data, dtype=complex) # (N, points)
+    Y = np.asarray(target, dtype=complex)
+    Ym = np.fft.fftshift(np.fft.fft(Y))[idx]
+    dfreq = -2j * np.pi * sf * t # d/df of the frequency ramp exponent
+    n = X.shape[0]
+    mask = np.array([bool(align_freq), bool(align_phase)], dtype=float)
+
+    p = np.zeros((n, 2))
+    if init_freq is not None and align_freq:
+        p[:, 0] = init_freq
+    elif init_xcorr and align_freq:
+        spectra = np.fft.fftshift(np.fft.fft(X, axis=-1), axes=-1)
+        df = abs(data[0].frequency_axis()[1] - data[0].frequency_axis()[0])
+        p[:, 0] = sf * xcorr_frequency_guess(spectra, np.fft.fftshift(np.fft.fft(Y)), window, df) # spectrum moves by -sf*f
+
+    # the window usually holds a few bins and the data is zero-filled: evaluating only those bins over the
+    # non-zero points as a matrix product is cheaper than full FFTs
+    npoints = X.shape[-1]
+    support = np.nonzero(np.any(X != 0, axis=0))[0]
+    L = support[-1] + 1 if len(support) > 0 else npoints
+    if L * len(idx) <= 4 * npoints * np.log2(npoints):
+        bins = np.fft.fftshift(np.arange(npoints))[idx]
+        F = np.exp(-2j * np.pi * np.outer(np.arange(L), bins) / npoints)
+        X, t, dfreq = X[:, :L], t[:L], dfreq[:L]
+        def masked_spectrum(Z):
+            return Z @ F
+    else:
+        def masked_spectrum(Z):
+            return np.fft.fftshift(np.fft.fft(Z, axis=-1), axes=-1)[:, idx]
+
+    def evaluate(p, rows, jac=False):
+        Z = X[rows] * np.exp(-1j * (sf * 2 * np.pi * p[:, :1] * t + sp * p[:, 1:]))
+        S = masked_spectrum(Z)
+        r = S - Ym
+        if not jac: return r
+        J = np.zeros(r.shape + (2,), dtype=complex)
+        if align_freq: J[..., 0] = masked_spectrum(Z * dfreq)
+        if align_phase: J[..., 1] = -1j * sp * S
+        return r, J
+
+    everything = np.arange(n)
+    r, J = evaluate(p, everything, jac=True)
+    cost = np.sum(np.abs(r) ** 2, axis=-1)
+    lam = np.full(n, 1e-3)
+    nu = np.full(n, 2.0)
+    active = np.ones(n, dtype=bool)
+    diag = (np.arange(2), np.arange(2))
+    for _ in range(maxiter):
+        rows = np.nonzero(active)[0]
+        if len(rows) == 0: break
+        # Marquardt step of the real-valued problem, one 2x2 system per transient; fixed parameters get a zero step
+        A = np.real(np.einsum("nki,nkj->nij", np.conj(J[rows]), J[rows])) * np.outer(mask, mask)
+        g = np.real(np.einsum("nki,nk->ni", np.conj(J[rows]), r[rows])) * mask
+        d = np.where(mask > 0, np.maximum(A[:, diag[0], diag[1]], np.finfo(float).tiny), 1)
+        Ad = A.copy()
+        Ad[:, diag[0], diag[1]] = d * (1 + lam[rows, None] * mask)
+        step = -np.linalg.solve(Ad, g[..., None])[..., 0]
+        p_new = p[rows] + step
+        r_new = evaluate(p_new, rows)
+        cost_new = np.sum(np.abs(r_new) ** 2, axis=-1)
+        # gain ratio of the actual over the linearised decrease of the cost drives the damping (Nielsen)
+        predicted = -2 * np.sum(step * g, axis=-1) - np.einsum("ni,nij,nj->n", step, A, step)
+        rho = (cost[rows] - cost_new) / np.maximum(predicted, np.finfo(float).tiny)
+        better = np.logical_and(rho > 0, cost_new < cost[rows])
+        small = np.max(np.abs(step), axis=-1) <= tol * (1 + np.max(np.abs(p[rows]), axis=-1))
+        converged = np.logical_or(np.logical_and(better, cost[rows] - cost_new <= tol * cost[rows]), small)
+        accepted = rows[better]
+        rejected = rows[~better]
+        p[accepted] = p_new[better]
+        cost[accepted] = cost_new[better]
+        lam[accepted] *= np.maximum(1 / 3, 1 - (2 * rho[better] - 1) ** 3)
+        nu[accepted] = 2
+        lam[rejected] *= nu[rejected]
+        nu[rejected] *= 2
+        active[rows[converged]] = False
+        active[lam > 1e12] = False
+        if len(accepted) > 0:
+            r[accepted], J[accepted] = evaluate(p[accepted], accepted, jac=True)
+    return p[:, 0] * mask[0], p[:, 1] * mask[1]
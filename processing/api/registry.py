@@ -30,7 +30,8 @@ def RegisterNode(node, idname=""):
     if idname == "":
         raise TypeError("Please specify the idname of the node you want to register!")
     else:
-        if idname in NODE_REGISTRY:
+        # a LazyNode stand-in (processing/node_manifest.py) gives way to the class registered by its module
+        if idname in NODE_REGISTRY and not getattr(NODE_REGISTRY[idname], "replaced_by", lambda node: False)(node):
             # raise NodeExistsError(idname)
             # print(f"Node with idname '{idname}' already exists in the registry.")
             return
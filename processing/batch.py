@@ -0,0 +1,141 @@
+import os
+import time
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from interface import utils
+
+# Cohort batch: every participant folder becomes an independent job, a HeadlessSession run in a
+# worker process, so several participants are processed at once. Each job loads its own pipeline
+# nodes from the saved .pipe file and fits LCModel in its own output folder. The log lines of the
+# workers are sent back through a queue and written to the log of the caller, prefixed with the participant.
+
+MET_FOLDER = "metabolite_files"
+WATER_FOLDER = "water_reference"
+SEG_FOLDER = "tissue_segmentation_files"
+
+def default_workers():
+    return max(1, min(4, os.cpu_count() or 1))
+
+def find_participants(batch_folder):
+    """Subfolders whose name starts with "Participant" (case-insensitive)"""
+    return sorted(os.path.join(batch_folder, d) for d in os.listdir(batch_folder)
+                  if os.path.isdir(os.path.join(batch_folder, d)) and d.lower().startswith("participant"))
+
+def shared_files(batch_folder):
+    """First non-empty .BASIS and .CONTROL files of the batch folder, used for all participants"""
+    basis, control = [], []
+    for fname in sorted(os.listdir(batch_folder)):
+        fullpath = os.path.join(batch_folder, fname)
+        if not os.path.isfile(fullpath) or os.path.getsize(fullpath) == 0: continue
+        if fname.lower().endswith(".basis"): basis.append(fullpath)
+        elif fname.lower().endswith(".control"): control.append(fullpath)
+    return (basis[0] if basis else None), (control[0] if control else None)
+
+def participant_job(part_folder, study_folder, pipeline, **options):
+    """Keyword arguments of the HeadlessSession of a participant; None if it has no MRS files"""
+    def listfiles(sub):
+        folder = os.path.join(part_folder, sub)
+        if not os.path.exists(folder): return []
+        return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(tuple(utils.supported_files)))
+    inputs = listfiles(MET_FOLDER)
+    if len(inputs) == 0: return None
+    water = listfiles(WATER_FOLDER)
+    job = dict(pipeline=pipeline, inputs=inputs, wref=water[0] if water else None,
+               out=os.path.join(study_folder, os.path.basename(part_folder)), wm=None, gm=None, csf=None)
+    seg_folder = os.path.join(part_folder, SEG_FOLDER)
+    if os.path.exists(seg_folder):
+        for f in sorted(os.listdir(seg_folder)):
+            fname_lower = f.lower()
+            if "wm" in fname_lower: job["wm"] = os.path.join(seg_folder, f)
+            elif "gm" in fname_lower: job["gm"] = os.path.join(seg_folder, f)
+            elif "csf" in fname_lower: job["csf"] = os.path.join(seg_folder, f)
+    job.update(options)
+    return job
+
+class _LogStream:
+    """Console log of a worker: written to the participant's log file and sent to the caller"""
+    def __init__(self, name, logfile, messages):
+        self.name = name
+        self.file = logfile
+        self.messages = messages
+
+    def write(self, text):
+        self.file.write(text)
+        if self.messages is not None:
+            for line in text.splitlines():
+                self.messages.put((self.name, line.split(": ", 1)[-1])) # without the timestamp
+
+    def flush(self):
+        self.file.flush()
+
+def run_participant(name, job, messages=None, debug=False):
+    from processing.headless import HeadlessSession
+    start_time = time.time()
+    result = {"name": name, "ok": False, "error": None, "time": 0, "outputpath": None}
+    logpath = os.path.join(os.path.dirname(job["out"]), name + ".log")
+    with open(logpath, "w") as f:
+        utils.init_console_logging(stream=_LogStream(name, f, messages), _debug=debug)
+        try:
+            session = HeadlessSession(**job)
+            result["ok"] = session.run()
+            result["outputpath"] = session.outputpath
+        except Exception:
+            result["error"] = traceback.format_exc()
+            f.write(result["error"])
+    utils.init_console_logging(_debug=debug) # the log file is closed; the worker runs the next participant
+    result["time"] = time.time() - start_time
+    return result
+
+def _forward(messages):
+    while True:
+        item = messages.get()
+        if item is None: return
+        name, line = item
+        utils.log_info(f"{name}: {line}")
+
+def pending_jobs(jobs, ledger):
+    """Jobs that the ledger does not record as complete with the same inputs and pipeline; marks them pending"""
+    pending = {}
+    for name, job in jobs.items():
+        hashes = ledger.job_hashes(job)
+        if ledger.is_complete(name, hashes):
+            utils.log_info(f"Skipping participant {name}: already processed in {ledger.outputpath(name)}")
+            continue
+        ledger.start(name, hashes)
+        pending[name] = job
+    return pending
+
+def run_batch(jobs, workers=None, debug=False, ledger=None):
+    """
+    jobs: {participant: HeadlessSession kwargs}; yields the run_participant results as participants complete,
+    recorded in the ledger if given
+    """
+    if len(jobs) == 0: return
+    if workers is None: workers = default_workers()
+    workers = max(1, min(int(workers), len(jobs)))
+    context = multiprocessing.get_context("spawn") # fresh workers: forking the threaded GUI process can deadlock them
+    manager = context.Manager()
+    messages = manager.Queue()
+    forwarder = threading.Thread(target=_forward, args=[messages], daemon=True)
+    forwarder.start()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = {executor.submit(run_participant, name, job, messages, debug): name for name, job in jobs.items()}
+            for future in as_completed(futures):
+                try: result = future.result()
+                except Exception as e: # e.g. a worker process that crashed
+                    result = {"name": futures[future], "ok": False, "error": str(e), "time": 0, "outputpath": None}
+                if ledger is not None: ledger.finish(result)
+                yield result
+    finally:
+        messages.put(None)
+        forwarder.join()
+        manager.shutdown()
+
+def log_result(result, done, total):
+    if result["ok"]:
+        utils.log_info(f"Participant {result['name']} done in {result['time']:.1f} s ({done}/{total})")
+    else:
+        utils.log_error(f"Processing failed for {result['name']} ({done}/{total})" + (f":\n{result['error']}" if result["error"] else ""))
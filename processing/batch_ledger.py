@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+
+# Job ledger of a batch folder: one row per participant with the hashes of its input files and
+# of the pipeline, its status, timings and output folder. A restarted batch skips the participants
+# that completed with the same inputs and pipeline, and whose output folder still exists.
+# Only the scheduling process writes to it; the workers just return their results.
+
+LEDGER_NAME = "batch_ledger.sqlite"
+_INPUT_KEYS = ["inputs", "wref", "wm", "gm", "csf", "basis", "control"]
+_RUN_KEYS = ["save_plots", "save_raw", "save_store", "plot_dpi", "plot_format"] # options changing the outputs
+
+class BatchLedger:
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.db = sqlite3.connect(filepath, check_same_thread=False)
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS jobs (participant TEXT PRIMARY KEY, inputs_hash TEXT, pipeline_hash TEXT,"
+                            " status TEXT, started REAL, finished REAL, duration REAL, outputpath TEXT, error TEXT)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, hash TEXT)")
+
+    def close(self):
+        self.db.close()
+
+    def file_hash(self, path):
+        """Content hash of a file; only recomputed if its size or modification time changed"""
+        stat = os.stat(path)
+        row = self.db.execute("SELECT size, mtime, hash FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime: return row[2]
+        h = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""): h.update(block)
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, stat.st_size, stat.st_mtime, h.hexdigest()))
+        return h.hexdigest()
+
+    def pipeline_hash(self, path):
+        """
+        Hash of the nodes, parameter values and wires of a .pipe file; the editor positions of the nodes,
+        also saved in the file, do not change the outputs
+        """
+        try:
+            with open(path, "rb") as f:
+                nodes, wires = pickle.load(f)[:2]
+        except Exception: # not a pipeline saved by the editor
+            return self.file_hash(path)
+        h = hashlib.blake2b(digest_size=20)
+        for idname, nodeid, _, params in sorted(nodes, key=lambda n: str(n[1])):
+            h.update(f"{idname}:{nodeid}:{sorted((str(k), repr(v)) for k, v in params)!r};".encode())
+        h.update(repr(sorted(repr(w) for w in wires)).encode())
+        return h.hexdigest()
+
+    def job_hashes(self, job):
+        """(inputs_hash, pipeline_hash) of a HeadlessSession job"""
+        h = hashlib.blake2b(digest_size=20)
+        for key in _INPUT_KEYS:
+            paths = job.get(key)
+            if not isinstance(paths, list): paths = [paths]
+            for path in paths:
+                h.update(f"{key}:{os.path.basename(path) if path else None}:".encode())
+                if path: h.update(self.file_hash(path).encode())
+        p = hashlib.blake2b(digest_size=20)
+        p.update(self.pipeline_hash(job["pipeline"]).encode())
+        p.update(json.dumps({k: job.get(k) for k in _RUN_KEYS}, sort_keys=True).encode())
+        return h.hexdigest(), p.hexdigest()
+
+    def is_complete(self, name, hashes):
+        row = self.db.execute("SELECT inputs_hash, pipeline_hash, status, outputpath FROM jobs WHERE participant = ?", (name,)).fetchone()
+        if row is None or row[2] != "done" or tuple(row[:2]) != tuple(hashes): return False
+        return row[3] is not None and os.path.exists(row[3])
+
+    def outputpath(self, name):
+        row = self.db.execute("SELECT outputpath FROM jobs WHERE participant = ?", (name,)).fetchone()
+        return row[0] if row is not None else None
+
+    def start(self, name, hashes):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, 'pending', ?, NULL, NULL, NULL, NULL)",
+                            (name, hashes[0], hashes[1], time.time()))
+
+    def finish(self, result):
+        """Records a run_participant result"""
+        finished = time.time()
+        with self.db:
+            self.db.execute("UPDATE jobs SET status = ?, started = ?, finished = ?, duration = ?, outputpath = ?, error = ?"
+                            " WHERE participant = ?", ("done" if result["ok"] else "failed", finished - result["time"], finished,
+                            result["time"], result["outputpath"], result["error"], result["name"]))
@@ -0,0 +1,92 @@
+import os
+import shutil
+import hashlib
+from interface import utils
+from inout.io_lcmodel import read_control
+
+# Cache of LCModel fits: the key hashes the staged .RAW (and .H2O) file of a spectrum, the content of the
+# basis set and of the executable, and the CONTROL parameters, so re-running a fit with the same inputs,
+# e.g. after changing only plotting or mapping settings, restores the outputs without running LCModel.
+# The label is part of the key since the output files are named after it. Entries are folders holding
+# the output files, evicted in least-recently-used order above max_size bytes.
+
+class FitCache:
+    def __init__(self, folder, max_size=2 * 1024**3):
+        self.folder = folder
+        self.max_size = max_size
+        self._hashes = {}
+        if not os.path.exists(self.folder): os.makedirs(self.folder)
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        if (path, stat.st_size, stat.st_mtime) not in self._hashes: # basis and executable are shared by all voxels
+            h = hashlib.blake2b(digest_size=20)
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""): h.update(block)
+            self._hashes[(path, stat.st_size, stat.st_mtime)] = h.hexdigest()
+        return self._hashes[(path, stat.st_size, stat.st_mtime)]
+
+    def key(self, label, inputpath, lcmodelfile):
+        """Key of the fit of the {label}.* files staged in inputpath"""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(label.encode())
+        h.update(self.file_hash(lcmodelfile).encode())
+        params = read_control(os.path.join(inputpath, f"{label}.CONTROL"))
+        basis = params.pop("FILBAS", None)
+        if basis is not None:
+            basis = str(basis).strip("'\"")
+            h.update(self.file_hash(basis).encode() if os.path.exists(basis) else basis.encode())
+        for k in sorted(params.keys()):
+            h.update(f"{k}={params[k]!r};".encode())
+        for ext in ["RAW", "H2O"]:
+            filepath = os.path.join(inputpath, f"{label}.{ext}")
+            if not os.path.exists(filepath): continue
+            with open(filepath, "rb") as f:
+                h.update(ext.encode())
+                h.update(f.read())
+        return h.hexdigest()
+
+    def restore(self, key, savepath):
+        """Copies the cached outputs to savepath; False if there is no entry"""
+        entry = os.path.join(self.folder, key)
+        if not os.path.isdir(entry): return False
+        try:
+            if os.path.exists(savepath): shutil.rmtree(savepath)
+            shutil.copytree(entry, savepath)
+            os.utime(entry) # mark as recently used
+        except Exception as e:
+            utils.log_debug(f"Could not restore LCModel cache entry {key}: {e}")
+            return False
+        return True
+
+    def put(self, key, savepath):
+        entry = os.path.join(self.folder, key)
+        if os.path.isdir(entry): return
+        tmp = entry + f".tmp{os.getpid()}"
+        try:
+            shutil.copytree(savepath, tmp)
+            os.replace(tmp, entry)
+        except Exception as e: # e.g. the same fit stored by another process
+            utils.log_debug(f"Could not cache LCModel fit {key}: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for f in os.listdir(self.folder):
+            entry = os.path.join(self.folder, f)
+            if not os.path.isdir(entry) or ".tmp" in f: continue
+            try: size = sum(os.path.getsize(os.path.join(entry, g)) for g in os.listdir(entry))
+            except OSError: continue
+            entries.append((os.path.getmtime(entry), size, entry))
+        total = sum(e[1] for e in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_size: break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for f in os.listdir(self.folder):
+            entry = os.path.join(self.folder, f)
+            if os.path.isdir(entry): shutil.rmtree(entry, ignore_errors=True)
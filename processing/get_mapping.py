@@ -1,52 +1,18 @@
 import os
-import re
-import pandas as pd
 import numpy as np
 from interface import utils
 
-from skimage import measure
-
 from inout.read_coord import ReadlcmCoord, extract_reference
+from inout.coord_map import load_coord_map
 
-def get_coord_map(dir): 
+def get_coord_map(dir):
+    """(max_m, max_n, max_k, CoordMap) of the m_n_k.coord files found under dir"""
     if dir is not None:
-        
-        pattern = re.compile(r"(\d+)_(\d+)_(\d+)\.coord$")  # Regex pattern
-
-        coord_files = []
-        max_m, max_n, max_k = 0, 0, 0  # Track max dimensions
-
-        # Step 1: Recursively find all .coord files and extract indices
-        for root, _, files in os.walk(dir):
-            for filename in files:
-                match = pattern.match(filename)
-                if match:
-                    m, n, k = map(int, match.groups())
-                    filepath = os.path.join(root, filename)
-                    coord_files.append((m, n, k, filepath))
-
-                    # Update max size
-                    max_m = max(max_m, m)
-                    max_n = max(max_n, n)
-                    max_k = max(max_k, k)
-
-        # Step 2: Initialize LCM dict matrix
-        lcm = {}  # Initialize as an empty dictionary
-
-        # Step 3: Read each file and store data
-        for m, n, k, filepath in coord_files:
-            if m not in lcm:
-                lcm[m] = {}
-            if n not in lcm[m]:
-                lcm[m][n] = {}
-
-            if filepath and os.path.exists(filepath):
-                lcm[m][n][k] = ReadlcmCoord(filepath)
-            else:
-                lcm[m][n][k] = {}
-                print(f"{filepath} does not exist!")
-
-        return max_m, max_n, max_k, lcm
+        coord_map = load_coord_map(dir)
+        if coord_map is None:
+            return 0, 0, 0, None
+        max_m, max_n, max_k = coord_map.shape
+        return max_m, max_n, max_k, coord_map
 
     return None
 
@@ -93,6 +59,24 @@ def get_coord_map(dir):
 #     return None
 
 
+def _map_plane(coord, metname, dim, slice_idx, sz):
+    """(conc, crlb) of a metabolite in the plane slice_idx (1-based) of dimension dim, zero where missing"""
+    conc = np.zeros(sz)
+    crlb = np.zeros(sz)
+    i = coord.index(metname) if coord is not None else None
+    if i is None:
+        return conc, crlb
+    if not 1 <= slice_idx <= coord.shape[dim]:
+        raise IndexError(f"slice {slice_idx} out of range for dimension {dim} of size {coord.shape[dim]}")
+    # as the former voxel loops, the last row and column of the map are left empty
+    rows, cols = [s - 1 for s in sz]
+    plane = [slice(None)] * 3
+    plane[dim] = slice_idx - 1
+    for dst, src in [(conc, coord.conc), (crlb, coord.crlb)]:
+        values = src[i][tuple(plane)][:rows, :cols]
+        dst[:values.shape[0], :values.shape[1]] = np.nan_to_num(values, nan=0)
+    return conc, crlb
+
 def get_conc_map(info):
     """
     Generate a concentration map based on provided metabolite and reference data.
@@ -116,90 +100,26 @@ def get_conc_map(info):
         utils.log_error("Invalid map dimension!")
         return None
 
-    # Initialize matrices
-    conc = np.zeros(sz)
-    crlb = np.zeros(sz)
-    c_ref = np.zeros(sz)
-    
-    conc_ref = np.zeros(sz)
-    crlb_ref = np.zeros(sz)
-    c_ref_ref = np.zeros(sz)
-
+    # Slice the metabolite tensors of the coord map
     try:
-        if info["dim"] == 0:
-            # Populate matrices
-            for i in range(sz[0] - 1):
-                for j in range(sz[1] - 1):
-                    c = retrieve_conc_value(lcm[slice_idx][i + 1][j + 1], metab_to_plot)
-                    conc[i, j], crlb[i, j], c_ref[i, j] = c['c'], c['SD'], c['c_ref']
-
-                    if metab_ref and metab_ref != "None":
-                        c_ref_val = retrieve_conc_value(lcm[slice_idx][i + 1][j + 1], metab_ref)
-                        conc_ref[i, j], crlb_ref[i, j], c_ref_ref[i, j] = (
-                            c_ref_val['c'], c_ref_val['SD'], c_ref_val['c_ref']
-                        )
-
-        elif info["dim"] == 1:
-            # Populate matrices
-            for i in range(sz[0] - 1):
-                for j in range(sz[1] - 1):
-                    c = retrieve_conc_value(lcm[i + 1][slice_idx][j + 1], metab_to_plot)
-                    conc[i, j], crlb[i, j], c_ref[i, j] = c['c'], c['SD'], c['c_ref']
-
-                    if metab_ref and metab_ref != "None":
-                        c_ref_val = retrieve_conc_value(lcm[i + 1][slice_idx][j + 1], metab_ref)
-                        conc_ref[i, j], crlb_ref[i, j], c_ref_ref[i, j] = (
-                            c_ref_val['c'], c_ref_val['SD'], c_ref_val['c_ref']
-                        )
-
-        elif info["dim"] == 2:
-            # Populate matrices
-            for i in range(sz[0] - 1):
-                for j in range(sz[1] - 1):
-                    c = retrieve_conc_value(lcm[i + 1][j + 1][slice_idx], metab_to_plot)
-                    conc[i, j], crlb[i, j], c_ref[i, j] = c['c'], c['SD'], c['c_ref']
-
-                    if metab_ref and metab_ref != "None":
-                        c_ref_val = retrieve_conc_value(lcm[i + 1][j + 1][slice_idx], metab_ref)
-                        conc_ref[i, j], crlb_ref[i, j], c_ref_ref[i, j] = (
-                            c_ref_val['c'], c_ref_val['SD'], c_ref_val['c_ref']
-                        )
-        else:
-            utils.log_error("Invalid dimension selected!")
-            return None
+        conc, crlb = _map_plane(lcm, metab_to_plot, info["dim"], slice_idx, sz)
+        if metab_ref and metab_ref != "None":
+            conc_ref, crlb_ref = _map_plane(lcm, metab_ref, info["dim"], slice_idx, sz)
     except IndexError as e:
         utils.log_error(f"IndexError: {e}")
         return None
 
-    # # Populate matrices
-    # for i in range(sz[0] - 1):
-    #     for j in range(sz[1] - 1):
-    #         c = retrieve_conc_value(lcm[slice_idx][i + 1][j + 1], metab_to_plot)
-    #         conc[i, j], crlb[i, j], c_ref[i, j] = c['c'], c['SD'], c['c_ref']
-
-    #         if metab_ref and metab_ref != "None":
-    #             c_ref_val = retrieve_conc_value(lcm[slice_idx][i + 1][j + 1], metab_ref)
-    #             conc_ref[i, j], crlb_ref[i, j], c_ref_ref[i, j] = (
-    #                 c_ref_val['c'], c_ref_val['SD'], c_ref_val['c_ref']
-    #             )
-
     # Apply reference correction if needed
     if use_ref and metab_ref and metab_ref != "None":
-        conc_masked = conc / conc_ref
-        mask_ref = np.ones(sz)
-        mask_ref[crlb_ref > info["crlb_threshold"]] = 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            conc_masked = conc / conc_ref
+        mask_ref = crlb_ref <= info["crlb_threshold"]
     else:
-        conc_masked = conc
-        mask_ref = np.ones(sz)
-
-    # Apply metabolite CRLB mask
-    mask_metabo = np.ones(sz)
-    mask_metabo[crlb > info["crlb_threshold"]] = 0
-
-    # Apply both masks
-    conc_masked *= mask_metabo * mask_ref
+        conc_masked = conc.copy()
+        mask_ref = np.ones(sz, dtype=bool)
 
-    # Replace zeros with NaN for better visualization
+    # Apply metabolite CRLB mask and replace zeros with NaN for better visualization
+    conc_masked[~(mask_ref & (crlb <= info["crlb_threshold"]))] = 0
     conc_masked[conc_masked == 0] = np.nan
 
     return conc_masked * scaling
@@ -217,6 +137,7 @@ def load_excel(filename):
     Helper function to load data from an Excel file with multiple sheets.
     Each sheet contains data for one slice in the format (12, 12).
     """
+    import pandas as pd
     data = []
     for ls in range(1, 9):  # Assume sheets are named 'Slice1', 'Slice2', ..., 'Slice8'
         sheet_name = f'Slice{ls}'
@@ -227,6 +148,7 @@ def load_excel(filename):
     return np.stack(data, axis=-1)  # Stack into a 3D array with shape (12, 12, 8)
 
 def create_brain_mask(slice_data):
+    from skimage import measure
     # Set a threshold to create a binary image
     threshold = 100  # Adjust threshold as necessary
     binary_image = slice_data > threshold
@@ -0,0 +1,107 @@
+import os
+import pickle
+import shutil
+from types import SimpleNamespace
+
+from interface import utils
+from processing.api.registry import NODE_REGISTRY
+from processing.node_manifest import NodeManifest, register_nodes
+from processing.processing_pipeline import loadInput, processStep, saveDataPlot, analyseResults, waitForPlots
+
+# Runs a saved pipeline without the GUI: the functions of processing_pipeline take this session
+# in place of the MainFrame, and check its "headless" flag instead of showing dialogs or plots.
+
+def load_nodes(programpath):
+    """Registers the nodes of nodes/; the modules of the nodes in the pipeline are imported when it is loaded"""
+    register_nodes(NodeManifest(os.path.join(programpath, "nodes")))
+
+def load_pipeline(filepath):
+    """Reads a .pipe file saved by the pipeline editor and returns the ordered list of node instances"""
+    with open(filepath, 'rb') as f:
+        toload = pickle.load(f)
+    nodes = {}
+    input_id = None
+    for data in toload[0]:
+        idname, _id, _, params = data
+        if idname == "input_nodeid":
+            input_id = _id
+            continue
+        if idname not in NODE_REGISTRY:
+            raise ValueError(f"Unknown node in pipeline: {idname}")
+        node = NODE_REGISTRY[idname](None, _id)
+        for p in params:
+            if p[0] in node.properties: node.properties[p[0]].value = p[1]
+        nodes[_id] = node
+    if input_id is None:
+        raise ValueError("Pipeline has no input node")
+    steps = []
+    current_id = input_id
+    while True:
+        wires = [w for w in toload[1] if w[0] == current_id]
+        if len(wires) == 0: break
+        if len(wires) > 1:
+            raise ValueError("Only serial pipelines are allowed for now")
+        current_id = wires[0][2]
+        steps.append(nodes[current_id])
+    return steps
+
+class HeadlessSession:
+    def __init__(self, pipeline, inputs, wref=None, out=None, basis=None, control=None, wm=None, gm=None, csf=None,
+                 save_plots=False, save_raw=False, workers=None, step_cache=None, twix_memmap=False, save_store=False,
+                 plot_dpi=600, plot_format="pdf", fit_cache=None):
+        self.headless = True
+        self.programpath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.pipeline_filepath = pipeline
+        self.MRSfiles = SimpleNamespace(filepaths=list(inputs))
+        self.Waterfiles = SimpleNamespace(filepaths=[wref] if wref else [])
+        out = os.path.abspath(out if out is not None else os.path.join(os.getcwd(), "output"))
+        # results go straight to the given folder, as for a batch participant
+        self.batch_mode = True
+        self.batch_study_folder = os.path.dirname(out)
+        self.participant_name = os.path.basename(out)
+        self.outputpath_base = out
+        self.outputpath = out
+        self.lcmodel_workpath = None
+        self.basis_file = None
+        self.basis_file_user = basis
+        self.control_file_user = control
+        self.wm_file_user = wm
+        self.gm_file_user = gm
+        self.csf_file_user = csf
+        self.save_plots = save_plots
+        self.save_raw = save_raw
+        self.save_store = save_store
+        self.plot_dpi = plot_dpi
+        self.plot_format = plot_format
+        self.lcmodel_workers = workers
+        self.step_cache = step_cache
+        self.fit_cache = fit_cache
+        self.twix_memmap = twix_memmap
+        self.fast_processing = True
+        self.skip_manual_adjustment = True
+        self.last_coord = None
+        self.steps = []
+        self.pipeline = []
+
+    def run(self):
+        """Returns True if the pipeline and the fitting completed"""
+        load_nodes(self.programpath)
+        try:
+            self.steps = load_pipeline(self.pipeline_filepath)
+        except Exception as e:
+            utils.log_error(f"Could not load pipeline {self.pipeline_filepath}:\n\t{e}")
+            return False
+        self.pipeline = [step.GetLabel() for step in self.steps]
+        utils.log_info("Pipeline: " + " → ".join(step.__class__.__name__ for step in self.steps))
+        if not os.path.exists(self.batch_study_folder): os.makedirs(self.batch_study_folder)
+        if not loadInput(self):
+            utils.log_error("Error loading input")
+            return False
+        self.lcmodel_workpath = os.path.join(self.outputpath, "temp")
+        for nstep, step in enumerate(self.steps):
+            processStep(self, step, nstep + 1)
+        shutil.copy(self.pipeline_filepath, os.path.join(self.outputpath, "pipeline.pipe"))
+        saveDataPlot(self)
+        fitted = analyseResults(self) is True
+        waitForPlots(self)
+        return fitted
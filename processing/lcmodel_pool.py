@@ -0,0 +1,65 @@
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# LCModel fitting engine: every worker process owns a scratch folder with its own copy of the
+# executable, so voxels can be fitted concurrently without their files colliding.
+# Nothing here touches wx; workers return their logs and the caller forwards them to the UI.
+
+_scratch = None
+_exe = None
+
+def default_workers():
+    return max(1, os.cpu_count() or 1)
+
+def init_worker(workpath, lcmodelfile):
+    global _scratch, _exe
+    _scratch = os.path.join(workpath, f"worker_{os.getpid()}")
+    if os.path.exists(_scratch): shutil.rmtree(_scratch)
+    os.mkdir(_scratch)
+    _exe = os.path.basename(lcmodelfile)
+    shutil.copy2(lcmodelfile, os.path.join(_scratch, _exe))
+
+def fit_voxel(label, inputpath, savepath):
+    """Run LCModel on the staged {label}.* files and move the outputs to savepath."""
+    out = {"label": label, "returncode": None, "stdout": "", "stderr": "", "missing": [], "error": None}
+    try:
+        for f in os.listdir(inputpath):
+            if f.startswith(label + "."):
+                shutil.move(os.path.join(inputpath, f), os.path.join(_scratch, f))
+        if os.name == 'nt': command = f"{_exe} < {label}.CONTROL"
+        else: command = f"./{_exe} < {label}.CONTROL"
+        result = subprocess.run(command, shell=True, cwd=_scratch, capture_output=True, text=True)
+        out.update({"returncode": result.returncode, "stdout": result.stdout, "stderr": result.stderr})
+        out["missing"] = [f for f in [f"{label}.table", f"{label}.ps", f"{label}.coord", f"{label}.csv"]
+                          if not os.path.exists(os.path.join(_scratch, f))]
+        if result.returncode != 0: return out
+        os.mkdir(savepath)
+        for f in os.listdir(_scratch):
+            if "lcmodel" in f.lower(): continue
+            shutil.move(os.path.join(_scratch, f), os.path.join(savepath, f))
+    except Exception as e:
+        out["error"] = str(e)
+    finally: # never leave a voxel's files behind for the next one
+        for f in os.listdir(_scratch):
+            if "lcmodel" in f.lower(): continue
+            try: os.remove(os.path.join(_scratch, f))
+            except OSError: pass
+    return out
+
+def run_jobs(jobs, workpath, lcmodelfile, workers=None):
+    """jobs: list of (label, inputpath, savepath); yields fit_voxel results as they complete"""
+    if workers is None: workers = default_workers()
+    workers = max(1, min(int(workers), len(jobs)))
+    if workers == 1:
+        init_worker(workpath, lcmodelfile)
+        for job in jobs:
+            yield fit_voxel(*job)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(workpath, lcmodelfile)) as executor:
+        futures = {executor.submit(fit_voxel, *job): job[0] for job in jobs}
+        for future in as_completed(futures):
+            try: yield future.result()
+            except Exception as e:
+                yield {"label": futures[future], "returncode": None, "stdout": "", "stderr": "", "missing": [], "error": str(e)}
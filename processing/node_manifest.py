@@ -0,0 +1,193 @@
+import os
+import ast
+import json
+import inspect
+import hashlib
+import importlib.util
+from interface import utils
+from processing.api.registry import NODE_REGISTRY
+
+# Node discovery without running the node modules: the RegisterNode calls of nodes/*.py, with the class name,
+# label and category of each node, are read from the syntax tree of the files and kept in node_manifest.json,
+# reused as long as the size and mtime, or else the hash, of a file are unchanged. NODE_REGISTRY holds a LazyNode
+# per node, which imports the module when the first node is created (placed in the editor, loaded or run).
+
+MANIFEST_NAME = "node_manifest.json"
+_VERSION = 1
+_modules = {} # filepath: module, the node modules imported in this session
+_registered = {} # idname: filepath, the registry entries made from the manifest
+
+def load_module(filepath):
+    """Runs the node module at filepath once per session; node modules are not imported into sys.modules"""
+    if filepath not in _modules:
+        module_name = os.path.basename(filepath)[:-3]
+        spec = importlib.util.spec_from_file_location(module_name, filepath)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[filepath] = module
+    return _modules[filepath]
+
+def node_file(cls):
+    """File defining the class, from the code of its methods (node modules are not in sys.modules)"""
+    for v in vars(cls).values():
+        if hasattr(v, "__code__"): return v.__code__.co_filename
+    return None
+
+class LazyNode:
+    """Stand-in for a node class in NODE_REGISTRY, replaced by the class once its module is imported"""
+    def __init__(self, filepath, idname, classname, label, category):
+        self.filepath = filepath
+        self.idname = idname
+        self.classname = classname
+        self.label = label
+        self.category = category
+
+    def replaced_by(self, node):
+        """RegisterNode replaces the stand-in by the class registered by its own module"""
+        return node.__name__ == self.classname and node_file(node) == self.filepath
+
+    def load(self):
+        in_registry = NODE_REGISTRY.get(self.idname) is self
+        try:
+            module = load_module(self.filepath)
+        except Exception as e:
+            utils.log_error(f"Could not load node {self.label} from {self.filepath}: {e}")
+            raise
+        cls = NODE_REGISTRY.get(self.idname)
+        if not in_registry or cls is self: # not registered in this run of the module
+            cls = getattr(module, self.classname)
+            if NODE_REGISTRY.get(self.idname) is self: NODE_REGISTRY[self.idname] = cls
+        return cls
+
+    def __call__(self, nodegraph, id):
+        return self.load()(nodegraph, id)
+
+def _literal(node):
+    try: return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError): return None
+
+def _meta_info(classdef):
+    """label and category of the meta_info dict literal of a ProcessingNode subclass; None if not found in the source"""
+    if classdef is None or not any(ast.unparse(b).split(".")[-1] == "ProcessingNode" for b in classdef.bases): return None
+    meta = {}
+    for stmt in ast.walk(classdef):
+        if not isinstance(stmt, ast.Assign) or not isinstance(stmt.value, ast.Dict): continue
+        if not any(ast.unparse(t) in ("self.meta_info", "meta_info") for t in stmt.targets): continue
+        for k, v in zip(stmt.value.keys, stmt.value.values):
+            if k is None: return None # **other
+            key = _literal(k)
+            if key in ("label", "category"):
+                meta[key] = _literal(v)
+                if not isinstance(meta[key], str): return None
+    return meta
+
+def parse_nodes(filepath):
+    """
+    [{idname, classname, label, category}] of the module-level RegisterNode calls of a node file;
+    None if the nodes cannot be read from the source, in which case the module has to be imported
+    """
+    with open(filepath, "rb") as f:
+        tree = ast.parse(f.read(), filepath)
+    classes = {} # class definitions up to the statement, as a class can be redefined after being registered
+    nodes = []
+    for stmt in tree.body:
+        if isinstance(stmt, ast.ClassDef): classes[stmt.name] = stmt
+        if not isinstance(stmt, ast.Expr) or not isinstance(stmt.value, ast.Call): continue
+        call = stmt.value
+        if ast.unparse(call.func).split(".")[-1] != "RegisterNode": continue
+        args = list(call.args) + [kw.value for kw in call.keywords]
+        if len(args) != 2 or not isinstance(args[0], ast.Name): return None
+        idname = _literal(args[1])
+        meta = _meta_info(classes.get(args[0].id))
+        if not isinstance(idname, str) or meta is None: return None
+        nodes.append({"idname": idname, "classname": args[0].id,
+                      "label": meta.get("label", args[0].id), "category": meta.get("category", "PROCESSING")})
+    return nodes or None
+
+def _hash(filepath):
+    with open(filepath, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=20).hexdigest()
+
+class NodeManifest:
+    def __init__(self, folder):
+        self.folder = folder
+        self.filepath = os.path.join(folder, "__pycache__", MANIFEST_NAME)
+        self.files = {} # file name: {size, mtime, hash, nodes}
+        try:
+            with open(self.filepath, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == _VERSION: self.files = manifest["files"]
+        except FileNotFoundError: pass
+        except Exception as e:
+            utils.log_debug(f"Could not read {self.filepath}: {e}")
+
+    def scan(self):
+        """Updates the entries of the node files of the folder; returns the names of the changed and removed files"""
+        filenames = sorted(f for f in os.listdir(self.folder) if f.endswith(".py") and not f.startswith("_"))
+        changed = []
+        dirty = False
+        for filename in filenames:
+            filepath = os.path.join(self.folder, filename)
+            stat = os.stat(filepath)
+            entry = self.files.get(filename)
+            if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime: continue
+            digest = _hash(filepath)
+            if entry is None or entry["hash"] != digest:
+                try: nodes = parse_nodes(filepath)
+                except Exception as e: # e.g. a syntax error, reported when the module is imported
+                    utils.log_debug(f"Could not parse {filepath}: {e}")
+                    nodes = None
+                entry = {"hash": digest, "nodes": nodes}
+                changed.append(filename)
+            entry.update(size=stat.st_size, mtime=stat.st_mtime) # e.g. a customer node copied again
+            self.files[filename] = entry
+            dirty = True
+        removed = [f for f in self.files if f not in filenames]
+        for filename in removed: del self.files[filename]
+        if dirty or removed: self.save()
+        return changed, removed
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+            tmp = self.filepath + f".{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"version": _VERSION, "files": self.files}, f, indent=1)
+            os.replace(tmp, self.filepath)
+        except Exception as e: # e.g. read-only installation
+            utils.log_debug(f"Could not write {self.filepath}: {e}")
+
+def register_nodes(manifest):
+    """
+    Brings NODE_REGISTRY up to date with the node files of the manifest's folder, only dropping the nodes
+    and modules of the files changed since the last call; returns {class name: class or LazyNode}
+    """
+    changed, removed = manifest.scan()
+    for filename in changed + removed:
+        filepath = os.path.join(manifest.folder, filename)
+        _modules.pop(filepath, None)
+        for idname in [i for i, f in _registered.items() if f == filepath]:
+            NODE_REGISTRY.pop(idname, None)
+            del _registered[idname]
+    steps = {}
+    for filename, entry in sorted(manifest.files.items()):
+        filepath = os.path.join(manifest.folder, filename)
+        if entry["nodes"] is None: # the module registers its nodes when it is run
+            if filepath not in _modules:
+                before = set(NODE_REGISTRY)
+                try: module = load_module(filepath)
+                except Exception as e:
+                    utils.log_error(f"Could not load {filepath}: {e}")
+                    continue
+                for idname in set(NODE_REGISTRY) - before: _registered[idname] = filepath
+            module = _modules[filepath]
+            for name, obj in inspect.getmembers(module, inspect.isclass):
+                if obj.__module__ == module.__name__: steps[name] = obj
+            continue
+        for node in entry["nodes"]:
+            if node["idname"] not in NODE_REGISTRY: # first registration of an idname wins, as in RegisterNode
+                NODE_REGISTRY[node["idname"]] = LazyNode(filepath, **node)
+                _registered[node["idname"]] = filepath
+            registered = NODE_REGISTRY[node["idname"]]
+            steps[node["classname"]] = registered if _registered.get(node["idname"]) == filepath else LazyNode(filepath, **node)
+    return steps
@@ -0,0 +1,117 @@
+import os
+import pickle
+import matplotlib.figure
+from concurrent.futures import ProcessPoolExecutor
+from inout.io_mrsdata import pack, unpack
+from interface import utils
+from processing.node_manifest import load_module, node_file
+
+# Saved step plots are rendered in worker processes while the next steps run: the node class
+# (loaded from its file), its parameter values and state, and the step data are pickled to a worker,
+# which rebuilds the node without a node graph and calls its plot() there. The pickling is done on
+# submission, so later steps changing the arrays in place do not change the plots. wait() is the barrier
+# before a run is reported as done. Steps whose state cannot be pickled are rendered in place.
+
+PLOT_FORMATS = ["pdf", "png", "svg"]
+_NODE_ATTRS = ["properties", "parameters", "defaultParameters", "outputs", "meta_info", "nodegraph", "_parent"]
+
+def default_workers():
+    return max(1, min(4, (os.cpu_count() or 1) - 1))
+
+def _save(figure, filepath, dpi, fmt):
+    figure.savefig(filepath, dpi=dpi, format=fmt)
+    figure.clear()
+    return filepath
+
+def draw_step(step, data, steppath, issvs, dpi=600, fmt="pdf"):
+    """Saves the plot of the step and, for single voxel data, its result; returns the saved files"""
+    from interface.plot_helpers import plot_mrs
+    name = step.__class__.__name__
+    figure = matplotlib.figure.Figure(figsize=(12, 9))
+    step.plot(figure, dict(data)) # plot() may replace entries of data
+    figure.suptitle(name)
+    saved = [_save(figure, os.path.join(steppath, name + "." + fmt), dpi, fmt)]
+    if issvs:
+        plot_mrs(data["output"], figure)
+        figure.suptitle("Result of " + name)
+        saved.append(_save(figure, os.path.join(steppath, "result." + fmt), dpi, fmt))
+    return saved
+
+def draw_result(data, filepath, title="Result", dpi=600, fmt="pdf"):
+    from interface.plot_helpers import plot_mrs
+    figure = matplotlib.figure.Figure(figsize=(12, 9))
+    plot_mrs(data, figure)
+    figure.suptitle(title)
+    return [_save(figure, filepath, dpi, fmt)]
+
+def _node_state(step):
+    """Attributes of the node that can be sent to a worker; node graph and wx attributes are left out"""
+    state = {}
+    for k, v in vars(step).items():
+        if k in _NODE_ATTRS: continue
+        try: pickle.dumps(pack(v), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception: continue
+        state[k] = v
+    return state
+
+def render_step(payload):
+    modulefile, classname, nodeid, values, state, packed, steppath, issvs, dpi, fmt = pickle.loads(payload)
+    step = getattr(load_module(modulefile), classname)(None, nodeid)
+    for k, v in values.items():
+        if k in step.properties: step.properties[k].value = v
+    for k, v in unpack(state).items(): setattr(step, k, v)
+    return draw_step(step, unpack(packed), steppath, issvs, dpi, fmt)
+
+def render_result(payload):
+    packed, filepath, title, dpi, fmt = pickle.loads(payload)
+    return draw_result(unpack(packed), filepath, title, dpi, fmt)
+
+class PlotQueue:
+    def __init__(self, workers=None, dpi=600, fmt="pdf"):
+        if fmt not in PLOT_FORMATS: raise ValueError(f"Unsupported plot format: {fmt}")
+        self.dpi = dpi
+        self.format = fmt
+        self.workers = default_workers() if workers is None else int(workers)
+        self.executor = None
+        self.futures = []
+
+    def _submit(self, target, fn, *args):
+        """Pickles args and queues fn on them; False if the plot has to be rendered in place"""
+        if self.workers <= 0: return False
+        try: payload = pickle.dumps(args, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            utils.log_debug(f"Rendering {target} in place: {e}")
+            return False
+        if self.executor is None:
+            try: self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            except Exception as e:
+                utils.log_debug(f"Rendering plots in place: {e}")
+                self.workers = 0
+        if self.executor is None: return False
+        self.futures.append((self.executor.submit(fn, payload), target))
+        return True
+
+    def add_step(self, step, data: dict, steppath, issvs):
+        if not os.path.exists(steppath): os.mkdir(steppath)
+        modulefile = node_file(step.__class__)
+        if modulefile is None or not self._submit(steppath,
+                render_step, modulefile, step.__class__.__name__, step.id, {k: p.value for k, p in step.properties.items()},
+                pack(_node_state(step)), pack(data), steppath, issvs, self.dpi, self.format):
+            for f in draw_step(step, data, steppath, issvs, self.dpi, self.format): utils.log_debug("Saved " + f)
+
+    def add_result(self, data, filepath, title="Result"):
+        filepath = os.path.splitext(filepath)[0] + "." + self.format
+        if not self._submit(filepath, render_result, pack(data), filepath, title, self.dpi, self.format):
+            for f in draw_result(data, filepath, title, self.dpi, self.format): utils.log_debug("Saved " + f)
+
+    def wait(self):
+        """Blocks until every queued plot is saved, then stops the workers"""
+        for future, target in self.futures:
+            try:
+                for f in future.result(): utils.log_debug("Saved " + f)
+            except Exception as e:
+                utils.log_warning(f"Could not save plot in {target}: {e}")
+        self.futures = []
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -14,6 +14,12 @@ class ProcessingNode(Node):
         if "description" not in self.meta_info: self.meta_info["description"] = ""
         if nodegraph is not None:
             Node.__init__(self, nodegraph, id)
+        else: # no node graph (headless runs): still hold the properties
+            self.id = id
+            self.properties = {}
+            self.outputs = {}
+            self.NodeInitProps()
+            self.NodeInitOutputs()
         self.defaultParameters = {}
         if hasattr(self, "parameters"):
             for p in self.parameters:
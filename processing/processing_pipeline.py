@@ -1,26 +1,27 @@
-import wx
 import numpy as np
-import os, sys, shutil, zipfile, time, subprocess
+import os, sys, shutil, zipfile, time
 import matplotlib
-import ants
 import datetime
 import traceback
-import subprocess
 
 import re
 
 from interface import utils
 from inout.read_mrs import load_file
+from inout.csi_volume import CSIVolume
 from inout.read_coord import ReadlcmCoord
-from inout.read_header import Table
 from inout.io_lcmodel import save_raw, read_control, save_control, save_nifti, save_nifti_spec2nii
-from interface.plot_helpers import plot_mrs, plot_coord, read_file
+from inout.step_store import StepStore
+from processing.plot_queue import PlotQueue
+from interface.plot_helpers import plot_coord, read_file
+from processing import lcmodel_pool
 
 #SVS
 
 
 def loadInput(self):
-    self.save_lastfiles()
+    headless = getattr(self, "headless", False)
+    if not headless: self.save_lastfiles()
     self.filepaths = []
     for f in self.MRSfiles.filepaths:
         if not f.lower().endswith(".coord"): self.filepaths.append(f)
@@ -35,7 +36,7 @@ def loadInput(self):
     dtype = None
 
     for filepath in self.filepaths:
-        try: data, header, dtype, vendor = load_file(filepath)
+        try: data, header, dtype, vendor = load_file(filepath, memmap=getattr(self, "twix_memmap", False))
         except: utils.log_warning("Error loading file: " + filepath + "\n\t" + str(sys.exc_info()[0]))
         else:
             if data is None:
@@ -75,7 +76,10 @@ def loadInput(self):
 
     if nucleus == "31P" and self.issvs:
         has_phase_alignment = any("PhaseAlignment31P" in step.__class__.__name__ for step in self.steps) or any("TEBasedPhaseCorrecton31P" in step.__class__.__name__ for step in self.steps)
-        if not has_phase_alignment:
+        if not has_phase_alignment and headless:
+            utils.log_warning("31P data detected, but the current pipeline does not include the 'PhaseAlignment31P' step")
+        elif not has_phase_alignment:
+            import wx # the GUI-only branches import wx, so that headless runs do not need it
             dlg = wx.MessageDialog(
                 self,
                 "31P data detected, but the current pipeline does not include the 'PhaseAlignment31P' step.\n"
@@ -98,7 +102,7 @@ def loadInput(self):
     if len(self.Waterfiles.filepaths) == 0: utils.log_warning("No water reference given")
     else: wrefpath = self.Waterfiles.filepaths[0]
     if wrefpath is not None:
-        try: self.originalWref, _, _, _ = load_file(wrefpath)
+        try: self.originalWref, _, _, _ = load_file(wrefpath, memmap=getattr(self, "twix_memmap", False))
         except: utils.log_warning("Error loading water reference: " + wrefpath + "\n\t" + str(sys.exc_info()[0]))
         else:
             if self.originalWref is None: utils.log_warning("Couldn't load water reference: " + wrefpath)
@@ -163,11 +167,24 @@ def loadInput(self):
 
     # save header.csv
     if vendor is not None:
+        from inout.read_header import Table
         table = Table()
         self.header = table.table_clean(vendor, dtype, self.header)
         table.populate(vendor, dtype, self.header)
         csvcols = ['Header', 'SubHeader', 'MRSinMRS', 'Values']
         table.MRSinMRS_Table[csvcols].to_csv(os.path.join(self.outputpath, "MRSinMRS_table.csv"))
+
+    # saved plots of the steps
+    if getattr(self, "plot_queue", None) is not None: self.plot_queue.wait() # from a terminated run
+    self.plot_queue = None
+    if (self.save_plots if headless else self.save_plots_button.GetValue()):
+        self.plot_queue = PlotQueue(dpi=getattr(self, "plot_dpi", 600), fmt=getattr(self, "plot_format", "pdf"))
+
+    # intermediate data of all steps in one file, written as each step completes
+    self.step_store = None
+    if (getattr(self, "save_store", False) if headless else self.save_store_button.GetValue()):
+        self.step_store = StepStore(os.path.join(self.outputpath, "steps.npz"))
+        self.step_store.add_step(0, "Input", self.originalData, self.originalWref, self.header)
     return True
 
 dataDict = {}
@@ -181,14 +198,27 @@ def processStep(self, step, nstep):
     
     dataDict["header"] = self.headerSteps[-1] # added for transmit header
 
-    self.button_step_processing.Disable()
-    if not self.fast_processing:
-        self.button_auto_processing.Disable()
+    headless = getattr(self, "headless", False)
+    if not headless:
+        self.button_step_processing.Disable()
+        if not self.fast_processing:
+            self.button_auto_processing.Disable()
 
     utils.log_debug("Running ", step.__class__.__name__)
     start_time = time.time()
-    step.process(dataDict)
-    utils.log_info("Time to process " + step.__class__.__name__ + ": {:.3f}".format(time.time() - start_time))
+    step_cache = getattr(self, "step_cache", None)
+    key = entry = None
+    if step_cache is not None:
+        key = step_cache.key(step, dataDict)
+        entry = step_cache.get(key)
+    if entry is not None:
+        step_cache.restore(entry, step, dataDict)
+        utils.log_info("Restored " + step.__class__.__name__ + " from cache: {:.3f}".format(time.time() - start_time))
+    else:
+        snapshot = step_cache.snapshot(step) if step_cache is not None else None
+        step.process(dataDict)
+        utils.log_info("Time to process " + step.__class__.__name__ + ": {:.3f}".format(time.time() - start_time))
+        if step_cache is not None: step_cache.put(key, step, dataDict, snapshot)
     self.dataSteps.append(dataDict["output"])
     if len(dataDict["wref_output"]) != 0:
         self.wrefSteps.append(dataDict["wref_output"])
@@ -196,26 +226,16 @@ def processStep(self, step, nstep):
 
     utils.log_debug("Plotting ", step.__class__.__name__)
     start_time = time.time()
-    if self.save_plots_button.GetValue():
+    plot_queue = getattr(self, "plot_queue", None)
+    if plot_queue is not None: # rendered in the background; see waitForPlots
         steppath = os.path.join(self.outputpath, str(nstep) + step.__class__.__name__)
-        if not os.path.exists(steppath): os.mkdir(steppath)
-        figure = matplotlib.figure.Figure(figsize=(12, 9))
-        # step plot
-        step.plot(figure, dataDict)
-        figure.suptitle(step.__class__.__name__)
-        filepath = os.path.join(steppath, step.__class__.__name__ + ".pdf")
-        figure.savefig(filepath, dpi=600, format = 'pdf')
-        utils.log_debug("Saved "+ str(step.__class__.__name__) + " to " + filepath)
-        # data plot
-        figure.clear()
-        if self.issvs:
-            plot_mrs(dataDict["output"], figure)
-            figure.suptitle("Result of " + step.__class__.__name__)
-            filepath = os.path.join(steppath, "result.pdf")
-            figure.savefig(filepath, dpi=600, format = 'pdf')
-            utils.log_debug("Saved result of " + step.__class__.__name__ + " to " + filepath)
+        plot_queue.add_step(step, dataDict, steppath, self.issvs)
     # raw
-    if self.save_raw_button.GetValue():
+    step_store = getattr(self, "step_store", None)
+    if step_store is not None: # .RAW files can be exported from the store on demand
+        step_store.add_step(nstep, step.__class__.__name__, self.dataSteps[-1], self.wrefSteps[-1], dataDict["header"])
+        utils.log_debug("Stored data of " + step.__class__.__name__ + " in " + step_store.filepath)
+    elif (self.save_raw if headless else self.save_raw_button.GetValue()):
         steppath = os.path.join(self.outputpath, str(nstep) + step.__class__.__name__)
         if not os.path.exists(steppath): os.mkdir(steppath)
         filepath = os.path.join(steppath, "data")
@@ -263,19 +283,29 @@ def processStep(self, step, nstep):
         self.matplotlib_canvas.draw()
     utils.log_info("Time to plot " + step.__class__.__name__ + ": {:.3f}".format(time.time() - start_time))
     
+def saveResultPlot(self):
+    plot_queue = getattr(self, "plot_queue", None)
+    if plot_queue is None: plot_queue = PlotQueue(workers=0, dpi=getattr(self, "plot_dpi", 600), fmt=getattr(self, "plot_format", "pdf"))
+    plot_queue.add_result(self.dataSteps[-1], os.path.join(self.outputpath, "Result.pdf"))
+
+def waitForPlots(self):
+    """Barrier before the run is reported as done: all queued plots are saved"""
+    plot_queue = getattr(self, "plot_queue", None)
+    if plot_queue is None: return
+    start_time = time.time()
+    plot_queue.wait()
+    self.plot_queue = None
+    utils.log_debug("Time waiting for plots: {:.3f}".format(time.time() - start_time))
+
 def saveDataPlot(self):
     if getattr(self, 'skip_manual_adjustment', False):
         if self.issvs:
-            filepath = os.path.join(self.outputpath, "Result.pdf")
-            figure = matplotlib.figure.Figure(figsize=(12, 9))
-            plot_mrs(self.dataSteps[-1], figure)
-            figure.suptitle("Result")
-            figure.savefig(filepath, dpi=600, format='pdf')
-            utils.log_debug("Saved result to " + filepath)
+            saveResultPlot(self)
         return
 
     # 2. Show the same two-button dialog in all modes
     if self.issvs:
+        import wx
         dlg = wx.MessageDialog(None,
                             "Do you want to manually adjust frequency and phase shifts of the result?",
                             "",
@@ -293,15 +323,11 @@ def saveDataPlot(self):
                 self.skip_manual_adjustment = True
 
     if self.issvs:
-        filepath = os.path.join(self.outputpath, "Result.pdf")
-        figure = matplotlib.figure.Figure(figsize=(12, 9))
-        plot_mrs(self.dataSteps[-1], figure)
-        figure.suptitle("Result")
-        figure.savefig(filepath, dpi=600, format='pdf')
-        utils.log_debug("Saved result to " + filepath)
+        saveResultPlot(self)
 
 
 def analyseResults(self):
+    headless = getattr(self, "headless", False)
     results = self.dataSteps[-1]
     #if self.issvs == False:
         
@@ -370,7 +396,11 @@ def analyseResults(self):
             self.basis_file = self.basis_file_user
 
     # If no user basis file, check generated basis file
-    if self.basis_file is None and basis_file_gen is not None and os.path.exists(basis_file_gen):
+    if self.basis_file is None and basis_file_gen is not None and os.path.exists(basis_file_gen) and headless:
+        utils.log_info("Using basis set:\n\t", basis_file_gen)
+        self.basis_file = basis_file_gen
+    elif self.basis_file is None and basis_file_gen is not None and os.path.exists(basis_file_gen):
+        import wx
         dlg = wx.MessageDialog(
             None, 
             basis_file_gen, 
@@ -385,7 +415,7 @@ def analyseResults(self):
             return False
 
     # If still no basis file
-    if self.basis_file is None:
+    if self.basis_file is None and not headless:
         utils.log_warning("Basis set not found:\n\t", basis_file_gen)
         self.fitting_frame.Show()
         self.fitting_frame.SetFocus()
@@ -433,9 +463,8 @@ def analyseResults(self):
         else:
             labels = [str(i) for i in range(len(results[0]))]
 
-    result_np = np.array(results[0])
     utils.log_info(f"length of results {len(results[0])}")
-    utils.log_info(f"shape of results {result_np.shape}")
+    utils.log_info(f"shape of results {np.shape(results[0])}")
 
     # Segmentation and water concentration (only for 1H)
     wconc = None
@@ -446,6 +475,7 @@ def analyseResults(self):
             utils.log_error(f"Could not retrieve voxel location from data: {e}")
             return False
         try:
+            import ants
             wm_img = ants.image_read(self.wm_file_user)
             gm_img = ants.image_read(self.gm_file_user)
             csf_img = ants.image_read(self.csf_file_user)
@@ -508,22 +538,15 @@ def analyseResults(self):
             utils.log_error(f"Failed to extract lcmodel from zip: {e}")
             return False
 
-    # Setup workpath
-    workpath = os.path.join(os.path.dirname(self.outputpath_base), "temp")
+    # Setup workpath, each LCModel worker gets its own scratch folder inside it
+    workpath = getattr(self, "lcmodel_workpath", None) or os.path.join(os.path.dirname(self.outputpath_base), "temp")
     if os.path.exists(workpath):
         shutil.rmtree(workpath)
     os.mkdir(workpath)
     utils.log_debug("LCModel work folder: ", workpath)
 
-    # Copy LCModel executable to workpath
-    if os.name == 'nt':
-        command = f"""copy "{lcmodelfile}" "{workpath}" """
-    else:
-        command = f"""cp "{lcmodelfile}" "{workpath}" """
-    result_copy = subprocess.run(command, shell=True, capture_output=True, text=True)
-    utils.log_debug(f"Copy command output:\n{result_copy.stdout}")
-    if result_copy.stderr:
-        utils.log_warning(f"Copy command errors:\n{result_copy.stderr}")
+    inputpath = os.path.join(workpath, "inputs")
+    os.mkdir(inputpath)
 
     # Setup LCModel save path
     lcmodelsavepath = os.path.join(self.outputpath, "lcmodel")
@@ -540,16 +563,15 @@ def analyseResults(self):
 
     
 
-    def processVoxel(result, label):
+    def prepareVoxel(result, label):
         """
-        All the existing logic needed to handle one voxel (or one spectrum).
-        This is essentially the body of your old 'for' loop.
+        Writes the CONTROL and RAW files of one voxel (or one spectrum) to the input folder.
+        The fit itself is run by the worker pool in processing/lcmodel_pool.py.
         """
 
         label = "lcm" if label == "0" else label
 
-        result_label_np = np.array(result)
-        utils.log_info(f"shape of result {label}: {result_label_np.shape}")
+        utils.log_info(f"shape of result {label}: {np.shape(result)}")
 
         # Initialize rparams with uppercase keys only
         # (Same as in your code; just extracted here)
@@ -604,8 +626,8 @@ def analyseResults(self):
 
         # Write CONTROL and RAW files
         try:
-            save_control(os.path.join(workpath, f"{label}.CONTROL"), rparams)
-            raw_filepath = os.path.join(workpath, f"{label}.RAW")
+            save_control(os.path.join(inputpath, f"{label}.CONTROL"), rparams)
+            raw_filepath = os.path.join(inputpath, f"{label}.RAW")
             save_raw(raw_filepath, result, seq=self.sequence)
             nifti_filepath = save_nifti_spec2nii(raw_filepath, result, nucleus=nucleus, seq=self.sequence)
             if nifti_filepath is not None:
@@ -613,7 +635,7 @@ def analyseResults(self):
             else:
                 utils.log_error(f"Failed to generate NIfTI file for {raw_filepath}")
             if nucleus == "1H" and wresult is not None:
-                water_raw_filepath = os.path.join(workpath, f"{label}.H2O")
+                water_raw_filepath = os.path.join(inputpath, f"{label}.H2O")
                 save_raw(water_raw_filepath, wresult, seq=self.sequence)
                 water_nifti_filepath = save_nifti_spec2nii(water_raw_filepath, wresult, nucleus=nucleus, seq=self.sequence)
                 if water_nifti_filepath is not None:
@@ -622,68 +644,24 @@ def analyseResults(self):
                     utils.log_error(f"Failed to generate Water NIfTI file for {water_raw_filepath}")
         except Exception as e:
             utils.log_error(f"Error writing CONTROL or RAW files for {label}: {e}")
-            return  # skip this voxel
-
-        # Run LCModel
-        if os.name == 'nt':
-            command = f"""cd "{workpath}" & lcmodel.exe < {label}.CONTROL"""
-        else:
-            command = f"""cd "{workpath}" && ./lcmodel < {label}.CONTROL"""
-        utils.log_info(f"Running LCModel for {label}...")
-        utils.log_debug("\n\t" + command)
-
-        try:
-            result_lcmodel = subprocess.run(command, shell=True,
-                                            capture_output=True, text=True)
-            utils.log_debug(f"LCModel Output for {label}:\n{result_lcmodel.stdout}")
-            utils.log_debug(f"LCModel Errors for {label}:\n{result_lcmodel.stderr}")
-
-            expected_files = [
-                f"{label}.table", f"{label}.ps",
-                f"{label}.coord", f"{label}.csv"
-            ]
-            missing_files = [
-                f for f in expected_files
-                if not os.path.exists(os.path.join(workpath, f))
-            ]
-            
-            if missing_files:
-                utils.log_error(f"Missing LCModel output files for {label}: {missing_files}")
-        except Exception as e:
-            utils.log_error(f"LCModel execution failed for {label}: {e}")
+            return None  # skip this voxel
+        return (label, inputpath, os.path.join(lcmodelsavepath, label))
+
+    def collectVoxel(fit):
+        label = fit["label"]
+        utils.log_debug(f"LCModel Output for {label}:\n{fit['stdout']}")
+        utils.log_debug(f"LCModel Errors for {label}:\n{fit['stderr']}")
+        if fit["error"] is not None:
+            utils.log_error(f"LCModel execution failed for {label}: {fit['error']}")
             return
-
-        if result_lcmodel.returncode != 0:
+        if fit["missing"]:
+            utils.log_error(f"Missing LCModel output files for {label}: {fit['missing']}")
+        if fit["returncode"] != 0:
             utils.log_error(
-                f"LCModel failed for {label} with return code {result_lcmodel.returncode}"
+                f"LCModel failed for {label} with return code {fit['returncode']}"
             )
-            return        
-
-        # Move output files to savepath
-        savepath = os.path.join(lcmodelsavepath, label)
-        try:
-            os.mkdir(savepath)
-        except Exception as e:
-            utils.log_error(f"Failed to create savepath for {label}: {e}")
             return
-
-        command_move = ""
-        for f in os.listdir(workpath):
-            if "lcmodel" in f.lower():
-                continue
-            if os.name == 'nt':
-                command_move += f""" & move "{os.path.join(workpath, f)}" "{savepath}" """
-            else:
-                command_move += f""" && mv "{os.path.join(workpath, f)}" "{savepath}" """
-
-        if command_move:
-            command_move = command_move[3:]  # Remove initial ' & ' or ' && '
-            utils.log_debug("Moving files...\n\t" + command_move)
-            try:
-                subprocess.run(command_move, shell=True, check = True)
-            except Exception as e:
-                utils.log_warning(f"Failed to move files for {label}: {e}")
-                utils.log_warning(f"Files remain in the temporary work folder: {workpath}")
+        savepath = os.path.join(lcmodelsavepath, label)
 
         # Handle coord files
         filepath = os.path.join(savepath, f"{label}.coord")
@@ -696,7 +674,7 @@ def analyseResults(self):
                     add_calculated_metabolites(fcoord)
                 figure = matplotlib.figure.Figure(figsize=(10, 10), dpi=600)
                 plot_coord(fcoord, figure, title=filepath)
-                read_file(filepath, self.matplotlib_canvas, self.file_text)
+                if not headless: read_file(filepath, self.matplotlib_canvas, self.file_text)
                 filepath_pdf = os.path.join(savepath, "lcmodel.pdf")
                 figure.savefig(filepath_pdf, dpi=600, format='pdf')
             except Exception as e:
@@ -704,23 +682,37 @@ def analyseResults(self):
         else:
             utils.log_warning(f"LCModel output not found for {label}")
 
+    jobs = []
     if self.issvs:
-
         for result, label in zip(temp_results, labels):
-            processVoxel(result, label)
+            jobs.append(prepareVoxel(result, label))
     else:
-
-        xdim, ydim, zdim, npoints = np.array(temp_results).shape
-
-        for i in range(xdim):
-            for j in range(ydim):
-                for k in range(zdim):
-
-                    result_data = temp_results[i][j][k]
-
-                    label = "_".join([str(i+1),str(j+1),str(k+1)])
-
-                    processVoxel(result_data, label)
+        for (i, j, k), voxel in CSIVolume.from_mrsdata(temp_results).voxels():
+            label = "_".join([str(i+1),str(j+1),str(k+1)])
+            jobs.append(prepareVoxel(voxel, label))
+    jobs = [job for job in jobs if job is not None]
+
+    # fits with the same spectrum, basis set and CONTROL parameters as a previous run are restored
+    fit_cache = getattr(self, "fit_cache", None)
+    keys = {}
+    if fit_cache is not None:
+        torun = []
+        for job in jobs:
+            label, _, savepath = job
+            keys[label] = fit_cache.key(label, inputpath, lcmodelfile)
+            if fit_cache.restore(keys[label], savepath):
+                collectVoxel({"label": label, "returncode": 0, "stdout": "", "stderr": "", "missing": [], "error": None})
+            else: torun.append(job)
+        if len(torun) < len(jobs): utils.log_info(f"Restored {len(jobs) - len(torun)} LCModel fits from cache")
+        jobs = torun
+
+    workers = getattr(self, "lcmodel_workers", None)
+    if workers is None: workers = lcmodel_pool.default_workers()
+    utils.log_info(f"Running LCModel for {len(jobs)} spectra on {min(workers, max(len(jobs), 1))} worker(s)...")
+    for fit in lcmodel_pool.run_jobs(jobs, workpath, lcmodelfile, workers):
+        collectVoxel(fit)
+        if fit_cache is not None and fit["error"] is None and fit["returncode"] == 0 and not fit["missing"]:
+            fit_cache.put(keys[fit["label"]], os.path.join(lcmodelsavepath, fit["label"]))
 
     # Clean up workpath
     try:
@@ -734,6 +726,7 @@ def analyseResults(self):
 
 
 def processPipeline(self):
+    import wx
     try:
         if self.current_step == 0:
             wx.CallAfter(self.plot_box.Clear)
@@ -758,7 +751,9 @@ def processPipeline(self):
         elif self.current_step == len(self.steps):
             self.pipeline_frame.on_save_pipeline(None, os.path.join(self.outputpath, "pipeline.pipe"))
             saveDataPlot(self)
-            if analyseResults(self): wx.CallAfter(self.plot_box.AppendItems, "lcmodel")
+            fitted = analyseResults(self)
+            waitForPlots(self)
+            if fitted: wx.CallAfter(self.plot_box.AppendItems, "lcmodel")
             else: self.reset()
 
         self.current_step += 1
@@ -0,0 +1,153 @@
+import os
+import sys
+import types
+import pickle
+import hashlib
+import numpy as np
+from interface import utils
+from inout.io_mrsdata import pack, unpack
+
+# Content-addressed cache of processing steps: the key hashes the node's source files, its parameter
+# values and its input data, so re-running a pipeline only recomputes the steps from the first changed
+# node onwards. Entries are pickle files evicted in least-recently-used order above max_size bytes.
+
+# node attributes that are not results of process() and are never cached
+_node_attributes = {"nodegraph", "id", "properties", "outputs", "parameters", "defaultParameters", "meta_info",
+                    "cache", "cache_enabled", "edited_flag", "shader_cache", "shader_cache_enabled"}
+
+def _hash_update(h, obj):
+    if obj is None:
+        h.update(b"N")
+    elif isinstance(obj, np.ndarray):
+        arr = np.ascontiguousarray(obj)
+        h.update(f"A{arr.dtype.str}{arr.shape}".encode())
+        if arr.dtype.hasobject: _hash_update(h, arr.tolist())
+        else: h.update(arr.data)
+        for attr in ["dt", "f0", "te", "tr", "ppm0", "transform"]: # MRSData attributes
+            if hasattr(obj, attr): _hash_update(h, getattr(obj, attr))
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"L{len(obj)}".encode())
+        for o in obj: _hash_update(h, o)
+    elif isinstance(obj, dict):
+        h.update(f"D{len(obj)}".encode())
+        for k in sorted(obj.keys(), key=str):
+            h.update(str(k).encode())
+            _hash_update(h, obj[k])
+    else:
+        h.update(repr(obj).encode())
+
+# packages of the helper modules whose source is hashed with the node file, e.g. nodes/_Phasing31P.py
+_source_packages = ("nodes", "inout")
+
+def _imported_modules(namespace):
+    """Names of the _source_packages modules that the globals of a module come from"""
+    names = set()
+    for v in namespace.values():
+        name = v.__name__ if isinstance(v, types.ModuleType) else getattr(v, "__module__", None)
+        if isinstance(name, str) and name.split(".")[0] in _source_packages: names.add(name)
+    return names
+
+def _source_files(step):
+    """The node's file and the files of the nodes.* and inout.* modules it imports, directly or not"""
+    files = [step.process.__code__.co_filename]
+    seen = set()
+    pending = _imported_modules(step.process.__globals__)
+    while pending:
+        name = pending.pop()
+        seen.add(name)
+        module = sys.modules.get(name)
+        if getattr(module, "__file__", None) is None: continue
+        files.append(module.__file__)
+        pending |= _imported_modules(vars(module)) - seen
+    return [files[0]] + sorted(set(files[1:]) - {files[0]})
+
+def _source_hash(step):
+    try:
+        h = hashlib.sha1()
+        for filepath in _source_files(step):
+            with open(filepath, "rb") as f:
+                h.update(f.read())
+        return h.hexdigest()
+    except Exception:
+        return step.__class__.__module__
+
+def _value_hash(obj):
+    """Digest of an attribute value; the id for values that cannot be hashed"""
+    try:
+        h = hashlib.blake2b(digest_size=16)
+        _hash_update(h, obj)
+        return h.hexdigest()
+    except Exception:
+        return id(obj)
+
+class StepCache:
+    def __init__(self, folder, max_size=2 * 1024**3):
+        self.folder = folder
+        self.max_size = max_size
+        if not os.path.exists(self.folder): os.makedirs(self.folder)
+
+    def key(self, step, data: dict):
+        h = hashlib.blake2b(digest_size=20)
+        h.update(step.__class__.__name__.encode())
+        h.update(_source_hash(step).encode())
+        _hash_update(h, {k: v.value for k, v in step.properties.items()})
+        for k in ["input", "wref", "header", "labels"]:
+            _hash_update(h, data.get(k, None))
+        return h.hexdigest()
+
+    def snapshot(self, step):
+        """Digests of the node attributes before process(), to find the ones it sets or changes"""
+        return {k: _value_hash(v) for k, v in vars(step).items() if k not in _node_attributes}
+
+    def get(self, key):
+        filepath = os.path.join(self.folder, key + ".pkl")
+        if not os.path.exists(filepath): return None
+        try:
+            with open(filepath, "rb") as f:
+                entry = pickle.load(f)
+            os.utime(filepath) # mark as recently used
+        except Exception as e:
+            utils.log_debug(f"Could not read step cache entry {key}: {e}")
+            return None
+        return unpack(entry)
+
+    def put(self, key, step, data: dict, snapshot: dict):
+        state = {k: v for k, v in vars(step).items()
+                 if k not in _node_attributes and snapshot.get(k, None) != _value_hash(v)}
+        entry = {"output": data["output"], "wref_output": data["wref_output"], "state": state}
+        if "labels" in data: entry["labels"] = data["labels"]
+        filepath = os.path.join(self.folder, key + ".pkl")
+        try:
+            with open(filepath + ".tmp", "wb") as f:
+                pickle.dump(pack(entry), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(filepath + ".tmp", filepath)
+        except Exception as e: # e.g. unpicklable node state: the step is just not cached
+            utils.log_debug(f"Could not cache {step.__class__.__name__}: {e}")
+            if os.path.exists(filepath + ".tmp"): os.remove(filepath + ".tmp")
+            return
+        self.evict()
+
+    def restore(self, entry, step, data: dict):
+        data["output"] = entry["output"]
+        data["wref_output"] = entry["wref_output"]
+        if "labels" in entry: data["labels"] = entry["labels"]
+        for k, v in entry["state"].items(): setattr(step, k, v)
+
+    def evict(self):
+        files = []
+        for f in os.listdir(self.folder):
+            if not f.endswith(".pkl"): continue
+            filepath = os.path.join(self.folder, f)
+            try: stat = os.stat(filepath)
+            except OSError: continue
+            files.append((stat.st_mtime, stat.st_size, filepath))
+        total = sum(f[1] for f in files)
+        for _, size, filepath in sorted(files):
+            if total <= self.max_size: break
+            try: os.remove(filepath)
+            except OSError: continue
+            total -= size
+
+    def clear(self):
+        for f in os.listdir(self.folder):
+            if f.endswith(".pkl"): os.remove(os.path.join(self.folder, f))
@@ -0,0 +1,18 @@
+import pickle
+from processing.batch_ledger import BatchLedger
+
+def save_pipeline(path, pos=(0, 0), zerofill=2):
+    # the format written by PipelineFrame.on_save_pipeline
+    nodes = [["input_nodeid", 0, (10, 10), []],
+             ["zero_padding", 1, pos, [("factor", zerofill)]]]
+    wires = [[0, "output", 1, "input"]]
+    with open(path, "wb") as f:
+        pickle.dump([nodes, wires], f)
+    return path
+
+def test_pipeline_hash_ignores_node_positions(tmp_path):
+    ledger = BatchLedger(str(tmp_path / "ledger.sqlite"))
+    h = ledger.pipeline_hash(save_pipeline(str(tmp_path / "a.pipe")))
+    assert ledger.pipeline_hash(save_pipeline(str(tmp_path / "b.pipe"), pos=(250, 40))) == h
+    assert ledger.pipeline_hash(save_pipeline(str(tmp_path / "c.pipe"), zerofill=4)) != h
+    ledger.close()
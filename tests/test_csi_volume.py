@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+suspect = pytest.importorskip("suspect")
+from suspect import MRSData
+from inout.csi_volume import CSIVolume
+from inout.io_mrsdata import pack, unpack
+
+def make_volume(grid=(3, 2, 2), points=64, seed=0):
+    rng = np.random.default_rng(seed)
+    data = rng.standard_normal(grid + (points,)) + 1j * rng.standard_normal(grid + (points,))
+    return CSIVolume.from_mrsdata(MRSData(data, 2.5e-4, 123.0, te=30, tr=2000))
+
+@pytest.mark.parametrize("grid", [(3, 2, 2), (3, 3, 1), (1, 1, 1)])
+def test_adjust_phase_keeps_volume(grid):
+    volume = make_volume(grid)
+    out = volume.adjust_phase(0.3, first_phase=1e-4)
+    assert type(out) is CSIVolume and out.shape == volume.shape and out.f0 == volume.f0
+    phases = np.linspace(-1, 1, np.prod(grid)).reshape(grid)
+    out = volume.adjust_phase(phases, first_phase=np.full(grid, 1e-4))
+    assert type(out) is CSIVolume and out.shape == volume.shape
+    for index, voxel in volume.voxels():
+        expected = voxel.adjust_phase(phases[index], first_phase=1e-4)
+        assert np.allclose(out.voxel(*index), expected)
+
+def test_adjust_frequency_keeps_volume():
+    volume = make_volume()
+    shifts = np.arange(12.0).reshape(volume.grid_shape)
+    out = volume.adjust_frequency(shifts)
+    assert type(out) is CSIVolume and out.shape == volume.shape
+    assert np.allclose(out.voxel(1, 0, 1), volume.voxel(1, 0, 1).adjust_frequency(shifts[1, 0, 1]))
+
+def test_voxels_are_mrsdata_views():
+    volume = make_volume()
+    voxel = volume.voxel(2, 1, 0)
+    assert type(voxel) is MRSData and voxel.shape == (64,) and voxel.dt == volume.dt
+    assert np.shares_memory(voxel, volume)
+    voxels = list(volume.voxels())
+    assert [index for index, _ in voxels] == list(np.ndindex(3, 2, 2))
+    assert all(type(v) is MRSData for _, v in voxels)
+
+def test_inherit_type_follows_dimensions():
+    volume = make_volume()
+    assert type(volume.inherit(np.asarray(volume) * 2)) is CSIVolume
+    single = volume.inherit(np.asarray(volume)[0, 0, 0])
+    assert type(single) is MRSData and single.f0 == volume.f0
+    assert type(volume.spectrum().fid()) is MRSData # suspect's own conversions are unchanged
+
+def test_pack_tags_only_volumes():
+    volume = make_volume()
+    assert type(unpack(pack(volume))) is CSIVolume
+    assert type(unpack(pack(volume.voxel(0, 0, 0)))) is MRSData
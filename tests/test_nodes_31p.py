@@ -0,0 +1,54 @@
+import os
+import importlib.util
+import numpy as np
+import pytest
+
+pytest.importorskip("suspect")
+pytest.importorskip("wx")
+pytest.importorskip("gsnodegraph")
+from suspect import MRSData
+from inout.csi_volume import CSIVolume
+
+NODES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nodes")
+
+def node(filename, classname):
+    # node modules are loaded from their files, as in the application
+    spec = importlib.util.spec_from_file_location(filename[:-3], os.path.join(NODES, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, classname)(None, 0)
+
+def csi_data(grid, points=256, seed=0):
+    """PCr at 0 ppm and a-ATP at -7.5 ppm in every voxel, with a random zero-order phase and amplitude"""
+    rng = np.random.default_rng(seed)
+    dt, f0 = 2.5e-4, 120.0
+    t = np.arange(points) * dt
+    fid = np.exp(-t / 0.05) + 0.4 * np.exp(2j * np.pi * (-7.5 * f0) * t - t / 0.03)
+    amplitude = rng.uniform(0.5, 1.5, grid)
+    phase = rng.uniform(-np.pi, np.pi, grid)
+    volume = amplitude[..., None] * np.exp(1j * phase)[..., None] * fid
+    volume = volume + 0.01 * (rng.standard_normal(volume.shape) + 1j * rng.standard_normal(volume.shape))
+    volume = CSIVolume.from_mrsdata(MRSData(volume, dt, f0, te=3.5, tr=1000, ppm0=0))
+    header = {"CSIMatrix_Size[0]": grid[0], "CSIMatrix_Size[1]": grid[1], "CSIMatrix_Size[2]": grid[2]}
+    return {"input": [volume], "output": [], "wref": [], "wref_output": [], "header": header}
+
+@pytest.mark.parametrize("grid", [(2, 2, 2), (3, 3, 1)])
+def test_phase_alignment_csi_shape(grid):
+    data = csi_data(grid)
+    node("PhaseAlignment31P.py", "PhaseAlignment31P").process(data)
+    out = data["output"][0]
+    assert isinstance(out, CSIVolume) and out.shape == data["input"][0].shape
+    # every voxel ends up with PCr absorptive at 0 ppm
+    spectra = np.asarray(out.spectrum())
+    centre = np.argmin(np.abs(out.frequency_axis_ppm()))
+    assert np.all(np.real(spectra[..., centre]) > 0.8 * np.abs(spectra[..., centre]))
+
+@pytest.mark.parametrize("grid", [(2, 2, 2), (3, 3, 1)])
+def test_te_based_phase_correction_csi_shape(grid):
+    data = csi_data(grid)
+    te_node = node("TEBasedPhaseCorrection31P.py", "TEBasedPhaseCorrecton31P")
+    te_node.process(data)
+    out = data["output"][0]
+    points = data["input"][0].shape[-1] * (1 + te_node.get_parameter("zp_factor"))
+    assert isinstance(out, CSIVolume) and out.shape == grid + (points,)
+    assert np.all(np.isfinite(np.asarray(out)))
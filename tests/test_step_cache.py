@@ -0,0 +1,46 @@
+import os
+import importlib.util
+import numpy as np
+import pytest
+
+pytest.importorskip("suspect")
+pytest.importorskip("wx")
+from processing.step_cache import StepCache, _source_files
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class Step:
+    def __init__(self):
+        self.properties = {}
+        self.weights = np.zeros(4)
+        self.label = "unchanged"
+
+    def process(self, data):
+        self.weights[:] = 1 # changed in place: same object, new value
+        data["output"] = data["input"]
+        data["wref_output"] = data["wref"]
+
+def test_state_changed_in_place_is_cached(tmp_path):
+    cache = StepCache(str(tmp_path))
+    step = Step()
+    data = {"input": [np.ones(8)], "wref": []}
+    key = cache.key(step, data)
+    snapshot = cache.snapshot(step)
+    step.process(data)
+    cache.put(key, step, data, snapshot)
+    entry = cache.get(key)
+    assert set(entry["state"]) == {"weights"}
+    restored = Step()
+    cache.restore(entry, restored, {})
+    assert np.all(restored.weights == 1)
+
+def test_source_files_include_helper_modules():
+    pytest.importorskip("gsnodegraph")
+    filepath = os.path.join(ROOT, "nodes", "PhaseAlignment31P.py")
+    spec = importlib.util.spec_from_file_location("PhaseAlignment31P", filepath)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    files = _source_files(module.PhaseAlignment31P(None, 0))
+    assert files[0] == filepath
+    assert os.path.join(ROOT, "nodes", "_Phasing31P.py") in files
+    assert os.path.join(ROOT, "inout", "csi_volume.py") in files